@@ -1,11 +1,15 @@
 import app_common as ac
 from bp_batfish import bp_batfish
 from bp_configs import bp_configs
+from bp_jobs import bp_jobs
+from bp_metrics import bp_metrics
 from bp_queries import bp_queries
 from bp_tools import bp_tools
 
 ac.app.register_blueprint(bp_batfish)
 ac.app.register_blueprint(bp_configs)
+ac.app.register_blueprint(bp_jobs)
+ac.app.register_blueprint(bp_metrics)
 ac.app.register_blueprint(bp_queries)
 ac.app.register_blueprint(bp_tools)
 
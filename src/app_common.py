@@ -4,6 +4,14 @@ from flask import Flask
 from flask.logging import create_logger
 from bfwrapper.loglevel import set_loglevel
 from bfwrapper.bf_query_thrower import BatfishQueryThrower
+from bfwrapper.snapshot_residency_pool import SnapshotResidencyPool
+from bfwrapper.job_manager import JobManager
+from bfwrapper.query_result_cache import QueryResultCache
+from bfwrapper.query_result_store import QueryResultStore
+from bfwrapper.query_catalog import QueryCatalog
+from bfwrapper.metrics_registry import MetricsRegistry
+from bfwrapper.traceroute_result_cache import TracerouteResultCache
+from request_args import TRUE_FLAG_VALUES
 
 app = Flask(__name__)
 app_logger = create_logger(app)
@@ -15,6 +23,36 @@ set_loglevel("bfwrapper", os.environ.get("BATFISH_WRAPPER_LOG_LEVEL", "info"))
 BATFISH_HOST = os.environ.get("BATFISH_HOST", "localhost")
 CONFIGS_DIR = os.environ.get("MDDO_CONFIGS_DIR", "./configs")
 QUERIES_DIR = os.environ.get("MDDO_QUERIES_DIR", "./queries")
+INVENTORY_TTL = float(os.environ.get("BATFISH_WRAPPER_INVENTORY_TTL", "60"))
+SNAPSHOT_POOL_SIZE = int(os.environ.get("BATFISH_WRAPPER_SNAPSHOT_POOL_SIZE", "1"))
+SNAPSHOT_POOL_POLICY = os.environ.get("BATFISH_WRAPPER_SNAPSHOT_POOL_POLICY", "lru")
+SESSION_POOL_SIZE = int(os.environ.get("BATFISH_WRAPPER_SESSION_POOL_SIZE", "4"))
+JOB_WORKERS = int(os.environ.get("BATFISH_WRAPPER_JOB_WORKERS", "2"))
+QUERY_CONCURRENCY = int(os.environ.get("BATFISH_WRAPPER_QUERY_CONCURRENCY", "1"))
+QUERY_CACHE_DIR = os.environ.get("MDDO_QUERIES_CACHE_DIR", os.path.join(QUERIES_DIR, ".cache"))
+QUERY_CACHE_SIZE = int(os.environ.get("BATFISH_WRAPPER_QUERY_CACHE_SIZE", str(1 << 30)))
+RESULT_STORE_SIZE = int(os.environ.get("BATFISH_WRAPPER_RESULT_STORE_SIZE", "32"))
+QUERY_CATALOG = os.environ.get("BATFISH_WRAPPER_QUERY_CATALOG")  # default: query_catalog.json in bfwrapper
+TRACEROUTE_CACHE_SIZE = int(os.environ.get("BATFISH_WRAPPER_TRACEROUTE_CACHE_SIZE", "256"))
+TRACEROUTE_CACHE_DIR = os.environ.get("MDDO_TRACEROUTE_CACHE_DIR")  # default: memory only
+OUTPUT_GENERATIONS = os.environ.get("BATFISH_WRAPPER_OUTPUT_GENERATIONS", "false").lower() in TRUE_FLAG_VALUES
 
+query_result_store = QueryResultStore(RESULT_STORE_SIZE)
+metrics = MetricsRegistry()
 # pylint: disable=too-many-function-args
-bfqt = BatfishQueryThrower(BATFISH_HOST, CONFIGS_DIR, QUERIES_DIR)
+bfqt = BatfishQueryThrower(
+    BATFISH_HOST,
+    CONFIGS_DIR,
+    QUERIES_DIR,
+    inventory_ttl=INVENTORY_TTL,
+    residency_pool=SnapshotResidencyPool(SNAPSHOT_POOL_SIZE, SNAPSHOT_POOL_POLICY),
+    session_pool_size=SESSION_POOL_SIZE,
+    query_concurrency=QUERY_CONCURRENCY,
+    query_cache=QueryResultCache(QUERY_CACHE_DIR, QUERY_CACHE_SIZE),
+    metrics=metrics,
+    result_store=query_result_store,
+    query_catalog=QueryCatalog.load(QUERY_CATALOG),
+    traceroute_cache=TracerouteResultCache(TRACEROUTE_CACHE_SIZE, TRACEROUTE_CACHE_DIR, metrics),
+    output_generations=OUTPUT_GENERATIONS,
+)
+job_manager = JobManager(JOB_WORKERS)
@@ -2,15 +2,33 @@
 Definition of BatfishQueryThrower class
 """
 import json
-import shutil
-from os import path, makedirs
-from typing import List, Dict, Callable, Optional
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from os import path
+from typing import List, Dict, Callable, Optional, Tuple
 import pandas as pd
 from l1topology_operator import L1TopologyOperator
-from pybatfish.client.session import Session
 from bf_registrant import BatfishRegistrant
 from register_status import RegisterStatus
-from bf_wrapper_types import QuerySummaryDict, WholeQuerySummaryDict
+from snapshot_pattern import SnapshotPattern
+from snapshot_residency_pool import SnapshotResidencyPool
+from query_result_cache import QueryResultCache
+from query_result_writer import QueryResultWriter, parse_result_file_name
+from query_result_store import QueryResultStore
+from query_result_diff import DIFF_QUERY_SUFFIX, diff_query_name, diff_keys, diff_dataframes, count_diff
+from staging_dir import prepare_staging_dir, commit_staging_dir, discard_staging_dir, remove_output_dir
+from metrics_registry import MetricsRegistry
+from run_manifest import RunManifest
+from query_catalog import QueryCatalog, QueryDefinition
+from traceroute_result_cache import TracerouteResultCache
+from bf_wrapper_types import (
+    QuerySummaryDict,
+    WholeQuerySummaryDict,
+    QueryProgressDict,
+    QueryTimingsDict,
+    QueryDiffSummaryDict,
+)
 
 
 # pylint: disable=function-redefined
@@ -19,91 +37,194 @@ class BatfishQueryThrower(BatfishRegistrant):
 
 
 # Type alias
-BfqDict = Dict[str, Callable[[Session], pd.DataFrame]]
+QueryDict = Dict[str, QueryDefinition]
 OqDict = Dict[str, Callable[[BatfishQueryThrower, str, str], pd.DataFrame]]
 
-# for batfish
-BF_QUERY_DICT: BfqDict = {
-    "ip_owners": lambda bf: bf.q.ipOwners(),
-    # 'edges_layer1': lambda: bf.q.edges(edgeType='layer1'),
-    # 'edges_layer3': lambda: bf.q.edges(edgeType='layer3'),
-    "interface_props": lambda bf: bf.q.interfaceProperties(
-        properties=", ".join(
-            [
-                "Active",
-                "VRF",
-                "Primary_Address",
-                "Access_VLAN",
-                "Allowed_VLANs",
-                "Encapsulation_VLAN",
-                "Switchport",
-                "Switchport_Mode",
-                "Switchport_Trunk_Encapsulation",
-                "Channel_Group",
-                "Channel_Group_Members",
-                "Description",
-            ]
-        ),
-    ),
-    "node_props": lambda bf: bf.q.nodeProperties(properties=", ".join(["Configuration_Format"])),
-    "sw_vlan_props": lambda bf: bf.q.switchedVlanProperties(),
-    "ospf_proc_conf": lambda bf: bf.q.ospfProcessConfiguration(),
-    "ospf_intf_conf": lambda bf: bf.q.ospfInterfaceConfiguration(),
-    "ospf_area_conf": lambda bf: bf.q.ospfAreaConfiguration(),
-    "bgp_proc_conf": lambda bf: bf.q.bgpProcessConfiguration(),
-    "bgp_peer_conf": lambda bf: bf.q.bgpPeerConfiguration(),
-    "routes": lambda bf: bf.q.routes(protocols="static,connected,local"),
-    "named_structures": lambda bf: bf.q.namedStructures(),
-}
-# other data source
+# other data source (question of "other" query in query catalog)
 OTHER_QUERY_DICT: OqDict = {"edges_layer1": lambda bfqt, network, snapshot: bfqt.l1topology_to_df(network, snapshot)}
+# version of query result format (change it to invalidate all cached query results)
+QUERY_CACHE_VERSION = 1
 
 
 class BatfishQueryThrower(BatfishRegistrant):
     """Batfish Query Thrower"""
 
-    def __init__(self, bf_host: str, configs_dir: str, queries_dir: str) -> None:
+    def __init__(  # pylint: disable=too-many-arguments
+        self,
+        bf_host: str,
+        configs_dir: str,
+        queries_dir: str,
+        inventory_ttl: float = 60.0,
+        residency_pool: Optional[SnapshotResidencyPool] = None,
+        session_pool_size: int = 4,
+        query_concurrency: int = 1,
+        query_cache: Optional[QueryResultCache] = None,
+        metrics: Optional[MetricsRegistry] = None,
+        result_store: Optional[QueryResultStore] = None,
+        query_catalog: Optional[QueryCatalog] = None,
+        traceroute_cache: Optional[TracerouteResultCache] = None,
+        output_generations: bool = False,
+    ) -> None:
         """Constructor
         Args:
             bf_host (str): Batfish host (URL)
             configs_dir (str): Path of 'configs' directory (contains batfish network/snapshot directories)
             queries_dir (str): Path of 'models' directory (batfish query results store)
+            inventory_ttl (float): TTL [sec] of cached network/snapshot inventory in batfish
+            residency_pool (Optional[SnapshotResidencyPool]): Residency pool of logical snapshots
+            session_pool_size (int): Number of batfish sessions to query concurrently
+            query_concurrency (int): Number of batfish queries executed concurrently for a snapshot
+            query_cache (Optional[QueryResultCache]): Query result cache (default: queries_dir/.cache)
+            metrics (Optional[MetricsRegistry]): Metrics registry to record query timings and sizes
+            result_store (Optional[QueryResultStore]): Loaded query results (to read physical snapshot results)
+            query_catalog (Optional[QueryCatalog]): Query catalog (default: query_catalog.json in bfwrapper)
+            traceroute_cache (Optional[TracerouteResultCache]): Traceroute result cache (default: in memory)
+            output_generations (bool): True to make snapshot output directories symlinks to generation directories
+              (replaced atomically, see staging_dir)
         """
-        super().__init__(bf_host, configs_dir)
+        super().__init__(bf_host, configs_dir, inventory_ttl, residency_pool, session_pool_size, traceroute_cache)
         self.queries_dir = queries_dir
+        self.query_concurrency = max(query_concurrency, 1)
+        self.query_cache = (
+            query_cache if query_cache is not None else QueryResultCache(path.join(queries_dir, ".cache"))
+        )
+        self.metrics = metrics if metrics is not None else MetricsRegistry()
+        self._define_metrics()
+        self.result_store = result_store if result_store is not None else QueryResultStore()
+        self.query_catalog = query_catalog if query_catalog is not None else QueryCatalog.load()
+        self.output_generations = output_generations
+
+    def _define_metrics(self) -> None:
+        """Define metrics of queries"""
+        self.metrics.histogram(
+            "bfwrapper_snapshot_register_seconds", "Time to register (init/fork) a snapshot in batfish"
+        )
+        self.metrics.histogram(
+            "bfwrapper_query_phase_seconds", "Time of each phase (answer, frame, serialize) to make a query result"
+        )
+        self.metrics.counter("bfwrapper_query_results_total", "Number of query results by source")
+        self.metrics.counter("bfwrapper_query_rows_total", "Number of rows in query results")
+        self.metrics.counter("bfwrapper_query_bytes_total", "Size of query result files [bytes]")
+        self.metrics.counter(
+            "bfwrapper_query_deduplicated_bytes_total", "Size of query result files shared with identical results"
+        )
 
     @staticmethod
-    def _save_df_as_csv(dataframe: pd.DataFrame, csv_file: str) -> None:
-        """Save dataframe as csv
+    def _query_summary(  # pylint: disable=too-many-arguments
+        query_kind: str,
+        query: str,
+        file_path: str,
+        rows: Optional[int],
+        timings: QueryTimingsDict,
+        cached: bool = False,
+        derived: bool = False,
+    ) -> QuerySummaryDict:
+        """Make query summary
         Args:
-            dataframe (pd.DataFrame): Data to save
-            csv_file (str): File name to save
+            query_kind (str): Query kind ("batfish" or "other")
+            query (str): Query name
+            file_path (str): Query result file path
+            rows (Optional[int]): Number of rows in the result (None if unknown)
+            timings (QueryTimingsDict): Time of each phase to make the result [sec]
+            cached (bool): True if the result is restored from query result cache
+            derived (bool): True if the result is derived from physical snapshot
+        Returns:
+            QuerySummaryDict: Query summary (with size of the result file)
+        """
+        return {
+            "query": f"{query_kind}/{query}",
+            "file": file_path,
+            "cached": cached,
+            "derived": derived,
+            "rows": rows,
+            "size": path.getsize(file_path),
+            "timings": timings,
+        }
+
+    @staticmethod
+    def _timings(answer: float = 0.0, frame: float = 0.0, serialize: float = 0.0) -> QueryTimingsDict:
+        """Make query timings
+        Args:
+            answer (float): Time to get answer (batfish) or data (other query) [sec]
+            frame (float): Time to convert the answer to dataframe [sec]
+            serialize (float): Time to write (or restore/derive) the result file [sec]
+        Returns:
+            QueryTimingsDict: Query timings
+        """
+        return {"answer": answer, "frame": frame, "serialize": serialize}
+
+    def _exec_bf_single_query(  # pylint: disable=too-many-arguments
+        self,
+        network: str,
+        snapshot: str,
+        query: str,
+        query_def: QueryDefinition,
+        output_dir: str,
+        writer: QueryResultWriter,
+    ) -> QuerySummaryDict:
+        """Exec a batfish query with a session leased from session pool
+        Args:
+            network (str): Network name
+            snapshot (str): Snapshot name (in batfish)
+            query (str): Query name
+            query_def (QueryDefinition): Query definition
+            output_dir (str): Query result output directory
+            writer (QueryResultWriter): Query result writer
+        Returns:
+            QuerySummaryDict: Query summary
         """
-        with open(csv_file, "w", encoding="utf-8") as outfile:
-            outfile.write(dataframe.to_csv())
+        self.logger.info("Exec Batfish Query = %s", query)
+        file_path = writer.file_path(output_dir, query)
+        with self.bf_session_pool.session(network, snapshot) as bf_session:
+            started_at = time.perf_counter()
+            answer = query_def.answer(bf_session)
+            answered_at = time.perf_counter()
+            dataframe = query_def.project(answer.frame())
+        framed_at = time.perf_counter()
+        rows = writer.write(dataframe, file_path)
+        timings = self._timings(answered_at - started_at, framed_at - answered_at, time.perf_counter() - framed_at)
+        return self._query_summary("batfish", query, file_path, rows, timings)
 
-    def _exec_bf_query(
-        self, network: str, snapshot: str, query_dict: BfqDict, output_dir: str
+    def _exec_bf_query(  # pylint: disable=too-many-arguments
+        self,
+        network: str,
+        snapshot: str,
+        query_dict: QueryDict,
+        output_dir: str,
+        writer: QueryResultWriter,
+        query_done: Optional[Callable[[QuerySummaryDict], None]] = None,
     ) -> List[QuerySummaryDict]:
         """Exec batfish query
         Args:
             network (str): Network name
             snapshot (str): Snapshot name
-            query_dict (BfqDict): Query dict
+            query_dict (QueryDict): Batfish query dict
             output_dir (str): Query result output directory
+            writer (QueryResultWriter): Query result writer
+            query_done (Optional[Callable[[QuerySummaryDict], None]]): Called with query summary of a query
+              as soon as the query finished
         Returns:
-            List[QuerySummaryDict]: Query summaries
+            List[QuerySummaryDict]: Query summaries (in order of query dict)
+        Note:
+            Queries are executed concurrently up to `query_concurrency` (with sessions in session pool)
+            in order of priority in query catalog.
         """
-        self.bf_session.set_network(network)
-        self.bf_session.set_snapshot(snapshot.replace("/", "_"))
-        results = []
-        # exec query
-        for query in query_dict:
-            self.logger.info("Exec Batfish Query = %s", query)
-            csv_file_path = path.join(output_dir, query + ".csv")
-            self._save_df_as_csv(query_dict[query](self.bf_session).answer().frame(), csv_file_path)
-            results.append({"query": f"batfish/{query}", "file": csv_file_path})
-        return results
+        bf_snapshot = snapshot.replace("/", "_")
+
+        def _exec(query: str) -> QuerySummaryDict:
+            summary = self._exec_bf_single_query(network, bf_snapshot, query, query_dict[query], output_dir, writer)
+            if query_done is not None:
+                query_done(summary)
+            return summary
+
+        # submit queries in order of priority, but return summaries in order of query dict
+        if self.query_concurrency <= 1 or len(query_dict) <= 1:
+            summaries = {query: _exec(query) for query in QueryCatalog.execution_order(query_dict)}
+            return [summaries[query] for query in query_dict]
+
+        with ThreadPoolExecutor(max_workers=self.query_concurrency, thread_name_prefix="bfwrapper-query") as executor:
+            futures = {query: executor.submit(_exec, query) for query in QueryCatalog.execution_order(query_dict)}
+            return [futures[query].result() for query in query_dict]
 
     @staticmethod
     def _snapshot_path(base_dir: str, network: str, snapshot: str) -> str:
@@ -117,24 +238,50 @@ class BatfishQueryThrower(BatfishRegistrant):
         """
         return path.join(base_dir, network, *snapshot.split("__"))
 
-    def _exec_other_query(
-        self, network: str, snapshot: str, query_dict: OqDict, output_dir: str
+    def snapshot_output_dir(self, network: str, snapshot: str) -> str:
+        """Get query result output directory of a snapshot
+        Args:
+            network (str): Network name
+            snapshot (str): Snapshot name
+        Returns:
+            str: Output directory path (queries_dir/network/snapshot)
+        """
+        return self._snapshot_path(self.queries_dir, network, snapshot)
+
+    def _exec_other_query(  # pylint: disable=too-many-arguments
+        self,
+        network: str,
+        snapshot: str,
+        query_dict: QueryDict,
+        output_dir: str,
+        writer: QueryResultWriter,
+        query_done: Optional[Callable[[QuerySummaryDict], None]] = None,
     ) -> List[QuerySummaryDict]:
         """Exec other query
         Args:
             network (str): Network name
             snapshot (str): Snapshot name
-            query_dict (OqDict): Query dict
+            query_dict (QueryDict): Other query dict
             output_dir (str): Query result output directory
+            writer (QueryResultWriter): Query result writer
+            query_done (Optional[Callable[[QuerySummaryDict], None]]): Called with query summary of a query
+              as soon as the query finished
         Returns:
             List[QuerySummaryDict]: Query summaries
         """
         results = []
         for query in query_dict:
             self.logger.info("Exec Other Query = %s", query)
-            csv_file_path = path.join(output_dir, query + ".csv")
-            self._save_df_as_csv(query_dict[query](self, network, snapshot), csv_file_path)
-            results.append({"query": f"other/{query}", "file": csv_file_path})
+            file_path = writer.file_path(output_dir, query)
+            started_at = time.perf_counter()
+            query_def = query_dict[query]
+            dataframe = query_def.project(OTHER_QUERY_DICT[query_def.question](self, network, snapshot))
+            answered_at = time.perf_counter()
+            rows = writer.write(dataframe, file_path)
+            timings = self._timings(answer=answered_at - started_at, serialize=time.perf_counter() - answered_at)
+            results.append(self._query_summary("other", query, file_path, rows, timings))
+            if query_done is not None:
+                query_done(results[-1])
         return results
 
     @staticmethod
@@ -169,14 +316,339 @@ class BatfishQueryThrower(BatfishRegistrant):
             l1topology_opr.filter_edges(l1topology_edges, snapshot_pattern.lost_edges)
         )
 
-    def exec_queries(self, network: str, snapshot: str, query: Optional[str] = None) -> WholeQuerySummaryDict:
+    def _query_cache_keys(
+        self, fingerprint: Optional[str], query_dict: QueryDict, writer: QueryResultWriter
+    ) -> Dict[str, str]:
+        """Make cache keys of query results
+        Args:
+            fingerprint (Optional[str]): Fingerprint of snapshot input
+              (logical snapshot fingerprint includes deactivated interfaces)
+            query_dict (QueryDict): Query dict
+            writer (QueryResultWriter): Query result writer (output options)
+        Returns:
+            Dict[str, str]: Query name and its cache key (empty if the snapshot input is unknown)
+        """
+        if fingerprint is None:
+            return {}
+        return {
+            query: self.query_cache.make_key(
+                version=QUERY_CACHE_VERSION,
+                fingerprint=fingerprint,
+                query=query,
+                definition=query_def.definition(),
+                **writer.cache_key_elements(),
+            )
+            for query, query_def in query_dict.items()
+        }
+
+    def _restore_cached_results(  # pylint: disable=too-many-arguments
+        self,
+        query_kind: str,
+        query_dict: QueryDict,
+        cache_keys: Dict[str, str],
+        output_dir: str,
+        writer: QueryResultWriter,
+    ) -> Dict[str, QuerySummaryDict]:
+        """Restore cached query results to output directory
+        Args:
+            query_kind (str): Query kind ("batfish" or "other")
+            query_dict (QueryDict): Query dict
+            cache_keys (Dict[str, str]): Query name and its cache key
+            output_dir (str): Query result output directory
+            writer (QueryResultWriter): Query result writer
+        Returns:
+            Dict[str, QuerySummaryDict]: Query name and its summary (restored queries only)
+        """
+        summaries = {}
+        for query in query_dict:
+            file_path = writer.file_path(output_dir, query)
+            started_at = time.perf_counter()
+            if query in cache_keys and self.query_cache.restore(cache_keys[query], file_path):
+                self.logger.info("Restore cached query result = %s", query)
+                rows = self.query_cache.rows(cache_keys[query])
+                timings = self._timings(serialize=time.perf_counter() - started_at)
+                summaries[query] = self._query_summary(query_kind, query, file_path, rows, timings, cached=True)
+        return summaries
+
+    def _derive_logical_results(
+        self, network: str, snapshot: str, query_dict: QueryDict, output_dir: str, writer: QueryResultWriter
+    ) -> Dict[str, QuerySummaryDict]:
+        """Derive config-only query results of logical snapshot from cached results of its physical snapshot
+        Args:
+            network (str): Network name
+            snapshot (str): Snapshot name (logical)
+            query_dict (QueryDict): Batfish query dict
+            output_dir (str): Query result output directory
+            writer (QueryResultWriter): Query result writer
+        Returns:
+            Dict[str, QuerySummaryDict]: Query name and its summary (derived queries only)
+        Note:
+            Only "config" queries (dependency in query catalog) are derived: their results depend only on configs
+            shared with the physical snapshot. Others (and "config" queries whose physical results are not cached,
+            e.g. evicted) are sent to batfish.
+        """
+        snapshot_pattern = self._find_snapshot_pattern(network, snapshot)
+        if snapshot_pattern is None:
+            return {}
+        config_query_dict = {q: d for q, d in query_dict.items() if d.dependency == "config"}
+        physical_cache_keys = self._query_cache_keys(
+            self.snapshot_input_fingerprint(network, snapshot_pattern.orig_snapshot_name),
+            config_query_dict,
+            writer,
+        )
+
+        summaries = {}
+        for query in physical_cache_keys:
+            file_path = writer.file_path(output_dir, query)
+            started_at = time.perf_counter()
+            if not self.query_cache.restore(physical_cache_keys[query], file_path):
+                self.logger.info("Physical snapshot result is not cached, exec query = %s", query)
+                continue
+            rows = self.query_cache.rows(physical_cache_keys[query])
+            self.logger.info("Derive query result from physical snapshot = %s", query)
+            timings = self._timings(serialize=time.perf_counter() - started_at)
+            summaries[query] = self._query_summary("batfish", query, file_path, rows, timings, derived=True)
+        return summaries
+
+    def _store_cached_results(self, summaries: List[QuerySummaryDict], cache_keys: Dict[str, str]) -> None:
+        """Store query results to cache
+        Args:
+            summaries (List[QuerySummaryDict]): Query summaries (executed queries)
+            cache_keys (Dict[str, str]): Query name and its cache key
+        Returns:
+            None
+        """
+        for summary in summaries:
+            query = summary["query"].split("/", 1)[1]
+            if query in cache_keys and self.query_cache.store(cache_keys[query], summary["file"], summary["rows"]):
+                self.logger.info("Share identical query result = %s", query)
+                self.metrics.inc(
+                    "bfwrapper_query_deduplicated_bytes_total", {"query": summary["query"]}, summary["size"]
+                )
+
+    def _unregistered_status(self, network: str, snapshot: str) -> RegisterStatus:
+        """Status of a snapshot that is not registered (all query results are restored from cache)
+        Args:
+            network (str): Network name
+            snapshot (str): Snapshot name
+        Returns:
+            RegisterStatus: Register status (includes snapshot pattern data for logical snapshot)
+        """
+        if self._is_physical_snapshot(network, snapshot):
+            return RegisterStatus(network, snapshot, "cached")
+        return RegisterStatus(network, snapshot, "cached", self._find_snapshot_pattern(network, snapshot))
+
+    def _make_query_results(  # pylint: disable=too-many-arguments
+        self,
+        network: str,
+        snapshot: str,
+        fingerprint: Optional[str],
+        bf_query_dict: QueryDict,
+        other_query_dict: QueryDict,
+        output_dir: str,
+        force_refresh: bool,
+        writer: QueryResultWriter,
+        finished_queries: Optional[List[str]] = None,
+        query_done: Optional[Callable[[QuerySummaryDict], None]] = None,
+    ) -> Tuple[List[QuerySummaryDict], RegisterStatus, float]:
+        """Make query results (restore cached results and exec queries for cache-missed ones)
+        Args:
+            network (str): Network name
+            snapshot (str): Snapshot name
+            fingerprint (Optional[str]): Fingerprint of snapshot input (None if the snapshot is not found)
+            bf_query_dict (QueryDict): Batfish query dict
+            other_query_dict (QueryDict): Other query dict
+            output_dir (str): Query result output directory
+            force_refresh (bool): True to exec all queries without query result cache
+            writer (QueryResultWriter): Query result writer
+            finished_queries (Optional[List[str]]): Queries finished in the resumed run
+              (restored from query result cache even if force_refresh)
+            query_done (Optional[Callable[[QuerySummaryDict], None]]): Called with query summary of an executed
+              query as soon as its result is stored to query result cache
+        Returns:
+            Tuple[List[QuerySummaryDict], RegisterStatus, float]: Query summaries (in order of query dicts),
+              register status and time to register the snapshot [sec] (0 if not registered)
+        """
+        # restore cached query results
+        cache_keys = self._query_cache_keys(fingerprint, {**bf_query_dict, **other_query_dict}, writer)
+        restore_queries = (finished_queries or []) if force_refresh else list(bf_query_dict) + list(other_query_dict)
+        summaries = {}
+        for query_kind, query_dict in [("batfish", bf_query_dict), ("other", other_query_dict)]:
+            restore_dict = {q: d for q, d in query_dict.items() if q in restore_queries}
+            summaries.update(self._restore_cached_results(query_kind, restore_dict, cache_keys, output_dir, writer))
+        exec_bf_query_dict = {q: d for q, d in bf_query_dict.items() if q not in summaries}
+        exec_other_query_dict = {q: d for q, d in other_query_dict.items() if q not in summaries}
+
+        # make models from snapshot (derive logical snapshot results from cached physical ones unless refresh)
+        exec_summaries = []
+        if not force_refresh and not self._is_physical_snapshot(network, snapshot):
+            derived_summaries = self._derive_logical_results(network, snapshot, exec_bf_query_dict, output_dir, writer)
+            self._store_cached_results(list(derived_summaries.values()), cache_keys)
+            exec_summaries.extend(derived_summaries.values())
+            exec_bf_query_dict = {q: d for q, d in exec_bf_query_dict.items() if q not in derived_summaries}
+
+        # store each result to cache as soon as it is made (to restore it when the snapshot is resumed after failure)
+        def _query_done(summary: QuerySummaryDict) -> None:
+            self._store_cached_results([summary], cache_keys)
+            if query_done is not None:
+                query_done(summary)
+
+        register_time = 0.0
+        if exec_bf_query_dict:
+            with self.bf_session_pool.pinned(network, snapshot):
+                started_at = time.perf_counter()
+                status = self.register_snapshot(network, snapshot, overwrite=True)
+                register_time = time.perf_counter() - started_at
+                exec_summaries.extend(
+                    self._exec_bf_query(network, snapshot, exec_bf_query_dict, output_dir, writer, _query_done)
+                )
+        else:
+            status = self._unregistered_status(network, snapshot)
+        exec_summaries.extend(
+            self._exec_other_query(network, snapshot, exec_other_query_dict, output_dir, writer, _query_done)
+        )
+
+        summaries.update({s["query"].split("/", 1)[1]: s for s in exec_summaries})
+        return [summaries[q] for q in list(bf_query_dict) + list(other_query_dict)], status, register_time
+
+    def _diff_query_result(
+        self, network: str, snapshot_pattern: SnapshotPattern, query: str, output_dir: str
+    ) -> Optional[QueryDiffSummaryDict]:
+        """Compare a query result of logical snapshot with the one of its physical snapshot and write the diff
+        Args:
+            network (str): Network name
+            snapshot_pattern (SnapshotPattern): Snapshot pattern of the logical snapshot
+            query (str): Query name
+            output_dir (str): Query result output directory of the logical snapshot
+        Returns:
+            Optional[QueryDiffSummaryDict]: Diff summary or None if there are no results to compare
+        Note:
+            The diff is written next to the query result in same format, as a result of query "<query>.diff"
+            (e.g. routes.diff.csv): it can be read with the query result read API.
+        """
+        target_file = QueryResultStore.result_files(output_dir).get(query)
+        base = self.result_store.get(self.snapshot_output_dir(network, snapshot_pattern.orig_snapshot_name), query)
+        if target_file is None or base is None:
+            return None
+        _query, writer = parse_result_file_name(path.basename(target_file))
+        _query, base_writer = parse_result_file_name(path.basename(base.file_path))
+        if writer.cache_key_elements() != base_writer.cache_key_elements():
+            self.logger.warning("Skip diff of %s: output format differs from physical snapshot result", query)
+            return None
+
+        target = writer.read(target_file)
+        keys = diff_keys(query, base.dataframe, target)
+        diff = diff_dataframes(base.dataframe, target, keys)
+        diff_file = writer.file_path(output_dir, diff_query_name(query))
+        # replace the diff file at once (not to show partial diff to readers)
+        writer.write(diff, diff_file + ".tmp")
+        os.replace(diff_file + ".tmp", diff_file)
+        self.logger.info("Diff from physical snapshot = %s", query)
+        return {
+            "query": query,
+            "snapshot": snapshot_pattern.target_snapshot_name,
+            "file": diff_file,
+            "keys": keys,
+            **count_diff(diff, keys),
+        }
+
+    def _diff_query_results(
+        self, network: str, snapshot_pattern: Optional[SnapshotPattern], query_dict: QueryDict, output_dir: str
+    ) -> List[QueryDiffSummaryDict]:
+        """Compare query results of logical snapshot with the ones of its physical snapshot
+        Args:
+            network (str): Network name
+            snapshot_pattern (Optional[SnapshotPattern]): Snapshot pattern of the logical snapshot
+              (None for physical snapshot: nothing to compare)
+            query_dict (QueryDict): Query dict
+            output_dir (str): Query result output directory of the logical snapshot
+        Returns:
+            List[QueryDiffSummaryDict]: Diff summaries
+        Note:
+            "config" queries (dependency in query catalog) are skipped: they are same as physical snapshot.
+        """
+        if snapshot_pattern is None:
+            return []
+        diffs = []
+        for query, query_def in query_dict.items():
+            if query_def.dependency == "config":
+                continue
+            diff = self._diff_query_result(network, snapshot_pattern, query, output_dir)
+            if diff is not None:
+                diffs.append(diff)
+        return diffs
+
+    def diff_query_results(
+        self, network: str, snapshot: Optional[str] = None, query: Optional[str] = None
+    ) -> List[QueryDiffSummaryDict]:
+        """Compare stored query results of logical snapshots with the ones of their physical snapshot
+        Args:
+            network (str): Network name
+            snapshot (Optional[str]): Physical snapshot name (to compare all logical snapshots in it)
+              or logical snapshot name (default: all logical snapshots in the network)
+            query (Optional[str]): Query name to limit target query
+        Returns:
+            List[QueryDiffSummaryDict]: Diff summaries
+        Note:
+            Diffs are made when queries are executed for logical snapshot (see exec_queries).
+            Use this to remake them from stored query results without batfish query.
+        """
+        if snapshot is None:
+            logical_snapshots = self._find_all_logical_snapshots(self._find_all_physical_snapshots(network))
+            snapshot_names = [path.join(*s[1:]) for s in logical_snapshots]
+        elif self._is_physical_snapshot(network, snapshot):
+            snapshot_names = [s[1] for s in self._find_all_logical_snapshots([[network, snapshot]])]
+        else:
+            snapshot_names = [snapshot]
+        query_dict = self.query_catalog.select(query=query) if query else self.query_catalog.queries
+
+        diffs = []
+        for snapshot_name in snapshot_names:
+            snapshot_pattern = self._find_snapshot_pattern(network, snapshot_name)
+            output_dir = self.snapshot_output_dir(network, snapshot_name)
+            diffs.extend(self._diff_query_results(network, snapshot_pattern, query_dict, output_dir))
+        return diffs
+
+    def exec_queries(  # pylint: disable=too-many-arguments
+        self,
+        network: str,
+        snapshot: str,
+        query: Optional[str] = None,
+        force_refresh: bool = False,
+        writer: Optional[QueryResultWriter] = None,
+        profile: Optional[str] = None,
+        finished_queries: Optional[List[str]] = None,
+        query_done: Optional[Callable[[QuerySummaryDict], None]] = None,
+    ) -> WholeQuerySummaryDict:
         """Exec queries for a snapshot
         Args:
             network (str): Network name
             snapshot (str): Snapshot name
             query (Optional[str]): Query name to limit target query
+            force_refresh (bool): True to exec all queries without query result cache
+            writer (Optional[QueryResultWriter]): Query result writer (default: csv)
+            profile (Optional[str]): Query profile in query catalog (default: default profile of the catalog)
+            finished_queries (Optional[List[str]]): Queries finished in a resumed run
+              (restored from query result cache even if force_refresh)
+            query_done (Optional[Callable[[QuerySummaryDict], None]]): Called with query summary of an executed
+              query as soon as its result is stored to query result cache
         Returns:
               WholeQuerySummaryDict: Query summary
+        Raises:
+            ValueError: Unknown query profile
+        Note:
+            Query results are cached with fingerprint of the snapshot input (with deactivated interfaces for
+            logical snapshot) and definition of the query. Cached results are restored without batfish query.
+            Config-derived query results of logical snapshot are derived from cached results of its physical
+            snapshot (see dependency in query catalog). With force_refresh, neither is used (all queries are executed).
+            Batfish queries are executed in order of priority in query catalog, and summaries are listed in order
+            of definition in the catalog.
+            Query results are made in a staging directory and it replaces the output directory when all results
+            are ready: readers see results of previous generation until then (or if failed).
+            Without force_refresh, results of other queries (not in target) in the previous generation are kept
+            if it was made from the same snapshot input with the same output format (recorded in the generation).
+            For logical snapshot, diffs from the results of its physical snapshot are made with the results
+            (see diff_query_results).
         """
         # print-omit avoidance
         pd.set_option("display.width", 300)
@@ -188,18 +660,16 @@ class BatfishQueryThrower(BatfishRegistrant):
         # if this option is not set ("[a,b,c,...]" ).
         pd.set_option("display.max_seq_items", None)
 
-        # limiting target query when using --query arg
-        bf_query_dict = BF_QUERY_DICT
-        other_query_dict = OTHER_QUERY_DICT
-        if query:
-            bf_query_dict = {query: BF_QUERY_DICT[query]} if query in BF_QUERY_DICT else {}
-            other_query_dict = {query: OTHER_QUERY_DICT[query]} if query in OTHER_QUERY_DICT else {}
+        # select queries in the profile (limiting target query when using --query arg)
+        query_dict = self.query_catalog.select(profile, query)
+        bf_query_dict = {q: d for q, d in query_dict.items() if d.kind == "batfish"}
+        other_query_dict = {q: d for q, d in query_dict.items() if d.kind == "other"}
 
         input_dir = self._snapshot_path(self.configs_dir, network, snapshot)
-        output_dir = self._snapshot_path(self.queries_dir, network, snapshot)
+        output_dir = self.snapshot_output_dir(network, snapshot)
         self.logger.info("Network/snapshot   : %s/%s", network, snapshot)
         self.logger.info("Input snapshot dir : %s", input_dir)
-        self.logger.info("Output csv     dir : %s", output_dir)
+        self.logger.info("Output result  dir : %s", output_dir)
         result: WholeQuerySummaryDict = {
             "network": network,
             "snapshot": snapshot,
@@ -208,37 +678,303 @@ class BatfishQueryThrower(BatfishRegistrant):
             "queries": [],
         }
 
-        # clear output dir if exists
-        if path.isdir(output_dir):
-            shutil.rmtree(output_dir)
+        # make new query results in staging dir and swap it with output dir
+        # (results of previous generation are kept until the swap, or if failed)
+        if writer is None:
+            writer = QueryResultWriter()
+        fingerprint = self.snapshot_input_fingerprint(network, snapshot)
+        generation = {"version": QUERY_CACHE_VERSION, "fingerprint": fingerprint, **writer.cache_key_elements()}
+        staging_dir = prepare_staging_dir(
+            output_dir, keep_previous=not force_refresh and fingerprint is not None, generation=generation
+        )
+        try:
+            self._remove_unknown_results(staging_dir)
+            summaries, status, register_time = self._make_query_results(
+                network,
+                snapshot,
+                fingerprint,
+                bf_query_dict,
+                other_query_dict,
+                staging_dir,
+                force_refresh,
+                writer,
+                finished_queries,
+                query_done,
+            )
+            self._save_snapshot_pattern(status, staging_dir)
+            diffs = self._diff_query_results(network, status.snapshot_pattern, query_dict, staging_dir)
+            commit_staging_dir(staging_dir, output_dir, self.output_generations)
+        finally:
+            discard_staging_dir(staging_dir)  # nothing to do if committed
 
-        # make models from snapshot
-        makedirs(output_dir, exist_ok=True)
-        status = self.register_snapshot(network, snapshot, overwrite=True)
-        result["queries"].extend(self._exec_bf_query(network, snapshot, bf_query_dict, output_dir))
-        result["queries"].extend(self._exec_other_query(network, snapshot, other_query_dict, output_dir))
+        for summary in summaries + diffs:
+            summary["file"] = path.join(output_dir, path.basename(summary["file"]))
+        result["queries"].extend(summaries)
+        result["diffs"] = diffs
+        result["register_time"] = register_time
         if status.snapshot_pattern is not None:
             result["snapshot_pattern"] = status.snapshot_pattern.to_dict()
-        self._save_snapshot_pattern(status, output_dir)
+        self._record_metrics(result, status.status)
 
         return result
 
-    def exec_queries_for_all_snapshots(self, network: str, query: Optional[str]) -> List[WholeQuerySummaryDict]:
+    def _remove_unknown_results(self, output_dir: str) -> None:
+        """Remove results of queries that are not in query catalog (kept from the previous generation)
+        Args:
+            output_dir (str): Query result output directory (staging directory)
+        Returns:
+            None
+        """
+        for file_name in os.listdir(output_dir):
+            parsed = parse_result_file_name(file_name)
+            if parsed is None:
+                continue
+            query = parsed[0][: -len(DIFF_QUERY_SUFFIX)] if parsed[0].endswith(DIFF_QUERY_SUFFIX) else parsed[0]
+            if query not in self.query_catalog.queries:
+                self.logger.info("Remove result of unknown query: %s", file_name)
+                os.remove(path.join(output_dir, file_name))
+
+    def _record_metrics(self, result: WholeQuerySummaryDict, register_status: str) -> None:
+        """Record query timings and sizes to metrics
+        Args:
+            result (WholeQuerySummaryDict): Query summary of a snapshot
+            register_status (str): Register status of the snapshot
+        Returns:
+            None
+        """
+        snapshot_type = "logical" if "snapshot_pattern" in result else "physical"
+        if register_status in ("registered", "forked"):
+            self.metrics.observe(
+                "bfwrapper_snapshot_register_seconds", {"snapshot_type": snapshot_type}, result["register_time"]
+            )
+        for summary in result["queries"]:
+            labels = {"query": summary["query"], "snapshot_type": snapshot_type}
+            source = "cache" if summary["cached"] else "derived" if summary["derived"] else "query"
+            self.metrics.inc("bfwrapper_query_results_total", {**labels, "source": source})
+            self.metrics.inc("bfwrapper_query_rows_total", labels, summary["rows"] or 0)
+            self.metrics.inc("bfwrapper_query_bytes_total", labels, summary["size"])
+            if source != "query":
+                continue  # not to mix restore time into query latency
+            for phase, seconds in summary["timings"].items():
+                self.metrics.observe("bfwrapper_query_phase_seconds", {**labels, "phase": phase}, seconds)
+
+    def _exec_queries_with_manifest(
+        self,
+        run_manifest: RunManifest,
+        network: str,
+        snapshot: str,
+        query: Optional[str],
+        force_refresh: bool,
+        writer: Optional[QueryResultWriter],
+        profile: Optional[str],
+    ) -> WholeQuerySummaryDict:
+        """Exec queries for a snapshot and record the result to run manifest
+        Args:
+            run_manifest (RunManifest): Run manifest
+            network (str): Network name
+            snapshot (str): Snapshot name
+            query (Optional[str]): Query name to limit target query
+            force_refresh (bool): True to exec all queries without query result cache
+            writer (Optional[QueryResultWriter]): Query result writer (default: csv)
+            profile (Optional[str]): Query profile
+        Returns:
+            WholeQuerySummaryDict: Query summary
+        Raises:
+            Exception: Error in exec queries (recorded as failed)
+        """
+        fingerprint = self.snapshot_input_fingerprint(network, snapshot)
+        finished_queries = run_manifest.finished_queries(snapshot, fingerprint)
+        if finished_queries:
+            self.logger.info("Resume snapshot %s/%s, finished queries: %s", network, snapshot, finished_queries)
+
+        def _query_done(summary: QuerySummaryDict) -> None:
+            run_manifest.record_query_finished(snapshot, fingerprint, summary["query"].split("/", 1)[1])
+
+        try:
+            result = self.exec_queries(
+                network, snapshot, query, force_refresh, writer, profile, finished_queries, _query_done
+            )
+        except Exception as err:  # pylint: disable=broad-except
+            run_manifest.record_failed(snapshot, fingerprint, str(err))
+            raise
+        run_manifest.record_finished(snapshot, fingerprint, result)
+        return {**result, "resumed": False}
+
+    def _exec_queries_for_snapshots(  # pylint: disable=too-many-arguments
+        self,
+        network: str,
+        snapshot_names: List[str],
+        query: Optional[str],
+        concurrency: int,
+        progress: Callable[[WholeQuerySummaryDict], None],
+        run_manifest: RunManifest,
+        force_refresh: bool = False,
+        writer: Optional[QueryResultWriter] = None,
+        profile: Optional[str] = None,
+    ) -> List[WholeQuerySummaryDict]:
+        """Exec queries for snapshots concurrently
+        Args:
+            network (str): Network name
+            snapshot_names (List[str]): Snapshot names
+            query (Optional[str]): Query name to limit target query
+            concurrency (int): Number of snapshots processed concurrently
+            progress (Callable[[WholeQuerySummaryDict], None]): Called with query summary of a snapshot
+              when queries for the snapshot finished
+            run_manifest (RunManifest): Run manifest (skip snapshots finished in the run)
+            force_refresh (bool): True to exec all queries without query result cache
+            writer (Optional[QueryResultWriter]): Query result writer (default: csv)
+            profile (Optional[str]): Query profile
+        Returns:
+            List[WholeQuerySummaryDict]: Query summaries (in order of snapshot_names)
+        """
+        results: Dict[str, WholeQuerySummaryDict] = {}
+        for snapshot_name in snapshot_names:
+            summary = run_manifest.finished_summary(
+                snapshot_name, self.snapshot_input_fingerprint(network, snapshot_name)
+            )
+            if summary is not None:
+                self.logger.info("Skip snapshot finished in the run: %s/%s", network, snapshot_name)
+                results[snapshot_name] = {**summary, "resumed": True}
+                progress(results[snapshot_name])
+        exec_snapshot_names = [s for s in snapshot_names if s not in results]
+
+        if concurrency <= 1 or len(exec_snapshot_names) <= 1:
+            for snapshot_name in exec_snapshot_names:
+                self.logger.info("For all snapshots: %s/%s", network, snapshot_name)
+                results[snapshot_name] = self._exec_queries_with_manifest(
+                    run_manifest, network, snapshot_name, query, force_refresh, writer, profile
+                )
+                progress(results[snapshot_name])
+            return [results[s] for s in snapshot_names]
+
+        with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="bfwrapper-snapshot") as executor:
+            futures = {}
+            for snapshot_name in exec_snapshot_names:
+                self.logger.info("For all snapshots: %s/%s", network, snapshot_name)
+                future = executor.submit(
+                    self._exec_queries_with_manifest,
+                    run_manifest,
+                    network,
+                    snapshot_name,
+                    query,
+                    force_refresh,
+                    writer,
+                    profile,
+                )
+                futures[future] = snapshot_name
+            for future in as_completed(futures):
+                results[futures[future]] = future.result()  # raise if failed
+                progress(results[futures[future]])
+            return [results[s] for s in snapshot_names]
+
+    def _remove_stale_output_dirs(self, network: str, output_dirs: List[str]) -> None:
+        """Remove output directories of snapshots that are not found in configs directory
+        Args:
+            network (str): Network name
+            output_dirs (List[str]): Output directories of current snapshots
+        Returns:
+            None
+        """
+        network_dir = path.join(self.queries_dir, network)
+        if not path.isdir(network_dir):
+            return
+        for name in os.listdir(network_dir):
+            entry = path.join(network_dir, name)
+            if name.startswith(".") or not path.isdir(entry):
+                continue  # generation/staging directory (removed with its output dir) or file
+            if not any(d == entry or d.startswith(entry + os.sep) for d in output_dirs):
+                self.logger.info("Remove stale output dir: %s", entry)
+                remove_output_dir(entry)
+
+    def exec_queries_for_all_snapshots(  # pylint: disable=too-many-arguments
+        self,
+        network: str,
+        query: Optional[str],
+        progress_callback: Optional[Callable[[int, int, QueryProgressDict], None]] = None,
+        snapshot_concurrency: int = 1,
+        force_refresh: bool = False,
+        writer: Optional[QueryResultWriter] = None,
+        resume: bool = False,
+        result_callback: Optional[Callable[[WholeQuerySummaryDict], None]] = None,
+        profile: Optional[str] = None,
+    ) -> List[WholeQuerySummaryDict]:
         """Exec queries for ALL snapshots
         Args:
             network (str): Network name
             query  (Optional[str]): Query name to limit target query
+            progress_callback (Optional[Callable[[int, int, QueryProgressDict], None]]): Called with
+              (number of finished snapshots, number of all snapshots, finished snapshot) for each snapshot
+            snapshot_concurrency (int): Number of snapshots processed concurrently
+            force_refresh (bool): True to exec all queries without query result cache
+            writer (Optional[QueryResultWriter]): Query result writer (default: csv)
+            resume (bool): True to resume the previous run (skip snapshots finished in the run)
+            result_callback (Optional[Callable[[WholeQuerySummaryDict], None]]): Called with query summary
+              of each snapshot as soon as it is finished (in order of completion)
+            profile (Optional[str]): Query profile in query catalog (default: default profile of the catalog)
         Returns:
-            List[WholeQuerySummary]: Query summaries
+            List[WholeQuerySummary]: Query summaries (physical snapshots at first, then logical snapshots)
+        Note:
+            All physical snapshots are processed before logical snapshots (forked from physical ones).
+            Concurrency for logical snapshots is limited by size of residency pool
+            not to evict logical snapshots in process each other.
+            Each snapshot output directory is replaced when its results are ready (see exec_queries).
+            With force_refresh, output directories of snapshots that no longer exist are removed after all.
+            Finished/failed snapshots are recorded in run manifest (queries_dir/network/.run_manifest.json).
+            With resume, snapshots finished in the previous run with same options and same input are skipped
+            (their summaries are taken from the manifest, "resumed" is true) and others are executed again.
+            Finished queries of a failed snapshot are restored from query result cache.
+        Raises:
+            ValueError: Unknown query profile
         """
-        # clear output dir if exists
-        models_snapshot_base_dir = path.join(self.queries_dir, network)
-        if path.isdir(models_snapshot_base_dir):
-            shutil.rmtree(models_snapshot_base_dir)
+        phy_snapshots = self._find_all_physical_snapshots(network)
+        phy_snapshot_names = [path.join(*s[1:]) for s in phy_snapshots]
+        log_snapshot_names = [path.join(*s[1:]) for s in self._find_all_logical_snapshots(phy_snapshots)]
+        total = len(phy_snapshot_names) + len(log_snapshot_names)
+        finished = []
 
-        results = []
-        for snapshot in self.snapshots_in_network(network):
-            snapshot_name = path.join(*snapshot[1:])
-            self.logger.info("For all snapshots: %s/%s", network, snapshot_name)
-            results.append(self.exec_queries(network, snapshot_name, query))
+        def _progress(result: WholeQuerySummaryDict) -> None:
+            finished.append(result["snapshot"])
+            if progress_callback is not None:
+                progress_callback(len(finished), total, {"network": network, "snapshot": result["snapshot"]})
+            if result_callback is not None:
+                result_callback(result)
+
+        self.query_catalog.select(profile)  # check profile before the run
+        if writer is None:
+            writer = QueryResultWriter()
+        run_manifest = RunManifest(
+            path.join(self.queries_dir, network, ".run_manifest.json"),
+            network,
+            {"query": query, "profile": profile, "force_refresh": force_refresh, **writer.cache_key_elements()},
+            resume,
+        )
+        log_concurrency = min(snapshot_concurrency, self.residency_pool.max_size)
+        if log_concurrency < snapshot_concurrency:
+            self.logger.info("Concurrency for logical snapshots is limited by residency pool: %s", log_concurrency)
+        results = self._exec_queries_for_snapshots(
+            network,
+            phy_snapshot_names,
+            query,
+            snapshot_concurrency,
+            _progress,
+            run_manifest,
+            force_refresh,
+            writer,
+            profile,
+        )
+        results.extend(
+            self._exec_queries_for_snapshots(
+                network,
+                log_snapshot_names,
+                query,
+                log_concurrency,
+                _progress,
+                run_manifest,
+                force_refresh,
+                writer,
+                profile,
+            )
+        )
+        if force_refresh:
+            self._remove_stale_output_dirs(network, [r["queries_dir"] for r in results])
         return results
@@ -1,11 +1,24 @@
 """
 Definition of BatfishRegistrant class
 """
-from typing import List, Dict, Optional, Any
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Optional, Any, Tuple
 import pandas as pd
 from pybatfish.datamodel.flow import HeaderConstraints
 from bf_registrant_base import BatfishRegistrantBase, SnapshotPattern
-from bf_wrapper_types import SnapshotPatternDict, TracerouteQueryStatus
+from raw_table_answer import RawTableAnswer
+from interface_address_index import InterfaceAddressIndex
+from bf_wrapper_types import (
+    SnapshotPatternDict,
+    TracerouteQueryStatus,
+    TracerouteFlowDict,
+    TraceroutePatternSummaryDict,
+    TracerouteFanoutDict,
+)
+
+# protocols of routes that are not changed by link-down out of the path (except ECMP)
+# (prefix of protocol name, e.g. "ospfIA", "isisL2")
+PATH_STABLE_ROUTE_PROTOCOLS = ("connected", "local", "static", "ospf", "isis")
 
 
 class BatfishRegistrant(BatfishRegistrantBase):
@@ -19,10 +32,21 @@ class BatfishRegistrant(BatfishRegistrantBase):
         Returns:
             pd.DataFrame: Query answer
         """
-        self.bf_session.set_network(network)
-        self.bf_session.set_snapshot(snapshot)
-        # pylint: disable=no-member
-        return self.bf_session.q.nodeProperties().answer().frame()
+        with self.bf_session_pool.session(network, snapshot) as bf_session:
+            # pylint: disable=no-member
+            return bf_session.q.nodeProperties().answer().frame()
+
+    def bf_node_list_raw(self, network: str, snapshot: str) -> RawTableAnswer:
+        """Query node properties table to batfish (without converting cells to pybatfish objects)
+        Args:
+            network (str): Network name
+            snapshot (str): Snapshot name
+        Returns:
+            RawTableAnswer: Query answer
+        """
+        with self.bf_session_pool.session(network, snapshot) as bf_session:
+            # pylint: disable=no-member
+            return RawTableAnswer.ask(bf_session, bf_session.q.nodeProperties())
 
     def bf_interface_list(self, network: str, snapshot: str) -> pd.DataFrame:
         """Query interface properties to batfish
@@ -32,10 +56,21 @@ class BatfishRegistrant(BatfishRegistrantBase):
         Returns:
             pd.DataFrame: Query answer
         """
-        self.bf_session.set_network(network)
-        self.bf_session.set_snapshot(snapshot)
-        # pylint: disable=no-member
-        return self.bf_session.q.interfaceProperties().answer().frame()
+        with self.bf_session_pool.session(network, snapshot) as bf_session:
+            # pylint: disable=no-member
+            return bf_session.q.interfaceProperties().answer().frame()
+
+    def bf_interface_list_raw(self, network: str, snapshot: str) -> RawTableAnswer:
+        """Query interface properties to batfish (without converting cells to pybatfish objects)
+        Args:
+            network (str): Network name
+            snapshot (str): Snapshot name
+        Returns:
+            RawTableAnswer: Query answer
+        """
+        with self.bf_session_pool.session(network, snapshot) as bf_session:
+            # pylint: disable=no-member
+            return RawTableAnswer.ask(bf_session, bf_session.q.interfaceProperties())
 
     def bf_node_interface_list(self, network: str, snapshot: str, node: str) -> pd.DataFrame:
         """Query interface properties with node
@@ -46,37 +81,48 @@ class BatfishRegistrant(BatfishRegistrantBase):
         Returns:
             pd.DataFrame: Query answer
         """
-        self.bf_session.set_network(network)
-        self.bf_session.set_snapshot(snapshot)
-        # pylint: disable=no-member
-        return self.bf_session.q.interfaceProperties(nodes=node).answer().frame()
+        with self.bf_session_pool.session(network, snapshot) as bf_session:
+            # pylint: disable=no-member
+            return bf_session.q.interfaceProperties(nodes=node).answer().frame()
 
-    def _get_interface_first_ip(self, network: str, snapshot: str, node: str, interface: str) -> [str, None]:
-        """Get ip address (without CIDR) of node and interface
+    def bf_node_interface_list_raw(self, network: str, snapshot: str, node: str) -> RawTableAnswer:
+        """Query interface properties with node (without converting cells to pybatfish objects)
         Args:
             network (str): Network name
             snapshot (str): Snapshot name
             node (str): Node name
-            interface (str): Interface name
         Returns:
-            [str, None]: IP address (without netmask "/x") or None if the interface doesn't have IP address
+            RawTableAnswer: Query answer
         """
-        self.bf_session.set_network(name=network)
-        self.bf_session.set_snapshot(name=snapshot)
-        intf_ip_prefix_list = (
+        with self.bf_session_pool.session(network, snapshot) as bf_session:
             # pylint: disable=no-member
-            # NOTE: normalize node name
-            self.bf_session.q.interfaceProperties(nodes=node.lower(), interfaces=interface)
-            .answer()
-            .frame()
-            .to_dict()["All_Prefixes"][0]
-        )
-        if len(intf_ip_prefix_list) < 1:
-            # e.g. for layer2 interface, it does not have ip address
-            return None
-
-        intf_ip_prefix = intf_ip_prefix_list[0]
-        return intf_ip_prefix[: intf_ip_prefix.find("/")]
+            return RawTableAnswer.ask(bf_session, bf_session.q.interfaceProperties(nodes=node))
+
+    def interface_address_index(self, network: str, snapshot: str) -> InterfaceAddressIndex:
+        """Get interface address index of a physical snapshot
+        Args:
+            network (str): Network name
+            snapshot (str): Snapshot name (physical)
+        Returns:
+            InterfaceAddressIndex: Interface address index
+        Note:
+            The index is made with an interfaceProperties query and kept while the snapshot input is not changed
+            (for recently used INTERFACE_ADDRESS_INDEX_SIZE snapshots).
+            Interface addresses of a logical snapshot are same as its physical snapshot (only deactivated).
+        """
+        fingerprint = self.snapshot_input_fingerprint(network, snapshot)
+        cached = self._cached_interface_address_index(network, snapshot, fingerprint)
+        if cached is not None:
+            return cached
+
+        self.logger.info("Make interface address index of %s/%s", network, snapshot)
+        with self.bf_session_pool.session(network, snapshot) as bf_session:
+            # pylint: disable=no-member
+            question = bf_session.q.interfaceProperties(properties="All_Prefixes, Channel_Group_Members")
+            index = InterfaceAddressIndex.from_answer(RawTableAnswer.ask(bf_session, question))
+        if fingerprint is not None:
+            self._keep_interface_address_index(network, snapshot, fingerprint, index)
+        return index
 
     def get_batfish_snapshots(self, network: Optional[str] = None) -> Dict[str, List[str]]:
         """Get snapshots from batfish
@@ -143,44 +189,72 @@ class BatfishRegistrant(BatfishRegistrantBase):
         Returns:
             List[Dict]: Query answer
         """
-        self.bf_session.set_network(name=network)
-        self.bf_session.set_snapshot(name=snapshot)
-        frame = (
-            # pylint: disable=no-member
-            self.bf_session.q.traceroute(
-                startLocation=f"@enter({node}[{intf}])",
-                headers=HeaderConstraints(srcIps=intf_ip, dstIps=destination),
+        with self.bf_session_pool.session(network, snapshot) as bf_session:
+            answer = RawTableAnswer.ask(
+                bf_session,
+                # pylint: disable=no-member
+                bf_session.q.traceroute(
+                    startLocation=f"@enter({node}[{intf}])",
+                    headers=HeaderConstraints(srcIps=intf_ip, dstIps=destination),
+                ),
             )
-            .answer()
-            .frame()
-        )
         # convert data
         return [
-            {"Flow": self._obj_to_dict(row["Flow"]), "Traces": self._obj_to_dict(row["Traces"])}
-            for _index, row in frame.iterrows()
+            {"Flow": self._obj_to_dict(flow), "Traces": self._obj_to_dict(traces)}
+            for flow, traces in zip(answer.column("Flow", rich=True), answer.column("Traces", rich=True))
         ]
 
+    @staticmethod
     def _find_ip_addr_from_lost_edges(
-        self,
-        network: str,
-        snapshot: str,
-        snapshot_pattern: SnapshotPattern,
-        target_ip: str,
+        index: InterfaceAddressIndex, snapshot_pattern: SnapshotPattern, target_ip: str
     ) -> [str, None]:
         """IP address list of lost_edge of the snapshot
         Args:
-            network (str): Network name
-            snapshot (str): Snapshot name
+            index (InterfaceAddressIndex): Interface address index of the physical snapshot
             snapshot_pattern (SnapshotPattern): Snapshot pattern
             target_ip (str): IP address to find
         Returns:
             [str, None]: Found ip address or None if not found
         """
-        ip_addrs = []
-        for edge in snapshot_pattern.lost_edges:
-            ip_addrs.append(self._get_interface_first_ip(network, snapshot, edge.node1.host, edge.node1.intf))
-            ip_addrs.append(self._get_interface_first_ip(network, snapshot, edge.node2.host, edge.node2.intf))
-        return next((ip for ip in ip_addrs if ip == target_ip), None)
+        lost_interfaces = {
+            (term.host.lower(), term.intf) for edge in snapshot_pattern.lost_edges for term in (edge.node1, edge.node2)
+        }
+        return target_ip if any(owner in lost_interfaces for owner in index.owners(target_ip)) else None
+
+    def _is_disabled_flow(  # pylint: disable=too-many-arguments
+        self,
+        network: str,
+        snapshot: str,
+        snapshot_pattern: Optional[SnapshotPattern],
+        index: InterfaceAddressIndex,
+        node: str,
+        intf: str,
+        destination: str,
+    ) -> bool:
+        """Test if source interface or destination of a flow is disabled in logical snapshot
+        Args:
+            network (str): Network name
+            snapshot (str): Snapshot name
+            snapshot_pattern (Optional[SnapshotPattern]): Snapshot pattern (None for physical snapshot)
+            index (InterfaceAddressIndex): Interface address index of the physical snapshot
+            node (str): Node name (source)
+            intf (str): Interface name (source)
+            destination (str): Traceroute destination
+        Returns:
+            bool: True if disabled (always False for physical snapshot)
+        """
+        if snapshot_pattern is None:
+            return False
+        # source node/interface is disabled?
+        if snapshot_pattern.owns_as_disabled_intf(node, intf):
+            self.logger.warning("traceroute: source %s[%s] is disabled in %s/%s", node, intf, network, snapshot)
+            return True
+        # destination ip is disabled?
+        # NOTICE: if the network/snapshot has duplicated ip address, it cannot work fine, probably.
+        if self._find_ip_addr_from_lost_edges(index, snapshot_pattern, destination):
+            self.logger.warning("traceroute: destination %s is disabled in %s/%s", destination, network, snapshot)
+            return True
+        return False
 
     @staticmethod
     def _traceroute_result(
@@ -219,25 +293,282 @@ class BatfishRegistrant(BatfishRegistrantBase):
         Returns:
             TracerouteQueryStatus: Query answer
         """
+        flow: TracerouteFlowDict = {"snapshot": snapshot, "node": node, "interface": intf, "destination": destination}
+        return self._exec_cached_traceroute_queries(network, snapshot, [flow])[0]
+
+    def exec_traceroute_queries(self, network: str, flows: List[TracerouteFlowDict]) -> List[TracerouteQueryStatus]:
+        """Query traceroute for many flows
+        Args:
+            network (str): Network name
+            flows (List[TracerouteFlowDict]): Flows (snapshot, source node/interface and destination)
+        Returns:
+            List[TracerouteQueryStatus]: Query answers (in order of flows)
+        Note:
+            Each snapshot is registered once and source/destination are pre-checked with interface address index
+            (not with queries for each flow). Same flows in a snapshot share a traceroute query, and traceroute queries
+            of a snapshot are executed concurrently with sessions in session pool.
+            Cached results are returned without registering the snapshot (see _exec_cached_traceroute_queries).
+        """
+        flow_indexes: Dict[str, List[int]] = {}
+        for index, flow in enumerate(flows):
+            flow_indexes.setdefault(flow["snapshot"], []).append(index)
+
+        results: List[Optional[TracerouteQueryStatus]] = [None] * len(flows)
+        for snapshot, indexes in flow_indexes.items():
+            snapshot_results = self._exec_cached_traceroute_queries(network, snapshot, [flows[i] for i in indexes])
+            for index, result in zip(indexes, snapshot_results):
+                results[index] = result
+        return results
+
+    def _exec_cached_traceroute_queries(
+        self, network: str, snapshot: str, flows: List[TracerouteFlowDict]
+    ) -> List[TracerouteQueryStatus]:
+        """Query traceroute for flows in a snapshot with traceroute result cache
+        Args:
+            network (str): Network name
+            snapshot (str): Snapshot name
+            flows (List[TracerouteFlowDict]): Flows in the snapshot
+        Returns:
+            List[TracerouteQueryStatus]: Query answers (in order of flows)
+        Note:
+            Results are cached with fingerprint of the snapshot input: the snapshot is registered and queried
+            only for cache-missed flows.
+        """
+        fingerprint = self.snapshot_input_fingerprint(network, snapshot)
+        keys: List[Optional[str]] = [None] * len(flows)
+        if fingerprint is not None:  # not cached if the snapshot is not found
+            keys = [
+                self.traceroute_cache.make_key(
+                    network, snapshot, fingerprint, flow["node"], flow["interface"], flow["destination"]
+                )
+                for flow in flows
+            ]
+        results = [self.traceroute_cache.get(key, network, snapshot) if key else None for key in keys]
+        missed_indexes = [i for i, result in enumerate(results) if result is None]
+        if not missed_indexes:
+            return results
+
+        # keep the snapshot in batfish (not to be evicted by other requests) while querying
+        with self.bf_session_pool.pinned(network, snapshot):
+            missed_results = self._exec_traceroute_queries(network, snapshot, [flows[i] for i in missed_indexes])
+        for index, result in zip(missed_indexes, missed_results):
+            results[index] = result
+            if keys[index] is not None:
+                self.traceroute_cache.put(keys[index], network, snapshot, result)
+        return results
+
+    def _exec_traceroute_queries(
+        self, network: str, snapshot: str, flows: List[TracerouteFlowDict]
+    ) -> List[TracerouteQueryStatus]:
+        """Query traceroute for flows in a snapshot (prepare snapshot and pre-check sources/destinations)
+        Args:
+            network (str): Network name
+            snapshot (str): Snapshot name
+            flows (List[TracerouteFlowDict]): Flows in the snapshot
+        Returns:
+            List[TracerouteQueryStatus]: Query answers (in order of flows)
+        """
         # prepare snapshot
         status = self.register_snapshot(network, snapshot)
         snapshot_pattern = status.snapshot_pattern
         # Use orig snapshot to query intf_ip
         orig_snapshot = snapshot_pattern.orig_snapshot_name if snapshot_pattern is not None else snapshot
-        intf_ip = self._get_interface_first_ip(network, orig_snapshot, node, intf)
+        index = self.interface_address_index(network, orig_snapshot)
 
-        # for logical snapshot
-        if snapshot_pattern is not None:
-            # source node/interface is disabled?
-            if snapshot_pattern.owns_as_disabled_intf(node, intf):
-                self.logger.warning("traceroute: source %s[%s] is disabled in %s/%s", node, intf, network, snapshot)
-                return self._traceroute_result(network, snapshot, self._disabled_traceroute_answer(), snapshot_pattern)
-            # destination ip is disabled?
-            # NOTICE: if the network/snapshot has duplicated ip address, it cannot work fine, probably.
-            if self._find_ip_addr_from_lost_edges(network, snapshot, snapshot_pattern, destination):
-                self.logger.warning("traceroute: destination %s is disabled in %s/%s", destination, network, snapshot)
-                return self._traceroute_result(network, snapshot, self._disabled_traceroute_answer(), snapshot_pattern)
-
-        # query traceroute
-        answer = self._query_traceroute(network, snapshot, node, intf, intf_ip, destination)
-        return self._traceroute_result(network, snapshot, answer, snapshot_pattern)
+        answers: Dict[Tuple[str, str, str], List[Dict]] = {}
+        query_flows = []
+        for flow in flows:
+            key = (flow["node"], flow["interface"], flow["destination"])
+            if key in answers or key in query_flows:
+                continue
+            # for logical snapshot
+            if self._is_disabled_flow(network, snapshot, snapshot_pattern, index, *key):
+                answers[key] = self._disabled_traceroute_answer()
+            else:
+                query_flows.append(key)
+
+        # query traceroute (without thread pool for a single flow, e.g. cache-missed flow of fan-out traceroute)
+        if len(query_flows) <= 1:
+            answers.update(
+                {
+                    (node, intf, destination): self._query_traceroute(
+                        network, snapshot, node, intf, index.first_ip(node, intf), destination
+                    )
+                    for node, intf, destination in query_flows
+                }
+            )
+        else:
+            with ThreadPoolExecutor(
+                max_workers=self.bf_session_pool.size, thread_name_prefix="bfwrapper-traceroute"
+            ) as executor:
+                futures = {
+                    (node, intf, destination): executor.submit(
+                        self._query_traceroute,
+                        network,
+                        snapshot,
+                        node,
+                        intf,
+                        index.first_ip(node, intf),
+                        destination,
+                    )
+                    for node, intf, destination in query_flows
+                }
+                answers.update({key: future.result() for key, future in futures.items()})
+        return [
+            self._traceroute_result(
+                network, snapshot, answers[(f["node"], f["interface"], f["destination"])], snapshot_pattern
+            )
+            for f in flows
+        ]
+
+    @staticmethod
+    def _traceroute_pattern_summary(
+        snapshot_pattern: SnapshotPattern, status: TracerouteQueryStatus, traces: bool, inferred: bool = False
+    ) -> TraceroutePatternSummaryDict:
+        """Summarize traceroute result of a logical snapshot
+        Args:
+            snapshot_pattern (SnapshotPattern): Snapshot pattern of the logical snapshot
+            status (TracerouteQueryStatus): Traceroute result of the logical snapshot
+            traces (bool): True to include full traceroute result
+            inferred (bool): True if the result is inferred from physical snapshot (not queried)
+        Returns:
+            TraceroutePatternSummaryDict: Summary (dispositions of traces)
+        """
+        return {
+            "index": snapshot_pattern.index,
+            "snapshot": snapshot_pattern.target_snapshot_name,
+            "description": snapshot_pattern.description,
+            "dispositions": [trace["disposition"] for flow in status["result"] for trace in flow["Traces"]],
+            "result": status["result"] if traces else None,
+            "inferred": inferred,
+        }
+
+    @staticmethod
+    def _is_path_stable(traceroute_answer: List[Dict]) -> bool:
+        """Test if paths of traceroute result are kept while links out of the paths are down
+        Args:
+            traceroute_answer (List[Dict]): Traceroute result
+        Returns:
+            bool: True if each flow has a single path (no ECMP) routed only with path-stable routes
+              (see PATH_STABLE_ROUTE_PROTOCOLS: e.g. a BGP route can change with a session over other links)
+        """
+        for flow in traceroute_answer:
+            if len(flow["Traces"]) != 1:
+                return False  # ECMP
+            for hop in flow["Traces"][0]["hops"]:
+                for step in hop["steps"]:
+                    routes = (step.get("detail") or {}).get("routes") or []
+                    if len(routes) > 1:
+                        return False  # ECMP
+                    if any(not route["protocol"].startswith(PATH_STABLE_ROUTE_PROTOCOLS) for route in routes):
+                        return False
+        return True
+
+    @staticmethod
+    def _is_path_affected(
+        traceroute_answer: List[Dict], snapshot_pattern: SnapshotPattern, index: InterfaceAddressIndex
+    ) -> bool:
+        """Test if paths of traceroute result cross interfaces disabled in logical snapshot
+        Args:
+            traceroute_answer (List[Dict]): Traceroute result (of physical snapshot)
+            snapshot_pattern (SnapshotPattern): Snapshot pattern of the logical snapshot
+            index (InterfaceAddressIndex): Interface address index of the physical snapshot
+        Returns:
+            bool: True if the paths cross interfaces in lost edges, their sub-interfaces or aggregated interfaces
+              that have members in lost edges
+        """
+        for flow in traceroute_answer:
+            for trace in flow["Traces"]:
+                for hop in trace["hops"]:
+                    for step in hop["steps"]:
+                        detail = step.get("detail") or {}
+                        for intf in (detail.get("inputInterface"), detail.get("outputInterface")):
+                            if not intf:
+                                continue
+                            intfs = {intf, intf.split(".")[0]}
+                            intfs.update(m for i in list(intfs) for m in index.members(hop["node"], i))
+                            if any(snapshot_pattern.owns_as_disabled_intf(hop["node"], i) for i in intfs):
+                                return True
+        return False
+
+    def exec_traceroute_query_for_patterns(  # pylint: disable=too-many-arguments
+        self,
+        network: str,
+        snapshot: str,
+        node: str,
+        intf: str,
+        destination: str,
+        concurrency: int = 1,
+        traces: bool = False,
+        prune: bool = False,
+    ) -> TracerouteFanoutDict:
+        """Query traceroute for all logical snapshots of a physical snapshot
+        Args:
+            network (str): Network name
+            snapshot (str): Snapshot name (physical)
+            node (str): Node name (source)
+            intf (str): Interface name (source)
+            destination (str): Traceroute destination
+            concurrency (int): Number of logical snapshots forked and queried concurrently
+            traces (bool): True to include full traceroute result of each logical snapshot
+            prune (bool): True to query physical snapshot at first and infer results of logical snapshots
+              that are not affected by their lost edges (without fork and query)
+        Returns:
+            TracerouteFanoutDict: Traceroute summaries (in order of snapshot patterns)
+        Raises:
+            ValueError: The snapshot is not physical
+        Note:
+            Concurrency is limited by size of residency pool not to evict logical snapshots in process each other.
+            With prune, the physical result is copied to a logical snapshot ("inferred") if its paths are stable
+            (see _is_path_stable) and do not cross interfaces in lost edges of the logical snapshot.
+            Flows whose source/destination is disabled are answered without fork.
+        """
+        if not self._is_physical_snapshot(network, snapshot):
+            raise ValueError(f"{network}/{snapshot} is not a physical snapshot")
+        snapshot_patterns = self._read_snapshot_patterns(network, snapshot)
+        physical_status = None
+        if prune:
+            physical_flow: TracerouteFlowDict = {
+                "snapshot": snapshot,
+                "node": node,
+                "interface": intf,
+                "destination": destination,
+            }
+            physical_status = self._exec_cached_traceroute_queries(network, snapshot, [physical_flow])[0]
+            index = self.interface_address_index(network, snapshot)
+            stable = self._is_path_stable(physical_status["result"])
+
+        def _traceroute(snapshot_pattern: SnapshotPattern) -> TraceroutePatternSummaryDict:
+            target_snapshot = snapshot_pattern.target_snapshot_name
+            if physical_status is not None:
+                if self._is_disabled_flow(network, target_snapshot, snapshot_pattern, index, node, intf, destination):
+                    status = self._traceroute_result(
+                        network, target_snapshot, self._disabled_traceroute_answer(), snapshot_pattern
+                    )
+                    return self._traceroute_pattern_summary(snapshot_pattern, status, traces)
+                if stable and not self._is_path_affected(physical_status["result"], snapshot_pattern, index):
+                    status = self._traceroute_result(
+                        network, target_snapshot, physical_status["result"], snapshot_pattern
+                    )
+                    return self._traceroute_pattern_summary(snapshot_pattern, status, traces, inferred=True)
+            flow: TracerouteFlowDict = {
+                "snapshot": target_snapshot,
+                "node": node,
+                "interface": intf,
+                "destination": destination,
+            }
+            status = self._exec_cached_traceroute_queries(network, target_snapshot, [flow])
+            return self._traceroute_pattern_summary(snapshot_pattern, status[0], traces)
+
+        concurrency = max(min(concurrency, self.residency_pool.max_size), 1)
+        with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="bfwrapper-traceroute") as executor:
+            summaries = list(executor.map(_traceroute, snapshot_patterns))
+        return {
+            "network": network,
+            "snapshot": snapshot,
+            "node": node,
+            "interface": intf,
+            "destination": destination,
+            "patterns": summaries,
+            "physical": physical_status["result"] if physical_status is not None and traces else None,
+        }
@@ -3,26 +3,63 @@ Definition of BatfishRegistrantBase class
 """
 import json
 import re
+import threading
+from collections import OrderedDict
 from os import path
-from typing import List, Optional
+from typing import List, Optional, Tuple
 from pybatfish.client.session import Session
 from l1topology_operator_base import L1TopologyOperatorBase
 from snapshot_pattern import SnapshotPattern
 from register_status import RegisterStatus
+from bf_snapshot_inventory import BatfishSnapshotInventory
+from snapshot_residency_pool import SnapshotResidencyPool
+from snapshot_fingerprint import snapshot_fingerprint, logical_snapshot_fingerprint
+from bf_session_pool import BatfishSessionPool
+from interface_address_index import InterfaceAddressIndex
+from traceroute_result_cache import TracerouteResultCache
+
+# max number of interface address indexes kept in memory (discard least recently used one)
+INTERFACE_ADDRESS_INDEX_SIZE = 16
 
 
 class BatfishRegistrantBase(L1TopologyOperatorBase):
     """Base class of batfish registrant"""
 
-    def __init__(self, bf_host: str, configs_dir: str) -> None:
+    def __init__(
+        self,
+        bf_host: str,
+        configs_dir: str,
+        inventory_ttl: float = 60.0,
+        residency_pool: Optional[SnapshotResidencyPool] = None,
+        session_pool_size: int = 4,
+        traceroute_cache: Optional[TracerouteResultCache] = None,
+    ) -> None:
         """Constructor
         Args:
             bf_host (str): Batfish host (URL)
             configs_dir (str): Path of 'configs' directory (contains batfish network/snapshot directories)
+            inventory_ttl (float): TTL [sec] of cached network/snapshot inventory in batfish
+            residency_pool (Optional[SnapshotResidencyPool]): Residency pool of logical snapshots
+              (default: keep only one logical snapshot for each network)
+            session_pool_size (int): Number of batfish sessions to query concurrently
+            traceroute_cache (Optional[TracerouteResultCache]): Traceroute result cache (default: in memory)
+        Note:
+            `bf_session` is used only to register/unregister snapshots (serialized with a lock),
+            use `bf_session_pool` to query snapshots.
         """
         super().__init__()
         self.bf_session = Session(host=bf_host)
+        self.bf_session_pool = BatfishSessionPool(bf_host, session_pool_size)
+        self._register_lock = threading.RLock()
+        self.bf_inventory = BatfishSnapshotInventory(inventory_ttl)
+        self.residency_pool = residency_pool if residency_pool is not None else SnapshotResidencyPool()
         self.configs_dir = configs_dir
+        # interface address index of physical snapshots: (network, snapshot) -> (input fingerprint, index)
+        self._interface_address_indexes: "OrderedDict[Tuple[str, str], Tuple[str, InterfaceAddressIndex]]" = (
+            OrderedDict()
+        )
+        self._interface_address_index_lock = threading.Lock()
+        self.traceroute_cache = traceroute_cache if traceroute_cache is not None else TracerouteResultCache()
 
     def _snapshot_dir(self, network: str, snapshot: str) -> str:
         """Get snapshot directory path
@@ -167,24 +204,128 @@ class BatfishRegistrantBase(L1TopologyOperatorBase):
         """
         return path.exists(self._snapshot_dir(network, snapshot))
 
+    def _is_unchanged_snapshot(self, network: str, snapshot: str, fingerprint: str) -> bool:
+        """Test if the snapshot is registered in batfish with same input
+        Args:
+            network (str): Network name
+            snapshot (str): Snapshot name
+            fingerprint (str): Fingerprint of current snapshot input
+        Returns:
+            bool: True if the snapshot input is not changed since it was registered
+        """
+        return self.bf_inventory.fingerprint(network, snapshot) == fingerprint and self._is_bf_loaded_snapshot(
+            network, snapshot
+        )
+
+    def _cached_interface_address_index(
+        self, network: str, snapshot: str, fingerprint: Optional[str]
+    ) -> Optional[InterfaceAddressIndex]:
+        """Get interface address index kept in memory
+        Args:
+            network (str): Network name
+            snapshot (str): Snapshot name (physical)
+            fingerprint (Optional[str]): Fingerprint of current snapshot input
+        Returns:
+            Optional[InterfaceAddressIndex]: Interface address index or None if not found (or input changed)
+        """
+        with self._interface_address_index_lock:
+            cached = self._interface_address_indexes.get((network, snapshot))
+            if cached is None or fingerprint is None or cached[0] != fingerprint:
+                return None
+            self._interface_address_indexes.move_to_end((network, snapshot))
+            return cached[1]
+
+    def _keep_interface_address_index(
+        self, network: str, snapshot: str, fingerprint: str, index: InterfaceAddressIndex
+    ) -> None:
+        """Keep interface address index in memory (discard least recently used ones over INTERFACE_ADDRESS_INDEX_SIZE)
+        Args:
+            network (str): Network name
+            snapshot (str): Snapshot name (physical)
+            fingerprint (str): Fingerprint of snapshot input
+            index (InterfaceAddressIndex): Interface address index
+        Returns:
+            None
+        """
+        with self._interface_address_index_lock:
+            self._interface_address_indexes[(network, snapshot)] = (fingerprint, index)
+            self._interface_address_indexes.move_to_end((network, snapshot))
+            while len(self._interface_address_indexes) > INTERFACE_ADDRESS_INDEX_SIZE:
+                self._interface_address_indexes.popitem(last=False)
+
+    def _discard_interface_address_index(self, network: str, snapshot: str) -> None:
+        """Discard interface address index kept in memory
+        Args:
+            network (str): Network name
+            snapshot (str): Snapshot name (physical)
+        Returns:
+            None
+        """
+        with self._interface_address_index_lock:
+            self._interface_address_indexes.pop((network, snapshot), None)
+
     def _register_physical_snapshot(self, network: str, snapshot: str) -> RegisterStatus:
-        """Register physical snapshot
+        """Register physical snapshot (skip it if the snapshot input is not changed)
         Args:
             network (str): Network name
             snapshot (str): Snapshot name
         Returns:
             RegisterStatus: Register status
         """
+        fingerprint = snapshot_fingerprint(self._snapshot_dir(network, snapshot))
+        if self._is_unchanged_snapshot(network, snapshot, fingerprint):
+            self.logger.info("Physical snapshot %s/%s is not changed, skip registering", network, snapshot)
+            return RegisterStatus(network, snapshot, "unchanged")
+
         self.logger.info("Register physical snapshot %s/%s", network, snapshot)
+        self._discard_interface_address_index(network, snapshot)
+        self.traceroute_cache.discard(network, snapshot)
         self.bf_session.set_network(network)
         self.bf_session.init_snapshot(self._snapshot_dir(network, snapshot), name=snapshot, overwrite=True)
+        self.bf_inventory.add_snapshot(network, snapshot)
+        self.bf_inventory.set_fingerprint(network, snapshot, fingerprint)
         self.bf_session.set_snapshot(snapshot)
         return RegisterStatus(network, snapshot, "registered")
 
+    def _prepare_origin_snapshot(self, network: str, snapshot: str) -> str:
+        """Make origin (physical) snapshot ready to fork
+        Args:
+            network (str): Network name
+            snapshot (str): Snapshot name (physical)
+        Returns:
+            str: Fingerprint of the origin snapshot input
+        Note:
+            Register origin snapshot if it is not found in batfish or its input is changed since registered.
+            (Origin snapshot registered from outside of the wrapper is used as it is.)
+        """
+        fingerprint = snapshot_fingerprint(self._snapshot_dir(network, snapshot))
+        registered_fingerprint = self.bf_inventory.fingerprint(network, snapshot)
+        if not self._is_bf_loaded_snapshot(network, snapshot) or registered_fingerprint not in (None, fingerprint):
+            self._register_physical_snapshot(network, snapshot)
+        return fingerprint
+
+    def snapshot_input_fingerprint(self, network: str, snapshot: str) -> Optional[str]:
+        """Calculate fingerprint of current snapshot input (without registering it)
+        Args:
+            network (str): Network name
+            snapshot (str): Snapshot name (physical or logical)
+        Returns:
+            Optional[str]: Fingerprint or None if the snapshot is not found
+        """
+        if self._is_physical_snapshot(network, snapshot):
+            return snapshot_fingerprint(self._snapshot_dir(network, snapshot))
+        snapshot_pattern = self._find_snapshot_pattern(network, snapshot)
+        if snapshot_pattern is None:
+            return None
+        origin_fingerprint = snapshot_fingerprint(self._snapshot_dir(network, snapshot_pattern.orig_snapshot_name))
+        return logical_snapshot_fingerprint(
+            origin_fingerprint, [str(i) for i in snapshot_pattern.deactivate_interfaces()]
+        )
+
     def _fork_physical_snapshot(
         self, network: str, snapshot: str, snapshot_pattern: SnapshotPattern
     ) -> RegisterStatus:
-        """Fork logical snapshot from origin snapshot
+        """Fork logical snapshot from origin snapshot (skip it if the snapshot input is not changed)
         Args:
             network (str): Network name
             snapshot (str): Snapshot name (logical)
@@ -194,19 +335,26 @@ class BatfishRegistrantBase(L1TopologyOperatorBase):
         """
         origin_ss = snapshot_pattern.orig_snapshot_name
         target_ss = snapshot_pattern.target_snapshot_name  # == snapshot (argument of this function)
-        # check if origin snapshot exists? register if it does not found.
-        if not self._is_bf_loaded_snapshot(network, origin_ss):
-            return self._register_physical_snapshot(network, origin_ss)
+        # check if origin snapshot exists and is up-to-date? register if it does not.
+        origin_fingerprint = self._prepare_origin_snapshot(network, origin_ss)
+        deactivate_interfaces = snapshot_pattern.deactivate_interfaces()
+        fingerprint = logical_snapshot_fingerprint(origin_fingerprint, [str(i) for i in deactivate_interfaces])
+        if self._is_unchanged_snapshot(network, target_ss, fingerprint):
+            self.logger.info("Logical snapshot %s/%s is not changed, skip forking", network, target_ss)
+            return RegisterStatus(network, snapshot, "unchanged", snapshot_pattern)
 
         # fork snapshot
         self.logger.info("Fork physical snapshot %s/%s -> %s", network, origin_ss, target_ss)
+        self.traceroute_cache.discard(network, target_ss)
         self.bf_session.set_network(network)
         self.bf_session.fork_snapshot(
             origin_ss,
             target_ss,
-            deactivate_interfaces=snapshot_pattern.deactivate_interfaces(),
+            deactivate_interfaces=deactivate_interfaces,
             overwrite=True,
         )
+        self.bf_inventory.add_snapshot(network, target_ss)
+        self.bf_inventory.set_fingerprint(network, target_ss, fingerprint)
         self.bf_session.set_snapshot(snapshot_pattern.target_snapshot_name)
         return RegisterStatus(network, snapshot, "forked", snapshot_pattern)
 
@@ -215,28 +363,57 @@ class BatfishRegistrantBase(L1TopologyOperatorBase):
         Args:
             network (str): Network name
             snapshot (str): Snapshot name
-            overwrite (Optional[bool]): True to enable overwrite snapshot in batfish
+            overwrite (Optional[bool]): True to re-register the snapshot in batfish if its input is changed
         Returns:
              RegisterStatus: Register status (includes snapshot pattern data for logical snapshot registration)
+        Note:
+            Input (configs and layer1 topology) fingerprint of the snapshot is recorded when it is registered.
+            With overwrite, the snapshot is registered again only if the fingerprint is changed.
         """
-        self.logger.info("Register snapshot: %s/%s (overwrite=%s)", network, snapshot, overwrite)
-        # unregister logical snapshots without target snapshot (physical snapshots are kept)
-        self.unregister_snapshots_exclude(network, snapshot)
+        with self._register_lock:
+            self.logger.info("Register snapshot: %s/%s (overwrite=%s)", network, snapshot, overwrite)
+            # unregister logical snapshots overflowed from residency pool (physical snapshots are kept)
+            self._evict_logical_snapshots(network, snapshot)
 
-        if not overwrite and self._is_bf_loaded_snapshot(network, snapshot):
-            snapshot_pattern = self._find_snapshot_pattern(network, snapshot)
-            return RegisterStatus(network, snapshot, "already_exists", snapshot_pattern)
+            if not overwrite and self._is_bf_loaded_snapshot(network, snapshot):
+                snapshot_pattern = self._find_snapshot_pattern(network, snapshot)
+                return RegisterStatus(network, snapshot, "already_exists", snapshot_pattern)
 
-        # if "physical" = orig snapshot (exist snapshot directory/files)
-        if self._is_physical_snapshot(network, snapshot):
-            return self._register_physical_snapshot(network, snapshot)
+            # if "physical" = orig snapshot (exist snapshot directory/files)
+            if self._is_physical_snapshot(network, snapshot):
+                return self._register_physical_snapshot(network, snapshot)
 
-        # else: search snapshot pattern to fork physical snapshot
-        snapshot_pattern = self._find_snapshot_pattern(network, snapshot)
-        if snapshot_pattern is None:
-            return RegisterStatus(network, snapshot, "pattern_not_found")
-        # fork snapshot
-        return self._fork_physical_snapshot(network, snapshot, snapshot_pattern)
+            # else: search snapshot pattern to fork physical snapshot
+            snapshot_pattern = self._find_snapshot_pattern(network, snapshot)
+            if snapshot_pattern is None:
+                return RegisterStatus(network, snapshot, "pattern_not_found")
+            # fork snapshot
+            return self._fork_physical_snapshot(network, snapshot, snapshot_pattern)
+
+    def _evict_logical_snapshots(self, network: str, snapshot: str) -> None:
+        """Unregister logical snapshots to make room for the snapshot in residency pool
+        Args:
+            network (str): Network name
+            snapshot (str): Snapshot name to register (keep)
+        Returns:
+            None
+        """
+        is_logical = not self._is_physical_snapshot(network, snapshot)
+        if is_logical:
+            self.residency_pool.touch(network, snapshot)
+        residents = [
+            s
+            for s in self.bf_snapshots(network)
+            if s != snapshot
+            and not self._is_physical_snapshot(network, s)
+            and not self.bf_session_pool.is_pinned(network, s)  # in-use snapshot is not evicted
+        ]
+        unreg_snapshots = self.residency_pool.victims(network, residents, reserved=1 if is_logical else 0)
+        if not unreg_snapshots:
+            return
+        self.logger.info("Keep: %s, evict: %s", snapshot, unreg_snapshots)
+        for unreg_snapshot in unreg_snapshots:
+            self.unregister_snapshot(network, unreg_snapshot)
 
     def unregister_snapshots_exclude(self, network: str, snapshot: str) -> None:
         """Unregister snapshot exclude specified snapshot
@@ -263,16 +440,54 @@ class BatfishRegistrantBase(L1TopologyOperatorBase):
         """
         if self._is_physical_snapshot(network, snapshot):
             return  # keep physical (origin) snapshot
-        if self._is_bf_loaded_snapshot(network, snapshot):
-            self.bf_session.set_network(network)
-            self.bf_session.delete_snapshot(snapshot)
+        with self._register_lock:
+            if self._is_bf_loaded_snapshot(network, snapshot):
+                self.bf_session.set_network(network)
+                self.bf_session.delete_snapshot(snapshot)
+                self.bf_inventory.remove_snapshot(network, snapshot)
+            self.residency_pool.discard(network, snapshot)
+
+    def refresh_bf_inventory(self, network: Optional[str] = None) -> None:
+        """Refresh network/snapshot inventory against batfish
+        Args:
+            network (Optional[str]): Network name to refresh only the network (refresh all networks if None)
+        Returns:
+            None
+        """
+        with self._register_lock:
+            bf_networks = self.bf_session.list_networks()
+            if network is not None:
+                # Notice: safe guard for bf.set_network():
+                # if exec `set_network("unknown-network")`, it makes NEW network in batfish...
+                if network not in bf_networks:
+                    self.bf_inventory.update_network(network, None)
+                    return
+                self.bf_session.set_network(network)
+                self.bf_inventory.update_network(network, self.bf_session.list_snapshots())
+                return
+
+            self.logger.debug("Refresh batfish inventory")
+            snapshots = {}
+            for bf_network in bf_networks:
+                self.bf_session.set_network(bf_network)
+                snapshots[bf_network] = self.bf_session.list_snapshots()
+            self.bf_inventory.update(snapshots)
+
+    def _fresh_bf_inventory(self) -> BatfishSnapshotInventory:
+        """Get network/snapshot inventory (refresh it if expired)
+        Returns:
+            BatfishSnapshotInventory: inventory
+        """
+        if self.bf_inventory.is_expired():
+            self.refresh_bf_inventory()
+        return self.bf_inventory
 
     def bf_networks(self) -> List[str]:
         """Get networks in batfish
         Returns:
             List[str]: List of network name in batfish
         """
-        return self.bf_session.list_networks()
+        return self._fresh_bf_inventory().networks()
 
     def bf_snapshots(self, network: str) -> List[str]:
         """Get snapshots of network in batfish
@@ -281,12 +496,7 @@ class BatfishRegistrantBase(L1TopologyOperatorBase):
         Returns:
             List[str]: List of snapshot names of the network in batfish
         """
-        # Notice: safe guard for bf.set_network():
-        # if exec `set_network("unknown-network")`, it makes NEW network in batfish...
-        if not self._is_bf_loaded_network(network):
-            return []
-        self.bf_session.set_network(network)
-        return self.bf_session.list_snapshots()
+        return self._fresh_bf_inventory().snapshots(network)
 
     def _is_bf_loaded_network(self, network: str) -> bool:
         """Test if the network is registered in batfish
@@ -295,7 +505,16 @@ class BatfishRegistrantBase(L1TopologyOperatorBase):
         Returns:
             bool: True if the network is registered
         """
-        return network in self.bf_networks()
+        if self._fresh_bf_inventory().has_network(network):
+            return True
+        if self.bf_inventory.is_missing(network):
+            return False  # not found at last refresh (within TTL)
+        # inventory miss: the network might be registered from outside of the wrapper
+        self.refresh_bf_inventory(network)
+        if self.bf_inventory.has_network(network):
+            return True
+        self.bf_inventory.set_missing(network)
+        return False
 
     def _is_bf_loaded_snapshot(self, network: str, snapshot: str) -> bool:
         """Test if the snapshot is registered in batfish
@@ -305,6 +524,13 @@ class BatfishRegistrantBase(L1TopologyOperatorBase):
         Returns:
             bool: True if the network/snapshot is registered
         """
-        if not self._is_bf_loaded_network(network):
-            return False
-        return snapshot in self.bf_snapshots(network)
+        if self._fresh_bf_inventory().has_snapshot(network, snapshot):
+            return True
+        if self.bf_inventory.is_missing(network, snapshot):
+            return False  # not found at last refresh (within TTL)
+        # inventory miss: the snapshot might be registered from outside of the wrapper
+        self.refresh_bf_inventory(network)
+        if self.bf_inventory.has_snapshot(network, snapshot):
+            return True
+        self.bf_inventory.set_missing(network, snapshot)
+        return False
@@ -0,0 +1,107 @@
+"""
+Definition of BatfishSessionPool class
+"""
+import queue
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterator, Tuple
+from pybatfish.client.session import Session
+
+
+class BatfishSessionPool:
+    """Pool of batfish sessions to query concurrently"""
+
+    def __init__(self, bf_host: str, size: int = 4) -> None:
+        """Constructor
+        Args:
+            bf_host (str): Batfish host (URL)
+            size (int): Max number of sessions
+        """
+        self.bf_host = bf_host
+        self.size = max(size, 1)
+        self._idle_sessions: "queue.LifoQueue[Session]" = queue.LifoQueue()
+        self._created = 0
+        # (network, snapshot) -> number of users of the snapshot
+        self._pins: Dict[Tuple[str, str], int] = {}
+        self._lock = threading.Lock()
+
+    def _acquire(self) -> Session:
+        """Get an idle session (wait for a session released if all sessions are used)
+        Returns:
+            Session: Batfish session
+        """
+        try:
+            return self._idle_sessions.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            can_create = self._created < self.size
+            if can_create:
+                self._created += 1
+        if can_create:
+            try:
+                return Session(host=self.bf_host)
+            except Exception:
+                with self._lock:
+                    self._created -= 1
+                raise
+        return self._idle_sessions.get()
+
+    def _release(self, bf_session: Session) -> None:
+        """Return a session to the pool
+        Args:
+            bf_session (Session): Batfish session
+        Returns:
+            None
+        """
+        self._idle_sessions.put(bf_session)
+
+    @contextmanager
+    def pinned(self, network: str, snapshot: str) -> Iterator[None]:
+        """Mark the snapshot as in-use (not to be evicted) while the context
+        Args:
+            network (str): Network name
+            snapshot (str): Snapshot name
+        """
+        key = (network, snapshot)
+        with self._lock:
+            self._pins[key] = self._pins.get(key, 0) + 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._pins[key] -= 1
+                if self._pins[key] <= 0:
+                    del self._pins[key]
+
+    def is_pinned(self, network: str, snapshot: str) -> bool:
+        """Test if the snapshot is in-use
+        Args:
+            network (str): Network name
+            snapshot (str): Snapshot name
+        Returns:
+            bool: True if the snapshot is used by someone
+        """
+        with self._lock:
+            return (network, snapshot) in self._pins
+
+    @contextmanager
+    def session(self, network: str, snapshot: str) -> Iterator[Session]:
+        """Lease a session bound to network/snapshot
+        Args:
+            network (str): Network name
+            snapshot (str): Snapshot name
+        Yields:
+            Session: Batfish session (exclusively used by the caller while the context)
+        """
+        with self.pinned(network, snapshot):
+            bf_session = self._acquire()
+            try:
+                # a session keeps network/snapshot of previous lease: set them only if changed
+                if bf_session.network != network:
+                    bf_session.set_network(network)
+                if bf_session.snapshot != snapshot:
+                    bf_session.set_snapshot(snapshot)
+                yield bf_session
+            finally:
+                self._release(bf_session)
@@ -0,0 +1,190 @@
+"""
+Definition of BatfishSnapshotInventory class
+"""
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+
+class BatfishSnapshotInventory:
+    """In-process inventory of networks/snapshots loaded in batfish"""
+
+    def __init__(self, ttl: float = 60.0) -> None:
+        """Constructor
+        Args:
+            ttl (float): Time-to-live of the inventory [sec] (refresh it against batfish after expired)
+        """
+        self.ttl = ttl
+        self._snapshots: Dict[str, List[str]] = {}
+        # (network, snapshot) -> fingerprint of snapshot input registered by the wrapper
+        self._fingerprints: Dict[Tuple[str, str], str] = {}
+        self._updated_at: Optional[float] = None
+        # (network, snapshot or None for network) -> time when it is not found in batfish
+        self._missing_at: Dict[Tuple[str, Optional[str]], float] = {}
+        self._lock = threading.RLock()
+
+    def is_expired(self) -> bool:
+        """Test if the inventory should be refreshed
+        Returns:
+            bool: True if the inventory is never refreshed or its TTL is expired
+        """
+        with self._lock:
+            return self._updated_at is None or time.monotonic() - self._updated_at > self.ttl
+
+    def invalidate(self) -> None:
+        """Mark the inventory as expired (it will be refreshed at next access)"""
+        with self._lock:
+            self._updated_at = None
+            self._missing_at = {}
+
+    def update(self, snapshots: Dict[str, List[str]]) -> None:
+        """Replace whole inventory with batfish data
+        Args:
+            snapshots (Dict[str, List[str]]): Dict of key: network name and value: a list of snapshot names
+        Returns:
+            None
+        """
+        with self._lock:
+            self._snapshots = {network: list(snapshot_list) for network, snapshot_list in snapshots.items()}
+            self._updated_at = time.monotonic()
+            self._missing_at = {}
+            self._drop_unloaded_fingerprints()
+
+    def update_network(self, network: str, snapshots: Optional[List[str]]) -> None:
+        """Replace snapshots of a network with batfish data
+        Args:
+            network (str): Network name
+            snapshots (Optional[List[str]]): Snapshot names in the network, or None if the network is not found
+        Returns:
+            None
+        Note:
+            It does not extend TTL of the whole inventory.
+        """
+        with self._lock:
+            if snapshots is None:
+                self._snapshots.pop(network, None)
+            else:
+                self._snapshots[network] = list(snapshots)
+            self._missing_at = {key: value for key, value in self._missing_at.items() if key[0] != network}
+            self._drop_unloaded_fingerprints()
+
+    def _drop_unloaded_fingerprints(self) -> None:
+        """Forget fingerprints of snapshots that are not found in batfish"""
+        self._fingerprints = {
+            key: value for key, value in self._fingerprints.items() if key[1] in self._snapshots.get(key[0], [])
+        }
+
+    def networks(self) -> List[str]:
+        """Get networks in the inventory
+        Returns:
+            List[str]: List of network names
+        """
+        with self._lock:
+            return list(self._snapshots.keys())
+
+    def snapshots(self, network: str) -> List[str]:
+        """Get snapshots of network in the inventory
+        Args:
+            network (str): Network name
+        Returns:
+            List[str]: List of snapshot names (empty if the network is not found)
+        """
+        with self._lock:
+            return list(self._snapshots.get(network, []))
+
+    def has_network(self, network: str) -> bool:
+        """Test if the network is in the inventory
+        Args:
+            network (str): Network name
+        Returns:
+            bool: True if found
+        """
+        with self._lock:
+            return network in self._snapshots
+
+    def has_snapshot(self, network: str, snapshot: str) -> bool:
+        """Test if the snapshot is in the inventory
+        Args:
+            network (str): Network name
+            snapshot (str): Snapshot name
+        Returns:
+            bool: True if found
+        """
+        with self._lock:
+            return snapshot in self._snapshots.get(network, [])
+
+    def add_snapshot(self, network: str, snapshot: str) -> None:
+        """Add a snapshot (registered by the wrapper itself)
+        Args:
+            network (str): Network name
+            snapshot (str): Snapshot name
+        Returns:
+            None
+        """
+        with self._lock:
+            snapshot_list = self._snapshots.setdefault(network, [])
+            if snapshot not in snapshot_list:
+                snapshot_list.append(snapshot)
+            self._missing_at.pop((network, None), None)
+            self._missing_at.pop((network, snapshot), None)
+
+    def remove_snapshot(self, network: str, snapshot: str) -> None:
+        """Remove a snapshot (unregistered by the wrapper itself)
+        Args:
+            network (str): Network name
+            snapshot (str): Snapshot name
+        Returns:
+            None
+        """
+        with self._lock:
+            snapshot_list = self._snapshots.get(network, [])
+            if snapshot in snapshot_list:
+                snapshot_list.remove(snapshot)
+            self._fingerprints.pop((network, snapshot), None)
+            self._missing_at[(network, snapshot)] = time.monotonic()
+
+    def set_missing(self, network: str, snapshot: Optional[str] = None) -> None:
+        """Record a network/snapshot that is not found in batfish (not to refresh the inventory again until TTL)
+        Args:
+            network (str): Network name
+            snapshot (Optional[str]): Snapshot name (None for the network)
+        Returns:
+            None
+        """
+        with self._lock:
+            self._missing_at[(network, snapshot)] = time.monotonic()
+
+    def is_missing(self, network: str, snapshot: Optional[str] = None) -> bool:
+        """Test if a network/snapshot is known as not found in batfish
+        Args:
+            network (str): Network name
+            snapshot (Optional[str]): Snapshot name (None for the network)
+        Returns:
+            bool: True if it was not found in batfish within TTL
+        """
+        with self._lock:
+            missing_at = self._missing_at.get((network, snapshot))
+            return missing_at is not None and time.monotonic() - missing_at <= self.ttl
+
+    def set_fingerprint(self, network: str, snapshot: str, fingerprint: str) -> None:
+        """Record fingerprint of snapshot input registered in batfish
+        Args:
+            network (str): Network name
+            snapshot (str): Snapshot name
+            fingerprint (str): Fingerprint of snapshot input
+        Returns:
+            None
+        """
+        with self._lock:
+            self._fingerprints[(network, snapshot)] = fingerprint
+
+    def fingerprint(self, network: str, snapshot: str) -> Optional[str]:
+        """Get fingerprint of snapshot input registered in batfish
+        Args:
+            network (str): Network name
+            snapshot (str): Snapshot name
+        Returns:
+            Optional[str]: Fingerprint or None if unknown (e.g. registered from outside of the wrapper)
+        """
+        with self._lock:
+            return self._fingerprints.get((network, snapshot))
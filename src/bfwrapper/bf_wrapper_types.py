@@ -1,4 +1,4 @@
-from typing import List, Dict, Optional, TypedDict
+from typing import Any, List, Dict, Optional, TypedDict
 from l1topology_edge import L1TopologyEdgeDict
 
 
@@ -30,9 +30,59 @@ class TracerouteQueryStatus(TypedDict):
     snapshot_pattern: Optional[SnapshotPatternDict]
 
 
+class TracerouteFlowDict(TypedDict):
+    snapshot: str
+    node: str
+    interface: str
+    destination: str
+
+
+class TraceroutePatternSummaryDict(TypedDict):
+    index: int
+    snapshot: str
+    description: str
+    dispositions: List[str]
+    result: Optional[List[Dict]]
+    inferred: bool
+
+
+class TracerouteFanoutDict(TypedDict):
+    network: str
+    snapshot: str
+    node: str
+    interface: str
+    destination: str
+    patterns: List[TraceroutePatternSummaryDict]
+    physical: Optional[List[Dict]]
+
+
+class QueryTimingsDict(TypedDict):
+    answer: float
+    frame: float
+    serialize: float
+
+
 class QuerySummaryDict(TypedDict):
     query: str
     file: str
+    cached: bool
+    derived: bool
+    rows: Optional[int]
+    size: int
+    timings: QueryTimingsDict
+
+
+class QueryDiffCountDict(TypedDict):
+    added: int
+    removed: int
+    changed: int
+
+
+class QueryDiffSummaryDict(QueryDiffCountDict):
+    query: str
+    snapshot: str
+    file: str
+    keys: List[str]
 
 
 class WholeQuerySummaryDict(TypedDict):
@@ -41,4 +91,73 @@ class WholeQuerySummaryDict(TypedDict):
     snapshot_dir: str
     queries_dir: str
     queries: List[QuerySummaryDict]
+    register_time: float
     snapshot_pattern: Optional[SnapshotPatternDict]
+    diffs: List[QueryDiffSummaryDict]
+    resumed: bool
+
+
+class RunManifestSnapshotDict(TypedDict):
+    status: str
+    fingerprint: Optional[str]
+    summary: Optional[WholeQuerySummaryDict]
+    error: Optional[str]
+    queries: List[str]
+    updated_at: float
+
+
+class RunManifestDict(TypedDict):
+    network: str
+    options: Dict[str, Any]
+    started_at: float
+    snapshots: Dict[str, RunManifestSnapshotDict]
+
+
+class QueryDefinitionDict(TypedDict, total=False):
+    kind: str
+    question: str
+    parameters: Dict[str, Any]
+    columns: Optional[List[str]]
+    timeout: Optional[float]
+    priority: int
+    dependency: str
+
+
+class StoredQueryResultDict(TypedDict):
+    query: str
+    file: str
+    size: int
+
+
+class QueryResultPageDict(TypedDict):
+    network: str
+    snapshot: str
+    query: str
+    total: int
+    offset: int
+    limit: Optional[int]
+    columns: List[str]
+    rows: List[Dict[str, Any]]
+
+
+class QueryProgressDict(TypedDict):
+    network: str
+    snapshot: str
+
+
+class JobProgressDict(TypedDict):
+    done: int
+    total: Optional[int]
+    items: List[Any]
+
+
+class JobStatusDict(TypedDict):
+    job_id: str
+    kind: str
+    params: Dict[str, Any]
+    status: str
+    submitted_at: float
+    started_at: Optional[float]
+    finished_at: Optional[float]
+    progress: JobProgressDict
+    error: Optional[str]
@@ -0,0 +1,98 @@
+"""
+Definition of InterfaceAddressIndex class
+"""
+from typing import Dict, List, Optional, Tuple
+from raw_table_answer import RawTableAnswer
+
+
+class InterfaceAddressIndex:
+    """Interface-to-address and address-to-interface index of a snapshot
+
+    Interfaces are identified by (node name in lower case, interface name): batfish answers node names in lower case.
+    It also keeps members of aggregated interfaces (to find interfaces that depend on other interfaces).
+    """
+
+    def __init__(
+        self,
+        interface_prefixes: Dict[Tuple[str, str], List[str]],
+        channel_group_members: Optional[Dict[Tuple[str, str], List[str]]] = None,
+    ) -> None:
+        """Constructor
+        Args:
+            interface_prefixes (Dict[Tuple[str, str], List[str]]): (node, interface) and its ip prefixes
+              (e.g. ("regiona-pe01", "ge-0/0/0.0"): ["192.168.0.1/30"])
+            channel_group_members (Optional[Dict[Tuple[str, str], List[str]]]): (node, interface) and its members
+              (for aggregated interfaces, e.g. ("regiona-pe01", "ae0"): ["ge-0/0/0", "ge-0/0/1"])
+        """
+        self._addresses: Dict[Tuple[str, str], List[str]] = {
+            (node.lower(), intf): [prefix[: prefix.find("/")] if "/" in prefix else prefix for prefix in prefixes]
+            for (node, intf), prefixes in interface_prefixes.items()
+        }
+        self._members: Dict[Tuple[str, str], List[str]] = {
+            (node.lower(), intf): members for (node, intf), members in (channel_group_members or {}).items() if members
+        }
+        self._owners: Dict[str, List[Tuple[str, str]]] = {}
+        for interface, addresses in self._addresses.items():
+            for address in addresses:
+                self._owners.setdefault(address, []).append(interface)
+
+    @classmethod
+    def from_answer(cls, answer: RawTableAnswer) -> "InterfaceAddressIndex":
+        """Make index from interface properties
+        Args:
+            answer (RawTableAnswer): Answer of interfaceProperties query with "All_Prefixes" property
+              (and "Channel_Group_Members" property if needed)
+        Returns:
+            InterfaceAddressIndex: Index
+        """
+        interfaces = [(i["hostname"], i["interface"]) for i in answer.column("Interface")]
+        members = answer.column("Channel_Group_Members") if "Channel_Group_Members" in answer.schemas else []
+        return cls(
+            {interface: prefixes or [] for interface, prefixes in zip(interfaces, answer.column("All_Prefixes"))},
+            {interface: intf_members or [] for interface, intf_members in zip(interfaces, members)},
+        )
+
+    def __len__(self) -> int:
+        """Number of interfaces"""
+        return len(self._addresses)
+
+    def addresses(self, node: str, interface: str) -> List[str]:
+        """Get ip addresses (without CIDR) of an interface
+        Args:
+            node (str): Node name
+            interface (str): Interface name
+        Returns:
+            List[str]: IP addresses (empty if the interface is not found or doesn't have ip address)
+        """
+        return self._addresses.get((node.lower(), interface), [])
+
+    def first_ip(self, node: str, interface: str) -> Optional[str]:
+        """Get first ip address (without CIDR) of an interface
+        Args:
+            node (str): Node name
+            interface (str): Interface name
+        Returns:
+            Optional[str]: IP address or None if the interface doesn't have ip address (e.g. layer2 interface)
+        """
+        addresses = self.addresses(node, interface)
+        return addresses[0] if addresses else None
+
+    def owners(self, address: str) -> List[Tuple[str, str]]:
+        """Get interfaces that own an ip address
+        Args:
+            address (str): IP address (without CIDR)
+        Returns:
+            List[Tuple[str, str]]: (node name in lower case, interface name) of owner interfaces
+              (more than one if the address is duplicated)
+        """
+        return self._owners.get(address, [])
+
+    def members(self, node: str, interface: str) -> List[str]:
+        """Get members of an aggregated interface
+        Args:
+            node (str): Node name
+            interface (str): Interface name
+        Returns:
+            List[str]: Member interface names (empty if the interface is not aggregated)
+        """
+        return self._members.get((node.lower(), interface), [])
@@ -0,0 +1,164 @@
+"""
+Definition of JobManager class
+"""
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+from bf_wrapper_types import JobStatusDict
+
+# Job function receives a progress callback: progress(done, total, item)
+JobProgressCallback = Callable[[int, int, Any], None]
+JobFunction = Callable[[JobProgressCallback], Any]
+
+
+class Job:
+    """Background job"""
+
+    def __init__(self, kind: str, params: Dict[str, Any]) -> None:
+        """Constructor
+        Args:
+            kind (str): Job kind (e.g. "register_snapshot")
+            params (Dict[str, Any]): Job parameters (to show in job status)
+        """
+        self.job_id = uuid.uuid4().hex
+        self.kind = kind
+        self.params = params
+        self.status = "queued"
+        self.submitted_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.progress = {"done": 0, "total": None, "items": []}
+        self.result: Any = None
+        self.error: Optional[str] = None
+
+    def is_finished(self) -> bool:
+        """Test if the job is finished
+        Returns:
+            bool: True if succeeded or failed
+        """
+        return self.status in ("succeeded", "failed")
+
+    def to_dict(self) -> JobStatusDict:
+        """Convert to dict (without result)
+        Returns:
+            JobStatusDict: Job status
+        """
+        return {
+            "job_id": self.job_id,
+            "kind": self.kind,
+            "params": self.params,
+            "status": self.status,
+            "submitted_at": self.submitted_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "progress": {
+                "done": self.progress["done"],
+                "total": self.progress["total"],
+                "items": list(self.progress["items"]),
+            },
+            "error": self.error,
+        }
+
+
+class JobManager:
+    """Run long-running jobs (snapshot registration, bulk queries) in background workers"""
+
+    def __init__(self, max_workers: int = 2, max_jobs: int = 100) -> None:
+        """Constructor
+        Args:
+            max_workers (int): Number of background workers
+            max_jobs (int): Max number of jobs to keep (finished jobs are discarded from the oldest)
+        """
+        self.logger = logging.getLogger("bfwrapper")
+        self.max_jobs = max_jobs
+        self._executor = ThreadPoolExecutor(max_workers=max(max_workers, 1), thread_name_prefix="bfwrapper-job")
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(self, kind: str, params: Dict[str, Any], func: JobFunction) -> JobStatusDict:
+        """Submit a job
+        Args:
+            kind (str): Job kind
+            params (Dict[str, Any]): Job parameters
+            func (JobFunction): Job function (called with a progress callback)
+        Returns:
+            JobStatusDict: Submitted job status
+        """
+        job = Job(kind, params)
+        with self._lock:
+            self._jobs[job.job_id] = job
+            self._discard_old_jobs()
+        self.logger.info("Submit job %s: %s %s", job.job_id, kind, params)
+        self._executor.submit(self._run, job, func)
+        return job.to_dict()
+
+    def _discard_old_jobs(self) -> None:
+        """Discard finished jobs that exceed max_jobs (from the oldest)"""
+        overflow = len(self._jobs) - self.max_jobs
+        for job_id in [j.job_id for j in self._jobs.values() if j.is_finished()][: max(overflow, 0)]:
+            del self._jobs[job_id]
+
+    def _run(self, job: Job, func: JobFunction) -> None:
+        """Run a job in worker
+        Args:
+            job (Job): Job to run
+            func (JobFunction): Job function
+        Returns:
+            None
+        """
+
+        def _progress(done: int, total: int, item: Any) -> None:
+            with self._lock:
+                job.progress["done"] = done
+                job.progress["total"] = total
+                job.progress["items"].append(item)
+
+        with self._lock:
+            job.status = "running"
+            job.started_at = time.time()
+        try:
+            result = func(_progress)
+        except Exception as err:  # pylint: disable=broad-except
+            self.logger.exception("Job %s failed", job.job_id)
+            with self._lock:
+                job.status = "failed"
+                job.error = str(err)
+                job.finished_at = time.time()
+            return
+        with self._lock:
+            job.status = "succeeded"
+            job.result = result
+            job.finished_at = time.time()
+
+    def get(self, job_id: str) -> Optional[Job]:
+        """Get a job
+        Args:
+            job_id (str): Job ID
+        Returns:
+            Optional[Job]: Job or None if not found
+        """
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def status(self, job_id: str) -> Optional[JobStatusDict]:
+        """Get job status
+        Args:
+            job_id (str): Job ID
+        Returns:
+            Optional[JobStatusDict]: Job status or None if not found
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return job.to_dict() if job is not None else None
+
+    def statuses(self) -> List[JobStatusDict]:
+        """Get all job status
+        Returns:
+            List[JobStatusDict]: Job status (older first)
+        """
+        with self._lock:
+            return [job.to_dict() for job in self._jobs.values()]
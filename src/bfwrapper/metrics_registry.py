@@ -0,0 +1,163 @@
+"""
+Definition of MetricsRegistry class
+"""
+import bisect
+import threading
+from typing import Dict, List, Optional, Tuple
+
+# label set: sorted tuple of (label name, value)
+Labels = Tuple[Tuple[str, str], ...]
+# default histogram buckets [sec]
+DEFAULT_BUCKETS = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0]
+
+
+class _Histogram:
+    """Histogram of a label set"""
+
+    def __init__(self, buckets: List[float]) -> None:
+        """Constructor
+        Args:
+            buckets (List[float]): Upper bounds of buckets (sorted, without +Inf)
+        """
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last one: +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        """Add an observation
+        Args:
+            value (float): Observed value
+        Returns:
+            None
+        """
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class MetricsRegistry:
+    """Counters and histograms exposed in prometheus text format"""
+
+    def __init__(self) -> None:
+        """Constructor"""
+        # metric name -> (type, help)
+        self._metrics: Dict[str, Tuple[str, str]] = {}
+        self._counters: Dict[str, Dict[Labels, float]] = {}
+        self._histograms: Dict[str, Dict[Labels, _Histogram]] = {}
+        self._buckets: Dict[str, List[float]] = {}
+        self._lock = threading.Lock()
+
+    def counter(self, name: str, help_text: str) -> None:
+        """Define a counter
+        Args:
+            name (str): Metric name
+            help_text (str): Description of the metric
+        Returns:
+            None
+        """
+        with self._lock:
+            self._metrics.setdefault(name, ("counter", help_text))
+            self._counters.setdefault(name, {})
+
+    def histogram(self, name: str, help_text: str, buckets: Optional[List[float]] = None) -> None:
+        """Define a histogram
+        Args:
+            name (str): Metric name
+            help_text (str): Description of the metric
+            buckets (Optional[List[float]]): Upper bounds of buckets (default: DEFAULT_BUCKETS)
+        Returns:
+            None
+        """
+        with self._lock:
+            self._metrics.setdefault(name, ("histogram", help_text))
+            self._histograms.setdefault(name, {})
+            self._buckets.setdefault(name, sorted(buckets or DEFAULT_BUCKETS))
+
+    @staticmethod
+    def _labels(labels: Dict[str, str]) -> Labels:
+        """Convert labels to a hashable label set
+        Args:
+            labels (Dict[str, str]): Labels
+        Returns:
+            Labels: Label set
+        """
+        return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+    def inc(self, name: str, labels: Dict[str, str], value: float = 1.0) -> None:
+        """Increment a counter
+        Args:
+            name (str): Metric name (defined by `counter`)
+            labels (Dict[str, str]): Labels
+            value (float): Value to add
+        Returns:
+            None
+        """
+        key = self._labels(labels)
+        with self._lock:
+            self._counters[name][key] = self._counters[name].get(key, 0.0) + value
+
+    def observe(self, name: str, labels: Dict[str, str], value: float) -> None:
+        """Add an observation to a histogram
+        Args:
+            name (str): Metric name (defined by `histogram`)
+            labels (Dict[str, str]): Labels
+            value (float): Observed value
+        Returns:
+            None
+        """
+        key = self._labels(labels)
+        with self._lock:
+            if key not in self._histograms[name]:
+                self._histograms[name][key] = _Histogram(self._buckets[name])
+            self._histograms[name][key].observe(value)
+
+    @staticmethod
+    def _format_labels(labels: Labels) -> str:
+        """Format a label set
+        Args:
+            labels (Labels): Label set
+        Returns:
+            str: Labels in prometheus text format (e.g. '{query="routes"}')
+        """
+        if not labels:
+            return ""
+        escaped = [(k, v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")) for k, v in labels]
+        return "{" + ",".join(f'{k}="{v}"' for k, v in escaped) + "}"
+
+    def _render_histogram(self, name: str, labels: Labels, histogram: _Histogram) -> List[str]:
+        """Render a histogram
+        Args:
+            name (str): Metric name
+            labels (Labels): Label set
+            histogram (_Histogram): Histogram
+        Returns:
+            List[str]: Lines of the histogram
+        """
+        lines = []
+        cumulative = 0
+        for bound, count in zip(histogram.buckets + [float("inf")], histogram.counts):
+            cumulative += count
+            bucket_labels = labels + (("le", "+Inf" if bound == float("inf") else repr(bound)),)
+            lines.append(f"{name}_bucket{self._format_labels(bucket_labels)} {cumulative}")
+        lines.append(f"{name}_sum{self._format_labels(labels)} {histogram.sum}")
+        lines.append(f"{name}_count{self._format_labels(labels)} {histogram.count}")
+        return lines
+
+    def render(self) -> str:
+        """Render all metrics
+        Returns:
+            str: Metrics in prometheus text format (version 0.0.4)
+        """
+        lines = []
+        with self._lock:
+            for name, (metric_type, help_text) in self._metrics.items():
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {metric_type}")
+                if metric_type == "counter":
+                    for labels, value in sorted(self._counters[name].items()):
+                        lines.append(f"{name}{self._format_labels(labels)} {value}")
+                else:
+                    for labels, histogram in sorted(self._histograms[name].items(), key=lambda i: i[0]):
+                        lines.extend(self._render_histogram(name, labels, histogram))
+        return "\n".join(lines) + "\n"
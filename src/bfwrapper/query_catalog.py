@@ -0,0 +1,214 @@
+"""
+Definition of QueryDefinition and QueryCatalog classes
+"""
+from __future__ import annotations
+import json
+import logging
+import time
+from os import path
+from typing import Any, Dict, List, Optional
+import pandas as pd
+from pybatfish.client.consts import CoordConsts, WorkStatusCode
+from pybatfish.client.session import Session
+from pybatfish.datamodel.answer import Answer
+from pybatfish.exception import BatfishException
+from bf_wrapper_types import QueryDefinitionDict
+
+# default query catalog file (in this directory)
+DEFAULT_QUERY_CATALOG = path.join(path.dirname(path.abspath(__file__)), "query_catalog.json")
+# kind of query
+#   "batfish": batfish question (`question` is a question name in `bf_session.q`)
+#   "other"  : other data source (`question` is a key in OTHER_QUERY_DICT of bf_query_thrower)
+QUERY_KINDS = ["batfish", "other"]
+# dependency of query results on snapshot state (deactivated interfaces in logical snapshot)
+#   "config": depends only on configs (logical snapshot result is same as its physical snapshot)
+#   "state" : depends on snapshot state (exec query for each logical snapshot)
+QUERY_DEPENDENCIES = ["config", "state"]
+
+
+class QueryDefinition:
+    """A query in query catalog"""
+
+    def __init__(self, name: str, definition: QueryDefinitionDict) -> None:
+        """Constructor
+        Args:
+            name (str): Query name (result file name)
+            definition (QueryDefinitionDict): Query definition
+        Raises:
+            ValueError: Invalid definition
+        """
+        self.name = name
+        self.kind: str = definition.get("kind", "batfish")
+        self.question: str = definition.get("question", "")
+        self.parameters: Dict[str, Any] = definition.get("parameters", {})
+        self.columns: Optional[List[str]] = definition.get("columns")
+        self.timeout: Optional[float] = definition.get("timeout")
+        self.priority: int = definition.get("priority", 0)
+        self.dependency: str = definition.get("dependency", "state")
+        if self.kind not in QUERY_KINDS:
+            raise ValueError(f"Unknown kind of query {name}: {self.kind} ({QUERY_KINDS})")
+        if self.dependency not in QUERY_DEPENDENCIES:
+            raise ValueError(f"Unknown dependency of query {name}: {self.dependency} ({QUERY_DEPENDENCIES})")
+        if not self.question:
+            raise ValueError(f"Question of query {name} is not specified")
+
+    def to_dict(self) -> QueryDefinitionDict:
+        """Convert to dict
+        Returns:
+            QueryDefinitionDict: Query definition
+        """
+        return {
+            "kind": self.kind,
+            "question": self.question,
+            "parameters": self.parameters,
+            "columns": self.columns,
+            "timeout": self.timeout,
+            "priority": self.priority,
+            "dependency": self.dependency,
+        }
+
+    def override(self, overrides: QueryDefinitionDict) -> QueryDefinition:
+        """Make a query definition with overridden properties (for query profile)
+        Args:
+            overrides (QueryDefinitionDict): Properties to override
+        Returns:
+            QueryDefinition: Query definition
+        """
+        return QueryDefinition(self.name, {**self.to_dict(), **overrides})
+
+    def definition(self) -> str:
+        """Get definition of the query that affects its result (to detect change of the query)
+        Returns:
+            str: Query definition (JSON)
+        """
+        return json.dumps(
+            {"kind": self.kind, "question": self.question, "parameters": self.parameters, "columns": self.columns},
+            sort_keys=True,
+        )
+
+    def answer(self, bf_session: Session) -> Answer:
+        """Ask the question to batfish
+        Args:
+            bf_session (Session): Batfish session (network/snapshot is set)
+        Returns:
+            Answer: Answer of the question
+        Raises:
+            TimeoutError: Not answered in timeout
+            BatfishException: Question failed
+        """
+        question = getattr(bf_session.q, self.question)(**self.parameters)
+        if self.timeout is None:
+            return question.answer()
+
+        # NOTE: batfish continues the work after timeout (pybatfish has no API to kill it)
+        work_item_id = question.answer(background=True)
+        deadline = time.monotonic() + self.timeout
+        interval = 0.1
+        while True:
+            status = WorkStatusCode(bf_session.get_work_status(work_item_id)[CoordConsts.SVC_KEY_WORKSTATUS])
+            if WorkStatusCode.is_terminated(status):
+                break
+            if time.monotonic() >= deadline:
+                raise TimeoutError(f"Query {self.name} is not answered in {self.timeout} sec")
+            time.sleep(min(interval, max(deadline - time.monotonic(), 0.0)))
+            interval = min(1.0, interval * 1.5)
+        if status != WorkStatusCode.TERMINATEDNORMALLY:
+            raise BatfishException(f"Query {self.name} finished with status {status}")
+        return bf_session.get_answer(question.get_name(), bf_session.get_snapshot())
+
+    def project(self, dataframe: pd.DataFrame) -> pd.DataFrame:
+        """Select columns of query result
+        Args:
+            dataframe (pd.DataFrame): Query result
+        Returns:
+            pd.DataFrame: Query result with projected columns (all columns if columns are not specified)
+        """
+        if self.columns is None:
+            return dataframe
+        missing_columns = [c for c in self.columns if c not in dataframe]
+        if missing_columns:
+            logging.getLogger("bfwrapper").warning("Columns not found in query %s: %s", self.name, missing_columns)
+        return dataframe[[c for c in self.columns if c in dataframe]]
+
+
+class QueryCatalog:
+    """Query catalog: query definitions and query profiles (sets of queries)
+
+    Query catalog file construction (json):
+        default_profile: profile name used when profile is not specified
+        queries        : query name -> QueryDefinitionDict
+          kind      : "batfish" or "other" (see QUERY_KINDS)
+          question  : batfish question name (e.g. "routes") or other query name
+          parameters: parameters of the question (e.g. {"protocols": "static"})
+          columns   : columns to keep in the result (default: all columns)
+          timeout   : timeout to get answer [sec] (default: no timeout)
+          priority  : queries with higher priority are executed at first (default: 0, results are listed
+                      in order of definition)
+          dependency: "config" or "state" (see QUERY_DEPENDENCIES)
+        profiles       : profile name -> QueryProfileDict
+          description: description of the profile
+          queries    : query name -> properties to override (QueryDefinitionDict, empty dict to use as is)
+    """
+
+    def __init__(self, catalog: Dict[str, Any]) -> None:
+        """Constructor
+        Args:
+            catalog (Dict[str, Any]): Query catalog data
+        Raises:
+            ValueError: Invalid catalog
+        """
+        self.queries: Dict[str, QueryDefinition] = {
+            name: QueryDefinition(name, definition) for name, definition in catalog.get("queries", {}).items()
+        }
+        self.profiles: Dict[str, Dict[str, QueryDefinition]] = {}
+        for profile_name, profile in catalog.get("profiles", {}).items():
+            unknown_queries = [q for q in profile.get("queries", {}) if q not in self.queries]
+            if unknown_queries:
+                raise ValueError(f"Unknown queries in profile {profile_name}: {unknown_queries}")
+            self.profiles[profile_name] = {
+                query: self.queries[query].override(overrides) for query, overrides in profile["queries"].items()
+            }
+        self.default_profile: Optional[str] = catalog.get("default_profile")
+        if self.default_profile is not None and self.default_profile not in self.profiles:
+            raise ValueError(f"Unknown default profile: {self.default_profile}")
+
+    @classmethod
+    def load(cls, file_path: Optional[str] = None) -> QueryCatalog:
+        """Load query catalog file
+        Args:
+            file_path (Optional[str]): Query catalog file path (default: DEFAULT_QUERY_CATALOG)
+        Returns:
+            QueryCatalog: Query catalog
+        """
+        with open(file_path or DEFAULT_QUERY_CATALOG, "r", encoding="utf-8") as file:
+            return cls(json.load(file))
+
+    def select(self, profile: Optional[str] = None, query: Optional[str] = None) -> Dict[str, QueryDefinition]:
+        """Select queries to execute
+        Args:
+            profile (Optional[str]): Profile name (default: default profile, or all queries if it is not defined)
+            query (Optional[str]): Query name to limit target query
+              (the query is selected even if it is not in the profile)
+        Returns:
+            Dict[str, QueryDefinition]: Query name and its definition (in order of definition in the catalog,
+              see execution_order to execute them)
+        Raises:
+            ValueError: Unknown profile
+        """
+        profile = profile or self.default_profile
+        if profile is not None and profile not in self.profiles:
+            raise ValueError(f"Unknown query profile: {profile} (choose from {list(self.profiles)})")
+        queries = self.profiles[profile] if profile is not None else self.queries
+        if query:
+            queries = {query: queries.get(query, self.queries.get(query))} if query in self.queries else {}
+        return {name: queries[name] for name in self.queries if name in queries}
+
+    @staticmethod
+    def execution_order(query_dict: Dict[str, QueryDefinition]) -> List[str]:
+        """Order queries to execute
+        Args:
+            query_dict (Dict[str, QueryDefinition]): Query name and its definition
+        Returns:
+            List[str]: Query names in order of priority (in order of query_dict for same priority)
+        """
+        return sorted(query_dict, key=lambda q: -query_dict[q].priority)
@@ -0,0 +1,268 @@
+"""
+Definition of QueryResultCache class
+"""
+import fcntl
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+from contextlib import contextmanager
+from os import path
+from typing import Any, Dict, Iterator, Optional
+
+
+class QueryResultCache:
+    """Persistent cache of query result files
+
+    Cache directory construction:
+        + cache_dir/
+          - index.json          (cache key -> result digest, size, number of rows and last-used time)
+          - index.lock          (lock file to update index among processes)
+          + blobs/
+            + ab/
+              - abcdef...       (result file named with its content digest, sha256)
+
+    Output files of query results are hard links to the files in blobs (if cache dir is in same filesystem).
+    Processes can share a cache directory: index is re-read and merged when updated (under index.lock).
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int = 1 << 30) -> None:
+        """Constructor
+        Args:
+            cache_dir (str): Cache directory path
+            max_bytes (int): Size budget of cached result files [bytes] (evict least recently used entries)
+        """
+        self.logger = logging.getLogger("bfwrapper")
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        # modification time of the index file that has been merged [ns]
+        self._index_mtime: Optional[int] = None
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._merge_index()
+
+    @staticmethod
+    def make_key(**elements: Any) -> str:
+        """Make a cache key
+        Args:
+            **elements (Any): Key elements (JSON-serializable)
+        Returns:
+            str: Cache key (hex digest)
+        """
+        return hashlib.sha256(json.dumps(elements, sort_keys=True).encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def file_digest(file_path: str) -> str:
+        """Get content digest of a file
+        Args:
+            file_path (str): File path
+        Returns:
+            str: Hex digest (sha256)
+        """
+        digest = hashlib.sha256()
+        with open(file_path, "rb") as file:
+            for chunk in iter(lambda: file.read(1 << 20), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def _index_path(self) -> str:
+        """Get cache index file path
+        Returns:
+            str: index file path
+        """
+        return path.join(self.cache_dir, "index.json")
+
+    def _blob_path(self, digest: str) -> str:
+        """Get cached result file path
+        Args:
+            digest (str): Content digest of the result file
+        Returns:
+            str: cached result file path
+        """
+        return path.join(self.cache_dir, "blobs", digest[:2], digest)
+
+    @contextmanager
+    def _index_lock(self) -> Iterator[None]:
+        """Lock the cache index to update it (among threads and processes)
+        Yields:
+            None
+        """
+        os.makedirs(self.cache_dir, exist_ok=True)
+        with open(path.join(self.cache_dir, "index.lock"), "a", encoding="utf-8") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _load_index(self) -> Dict[str, Dict[str, Any]]:
+        """Load cache index
+        Returns:
+            Dict[str, Dict[str, Any]]: Cache entries
+        """
+        if not path.exists(self._index_path()):
+            return {}
+        with open(self._index_path(), "r", encoding="utf-8") as file:
+            try:
+                return json.load(file)
+            except json.JSONDecodeError as err:
+                self.logger.warning("Ignore broken query cache index %s: %s", self._index_path(), err)
+                return {}
+
+    def _merge_index(self, force: bool = False) -> None:
+        """Merge cache index saved by other processes into entries in memory
+        Args:
+            force (bool): True to re-read index even if it is not modified
+        Returns:
+            None
+        Note:
+            Entries in both are merged with newer last-used time. Entries only in memory are kept
+            if their result file exists (not evicted by other processes).
+        """
+        try:
+            index_mtime = os.stat(self._index_path()).st_mtime_ns
+        except FileNotFoundError:
+            index_mtime = None
+        if not force and index_mtime == self._index_mtime:
+            return
+        entries = self._load_index()
+        for key, entry in self._entries.items():
+            if key in entries:
+                entries[key]["used_at"] = max(entries[key]["used_at"], entry["used_at"])
+            elif path.exists(self._blob_path(entry["digest"])):
+                entries[key] = entry
+        self._entries = entries
+        self._index_mtime = index_mtime
+
+    def _save_index(self) -> None:
+        """Save cache index (replace index file atomically)"""
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp_path = f"{self._index_path()}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            json.dump(self._entries, file)
+        os.replace(tmp_path, self._index_path())
+        self._index_mtime = os.stat(self._index_path()).st_mtime_ns
+
+    @staticmethod
+    def _link_or_copy(src_path: str, dst_path: str, copy: bool = True) -> bool:
+        """Hard-link a file (copy it if hard-link is not available, e.g. in another filesystem)
+        Args:
+            src_path (str): Source file path
+            dst_path (str): Destination file path (replaced if exists)
+            copy (bool): False to leave the destination as is if hard-link is not available
+        Returns:
+            bool: True if hard-linked
+        """
+        tmp_path = f"{dst_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        linked = True
+        try:
+            os.link(src_path, tmp_path)
+        except OSError:
+            if not copy:
+                return False
+            shutil.copyfile(src_path, tmp_path)
+            linked = False
+        os.replace(tmp_path, dst_path)
+        return linked
+
+    def lookup(self, key: str) -> Optional[str]:
+        """Find cached result
+        Args:
+            key (str): Cache key
+        Returns:
+            Optional[str]: Cached result file path or None if not found
+        """
+        with self._lock:
+            if key not in self._entries:
+                self._merge_index()  # stored by other process?
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            blob_path = self._blob_path(entry["digest"])
+            if not path.exists(blob_path):
+                del self._entries[key]
+                return None
+            entry["used_at"] = time.time()
+            return blob_path
+
+    def restore(self, key: str, output_path: str) -> bool:
+        """Restore cached result to output path
+        Args:
+            key (str): Cache key
+            output_path (str): Result file path to restore
+        Returns:
+            bool: True if cache hit (output path has the cached result)
+        Note:
+            Output file is not rewritten if it is already the cached result.
+        """
+        blob_path = self.lookup(key)
+        if blob_path is None:
+            return False
+        if path.exists(output_path) and path.samefile(blob_path, output_path):
+            return True
+        self._link_or_copy(blob_path, output_path)
+        return True
+
+    def rows(self, key: str) -> Optional[int]:
+        """Get number of rows of cached result
+        Args:
+            key (str): Cache key
+        Returns:
+            Optional[int]: Number of rows or None if unknown
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            return None if entry is None else entry.get("rows")
+
+    def store(self, key: str, output_path: str, rows: Optional[int] = None) -> bool:
+        """Store result file to cache
+        Args:
+            key (str): Cache key
+            output_path (str): Result file path
+            rows (Optional[int]): Number of rows in the result
+        Returns:
+            bool: True if the result is same as a cached one and the output file is replaced with a hard link to it
+        Note:
+            Result files are content-addressed: identical results (e.g. same query result in many snapshots)
+            share a single file. If the cache directory is in another filesystem, output files are not replaced
+            (they cannot share the cached file).
+        """
+        digest = self.file_digest(output_path)
+        blob_path = self._blob_path(digest)
+        deduplicated = False
+        with self._lock, self._index_lock():
+            self._merge_index(force=True)
+            if not path.exists(blob_path):
+                os.makedirs(path.dirname(blob_path), exist_ok=True)
+                self._link_or_copy(output_path, blob_path)
+            elif not path.samefile(blob_path, output_path):
+                deduplicated = self._link_or_copy(blob_path, output_path, copy=False)
+            self._entries[key] = {
+                "digest": digest,
+                "size": os.stat(blob_path).st_size,
+                "rows": rows,
+                "used_at": time.time(),
+            }
+            self._evict()
+            self._save_index()
+        return deduplicated
+
+    def _evict(self) -> None:
+        """Evict least recently used entries over size budget (call it with merged index under index lock)"""
+        blob_sizes = {e["digest"]: e["size"] for e in self._entries.values()}
+        total_bytes = sum(blob_sizes.values())
+        for key in sorted(self._entries, key=lambda k: self._entries[k]["used_at"]):
+            if total_bytes <= self.max_bytes:
+                return
+            digest = self._entries.pop(key)["digest"]
+            if any(e["digest"] == digest for e in self._entries.values()):
+                continue  # the result file is shared with other entries
+            total_bytes -= blob_sizes[digest]
+            self.logger.debug("Evict query cache: %s", digest)
+            try:
+                os.remove(self._blob_path(digest))
+            except FileNotFoundError:
+                pass
@@ -0,0 +1,111 @@
+"""
+Keyed row-level diff of query results (physical snapshot vs logical snapshot)
+"""
+from typing import Dict, List
+import numpy as np
+import pandas as pd
+from bf_wrapper_types import QueryDiffCountDict
+
+# query name suffix of diff result (e.g. routes.diff.csv for routes.csv)
+DIFF_QUERY_SUFFIX = ".diff"
+# columns of diff result (after key columns)
+#   Diff  : "added" (only in logical snapshot), "removed" (only in physical snapshot) or "changed"
+#   Column: changed column ("changed" only: a row for each changed column)
+#   Before: value in physical snapshot ("changed" only)
+#   After : value in logical snapshot ("changed" only)
+DIFF_COLUMNS = ["Diff", "Column", "Before", "After"]
+# query -> key columns to identify a row
+# NOTE: a query not in this dict (or key columns not unique) is compared with all columns as key
+DIFF_KEYS: Dict[str, List[str]] = {
+    "ip_owners": ["Node", "VRF", "Interface", "IP"],
+    "interface_props": ["Interface"],
+    "node_props": ["Node"],
+    "sw_vlan_props": ["Node", "VLAN_ID"],
+    "ospf_proc_conf": ["Node", "VRF", "Process_ID"],
+    "ospf_intf_conf": ["Interface", "VRF", "Process_ID"],
+    "ospf_area_conf": ["Node", "VRF", "Process_ID", "Area"],
+    "bgp_proc_conf": ["Node", "VRF"],
+    "bgp_peer_conf": ["Node", "VRF", "Remote_IP"],
+    "routes": ["Node", "VRF", "Network", "Next_Hop_IP", "Next_Hop_Interface", "Protocol"],
+    "named_structures": ["Node", "Structure_Type", "Structure_Name"],
+    "edges_layer1": ["Interface", "Remote_Interface"],
+}
+
+
+def diff_query_name(query: str) -> str:
+    """Get query name of diff result
+    Args:
+        query (str): Query name
+    Returns:
+        str: Query name of its diff result
+    """
+    return query + DIFF_QUERY_SUFFIX
+
+
+def diff_keys(query: str, base: pd.DataFrame, target: pd.DataFrame) -> List[str]:
+    """Select key columns to compare query results
+    Args:
+        query (str): Query name
+        base (pd.DataFrame): Query result of physical snapshot
+        target (pd.DataFrame): Query result of logical snapshot
+    Returns:
+        List[str]: Key columns (all common columns if keys in DIFF_KEYS are not found or not unique)
+    """
+    common_columns = [str(c) for c in base.columns if c in target.columns]
+    keys = [k for k in DIFF_KEYS.get(query, []) if k in common_columns]
+    if keys and not base.duplicated(keys).any() and not target.duplicated(keys).any():
+        return keys
+    return common_columns
+
+
+def diff_dataframes(base: pd.DataFrame, target: pd.DataFrame, keys: List[str]) -> pd.DataFrame:
+    """Compare query results by key columns
+    Args:
+        base (pd.DataFrame): Query result of physical snapshot
+        target (pd.DataFrame): Query result of logical snapshot
+        keys (List[str]): Key columns (common columns of base and target)
+    Returns:
+        pd.DataFrame: Diff (key columns and DIFF_COLUMNS, sorted by keys)
+    Note:
+        Values are compared as string (csv result is read as string).
+        Columns that are not in both results are ignored.
+    """
+    value_columns = [str(c) for c in base.columns if c in target.columns and c not in keys]
+    base = base[keys + value_columns].astype(str)
+    target = target[keys + value_columns].astype(str)
+    merged = base.merge(target, how="outer", on=keys, suffixes=("@before", "@after"), indicator=True)
+
+    removed = merged.loc[merged["_merge"] == "left_only", keys].assign(Diff="removed")
+    added = merged.loc[merged["_merge"] == "right_only", keys].assign(Diff="added")
+    both = merged[merged["_merge"] == "both"]
+    before = both[[f"{c}@before" for c in value_columns]].to_numpy()
+    after = both[[f"{c}@after" for c in value_columns]].to_numpy()
+    rows, cols = np.nonzero(before != after)
+    changed = (
+        both[keys]
+        .iloc[rows]
+        .assign(
+            Diff="changed",
+            Column=np.array(value_columns, dtype=object)[cols],
+            Before=before[rows, cols],
+            After=after[rows, cols],
+        )
+    )
+
+    diff = pd.concat([removed, added, changed], ignore_index=True).reindex(columns=keys + DIFF_COLUMNS)
+    return diff.fillna("").sort_values(keys, kind="stable").reset_index(drop=True)
+
+
+def count_diff(diff: pd.DataFrame, keys: List[str]) -> QueryDiffCountDict:
+    """Count rows in diff
+    Args:
+        diff (pd.DataFrame): Diff (made by diff_dataframes)
+        keys (List[str]): Key columns
+    Returns:
+        QueryDiffCountDict: Number of added, removed and changed rows
+    """
+    return {
+        "added": int((diff["Diff"] == "added").sum()),
+        "removed": int((diff["Diff"] == "removed").sum()),
+        "changed": len(diff.loc[diff["Diff"] == "changed", keys].drop_duplicates()),
+    }
@@ -0,0 +1,157 @@
+"""
+Definition of QueryResultStore class
+"""
+import logging
+import os
+import threading
+from collections import OrderedDict
+from os import path
+from typing import Dict, List, Optional, Tuple
+import pandas as pd
+from query_result_cache import QueryResultCache
+from query_result_writer import parse_result_file_name
+from bf_wrapper_types import StoredQueryResultDict
+
+# file signature to detect update of a result file: (inode, mtime_ns, size)
+FileSignature = Tuple[int, int, int]
+
+
+class StoredQueryResult:
+    """Query result loaded from a result file"""
+
+    def __init__(self, query: str, file_path: str, signature: FileSignature, dataframe: pd.DataFrame) -> None:
+        """Constructor
+        Args:
+            query (str): Query name
+            file_path (str): Result file path
+            signature (FileSignature): Signature of the file when loaded
+            dataframe (pd.DataFrame): Query result
+        """
+        self.query = query
+        self.file_path = file_path
+        self.signature = signature
+        self.dataframe = dataframe
+        self.fingerprint = QueryResultCache.file_digest(file_path)
+
+    def select(
+        self,
+        columns: Optional[List[str]] = None,
+        filters: Optional[List[Tuple[str, str]]] = None,
+        offset: int = 0,
+        limit: Optional[int] = None,
+    ) -> Tuple[pd.DataFrame, int]:
+        """Select rows and columns
+        Args:
+            columns (Optional[List[str]]): Columns to select (default: all columns)
+            filters (Optional[List[Tuple[str, str]]]): Pairs of column and value to match (string match, AND)
+            offset (int): Number of rows to skip (after filtering)
+            limit (Optional[int]): Max number of rows (default: all rows)
+        Returns:
+            Tuple[pd.DataFrame, int]: Selected data and number of rows matched the filters
+        Raises:
+            ValueError: Unknown column
+        """
+        unknown_columns = [c for c in (columns or []) + [f[0] for f in filters or []] if c not in self.dataframe]
+        if unknown_columns:
+            raise ValueError(f"Unknown columns: {unknown_columns} (columns: {list(self.dataframe.columns)})")
+
+        dataframe = self.dataframe
+        for column, value in filters or []:
+            dataframe = dataframe[dataframe[column].astype(str) == value]
+        total = len(dataframe)
+        end = None if limit is None else offset + limit
+        dataframe = dataframe.iloc[offset:end]
+        if columns:
+            dataframe = dataframe[columns]
+        return dataframe, total
+
+
+class QueryResultStore:
+    """In-memory index of query result files (to read them without parsing the same file again)"""
+
+    def __init__(self, max_entries: int = 32) -> None:
+        """Constructor
+        Args:
+            max_entries (int): Max number of loaded results (discard least recently used one)
+        """
+        self.logger = logging.getLogger("bfwrapper")
+        self.max_entries = max(max_entries, 1)
+        # result file path -> loaded result
+        self._results: "OrderedDict[str, StoredQueryResult]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _signature(file_path: str) -> FileSignature:
+        """Get signature of a file
+        Args:
+            file_path (str): File path
+        Returns:
+            FileSignature: Signature of the file
+        """
+        stat = os.stat(file_path)
+        return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+    @staticmethod
+    def result_files(output_dir: str) -> Dict[str, str]:
+        """Find query result files in a snapshot output directory
+        Args:
+            output_dir (str): Snapshot output directory
+        Returns:
+            Dict[str, str]: Query name and its result file path
+        Note:
+            If there are several files (formats) for a query, the latest one is used.
+        """
+        files: Dict[str, str] = {}
+        try:
+            file_names = sorted(os.listdir(output_dir), key=lambda f: path.getmtime(path.join(output_dir, f)))
+        except FileNotFoundError:
+            return files  # not found or being replaced with a new generation
+        for file_name in file_names:
+            parsed = parse_result_file_name(file_name)
+            if parsed is not None:
+                files[parsed[0]] = path.join(output_dir, file_name)
+        return files
+
+    def list_results(self, output_dir: str) -> List[StoredQueryResultDict]:
+        """List query results in a snapshot output directory
+        Args:
+            output_dir (str): Snapshot output directory
+        Returns:
+            List[StoredQueryResultDict]: Query results (without data)
+        """
+        return [
+            {"query": query, "file": file_path, "size": path.getsize(file_path)}
+            for query, file_path in sorted(self.result_files(output_dir).items())
+        ]
+
+    def get(self, output_dir: str, query: str) -> Optional[StoredQueryResult]:
+        """Get a query result
+        Args:
+            output_dir (str): Snapshot output directory
+            query (str): Query name
+        Returns:
+            Optional[StoredQueryResult]: Query result or None if not found
+        """
+        file_path = self.result_files(output_dir).get(query)
+        if file_path is None:
+            return None
+        try:
+            signature = self._signature(file_path)
+        except FileNotFoundError:
+            return None  # replaced by another generation just now
+
+        with self._lock:
+            result = self._results.get(file_path)
+            if result is not None and result.signature == signature:
+                self._results.move_to_end(file_path)
+                return result
+
+        self.logger.debug("Load query result: %s", file_path)
+        _query, writer = parse_result_file_name(path.basename(file_path))
+        result = StoredQueryResult(query, file_path, signature, writer.read(file_path))
+        with self._lock:
+            self._results[file_path] = result
+            self._results.move_to_end(file_path)
+            while len(self._results) > self.max_entries:
+                self._results.popitem(last=False)
+        return result
@@ -0,0 +1,196 @@
+"""
+Definition of QueryResultWriter class
+"""
+import json
+import os
+from os import path
+from typing import Any, Dict, Optional, Tuple
+import numpy as np
+import pandas as pd
+from pybatfish.datamodel.primitives import DataModelElement
+
+# output format -> file extension
+OUTPUT_FORMATS: Dict[str, str] = {"csv": ".csv", "parquet": ".parquet", "feather": ".feather"}
+# compression codec of columnar formats
+COLUMNAR_COMPRESSION = "zstd"
+# compression of csv format -> file extension (zstd requires zstandard package)
+CSV_COMPRESSIONS: Dict[str, str] = {"gzip": ".gz", "bz2": ".bz2", "xz": ".xz", "zstd": ".zst"}
+# number of rows written at once (csv)
+CSV_CHUNK_ROWS = 10000
+# list-like cell values (converted to list of str in columnar format)
+LIST_TYPES = (list, tuple, set, np.ndarray)
+
+
+def _is_scalar(value: Any) -> bool:
+    """Test if the value can be stored in a cell of columnar format as is
+    Args:
+        value (Any): Value
+    Returns:
+        bool: True if scalar (str, number, bool or None)
+    """
+    return value is None or isinstance(value, (str, int, float, bool))
+
+
+def _to_scalar(value: Any) -> Any:
+    """Convert a value to scalar
+    Args:
+        value (Any): Value
+    Returns:
+        Any: Value as is if scalar, else its JSON string
+    """
+    return value if _is_scalar(value) else json.dumps(value, default=str)
+
+
+def _flatten_element_column(column: str, values: pd.Series) -> Dict[str, pd.Series]:
+    """Flatten a column of pybatfish objects (Interface, Flow, ...)
+    Args:
+        column (str): Column name
+        values (pd.Series): Column values
+    Returns:
+        Dict[str, pd.Series]: Flat columns: "column" (string of the object) and "column.attribute"
+    """
+    records = [v.dict() if isinstance(v, DataModelElement) else {} for v in values]
+    flat = pd.json_normalize(records, sep=".")
+    flat.index = values.index
+    columns = {column: values.map(lambda v: None if v is None else str(v))}
+    for attribute in flat.columns:
+        columns[f"{column}.{attribute}"] = flat[attribute].map(_to_scalar)
+    return columns
+
+
+def _uniform_column(values: pd.Series) -> pd.Series:
+    """Make column values storable in columnar format
+    Args:
+        values (pd.Series): Column values
+    Returns:
+        pd.Series: Column values (list of str, or scalar of single type)
+    """
+    if values.dtype != object:
+        return values
+    if any(isinstance(v, LIST_TYPES) for v in values):
+        return values.map(
+            lambda v: None if v is None else [str(e) for e in v] if isinstance(v, LIST_TYPES) else [str(v)]
+        )
+    value_types = {type(v) for v in values if v is not None}
+    if len(value_types) > 1 or not all(_is_scalar(v) for v in values):
+        return values.map(lambda v: None if v is None else str(v))
+    return values
+
+
+def flatten_dataframe(dataframe: pd.DataFrame) -> pd.DataFrame:
+    """Normalize query answer to store in columnar format
+    Args:
+        dataframe (pd.DataFrame): Query answer (may contain pybatfish objects)
+    Returns:
+        pd.DataFrame: Flat data (pybatfish objects are expanded to "column.attribute" columns)
+    """
+    columns: Dict[str, pd.Series] = {}
+    for column in dataframe.columns:
+        values = dataframe[column]
+        if values.dtype == object and any(isinstance(v, DataModelElement) for v in values):
+            columns.update(_flatten_element_column(str(column), values))
+        else:
+            columns[str(column)] = _uniform_column(values)
+    return pd.DataFrame(columns, index=dataframe.index)
+
+
+class QueryResultWriter:
+    """Write query result (dataframe) to file in the output format"""
+
+    def __init__(self, output_format: str = "csv", compression: Optional[str] = None) -> None:
+        """Constructor
+        Args:
+            output_format (str): Output format (csv, parquet or feather)
+            compression (Optional[str]): Compression of csv format (gzip, bz2, xz or zstd, default: not compressed)
+        Raises:
+            ValueError: Unknown output format or compression
+        """
+        if output_format not in OUTPUT_FORMATS:
+            raise ValueError(f"Unknown output format: {output_format} (choose from {list(OUTPUT_FORMATS)})")
+        if compression is not None and compression not in CSV_COMPRESSIONS:
+            raise ValueError(f"Unknown compression: {compression} (choose from {list(CSV_COMPRESSIONS)})")
+        if compression is not None and output_format != "csv":
+            raise ValueError(f"Compression is only for csv ({output_format} is compressed by {COLUMNAR_COMPRESSION})")
+        self.output_format = output_format
+        self.compression = compression
+
+    def file_path(self, output_dir: str, query: str) -> str:
+        """Get query result file path
+        Args:
+            output_dir (str): Query result output directory
+            query (str): Query name
+        Returns:
+            str: File path (output_dir/query.ext, e.g. query.csv.gz if compressed)
+        """
+        extension = OUTPUT_FORMATS[self.output_format]
+        if self.compression is not None:
+            extension += CSV_COMPRESSIONS[self.compression]
+        return path.join(output_dir, query + extension)
+
+    def cache_key_elements(self) -> Dict[str, Any]:
+        """Get output options that affect content of the result file
+        Returns:
+            Dict[str, Any]: Output options (elements of query result cache key)
+        """
+        return {"output_format": self.output_format, "compression": self.compression}
+
+    def _compression_options(self) -> Optional[Dict[str, Any]]:
+        """Get compression options for pandas (csv)
+        Returns:
+            Optional[Dict[str, Any]]: Compression options or None if not compressed
+        """
+        if self.compression is None:
+            return None
+        if self.compression == "gzip":
+            return {"method": "gzip", "mtime": 0}  # reproducible output for same data
+        return {"method": self.compression}
+
+    def write(self, dataframe: pd.DataFrame, file_path: str) -> int:
+        """Write query result
+        Args:
+            dataframe (pd.DataFrame): Query result
+            file_path (str): File path to write
+        Returns:
+            int: Number of rows
+        Note:
+            csv is written to the file by chunk of rows (not to make whole csv string in memory).
+        """
+        # NOTE: remove existing file at first, it may be a hard link to a cached result
+        if path.exists(file_path):
+            os.remove(file_path)
+        if self.output_format == "parquet":
+            flatten_dataframe(dataframe).to_parquet(file_path, compression=COLUMNAR_COMPRESSION)
+        elif self.output_format == "feather":
+            flatten_dataframe(dataframe).reset_index(drop=True).to_feather(file_path, compression=COLUMNAR_COMPRESSION)
+        else:
+            dataframe.to_csv(file_path, compression=self._compression_options(), chunksize=CSV_CHUNK_ROWS)
+        return len(dataframe)
+
+    def read(self, file_path: str) -> pd.DataFrame:
+        """Read query result written by the writer
+        Args:
+            file_path (str): File path to read
+        Returns:
+            pd.DataFrame: Query result (all values are str for csv)
+        """
+        if self.output_format == "parquet":
+            return pd.read_parquet(file_path)
+        if self.output_format == "feather":
+            return pd.read_feather(file_path)
+        return pd.read_csv(file_path, index_col=0, dtype=str, keep_default_na=False, compression=self.compression)
+
+
+def parse_result_file_name(file_name: str) -> Optional[Tuple[str, QueryResultWriter]]:
+    """Detect query name and output options from a query result file name
+    Args:
+        file_name (str): File name (e.g. "routes.csv.gz")
+    Returns:
+        Optional[Tuple[str, QueryResultWriter]]: Query name and writer (to read the file), None if not a result file
+    """
+    for output_format, extension in OUTPUT_FORMATS.items():
+        if file_name.endswith(extension):
+            return file_name[: -len(extension)], QueryResultWriter(output_format)
+        for compression, compression_extension in CSV_COMPRESSIONS.items():
+            if output_format == "csv" and file_name.endswith(extension + compression_extension):
+                return file_name[: -len(extension + compression_extension)], QueryResultWriter("csv", compression)
+    return None
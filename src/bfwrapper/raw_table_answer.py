@@ -0,0 +1,151 @@
+"""
+Definition of RawTableAnswer class
+"""
+import logging
+from typing import Any, Dict, List, Optional
+import pandas as pd
+from pybatfish.client.session import Session
+from pybatfish.datamodel.primitives import DataModelElement
+from pybatfish.question.question import QuestionBase
+
+# NOTE: pybatfish internals (not public API) to get raw answer JSON: they may be changed by pybatfish upgrade.
+# Use question.answer() if they are not available.
+try:
+    from pybatfish.client import restv2helper, workhelper
+    from pybatfish.datamodel.answer.base import _parse_json_with_schema
+except ImportError:
+    restv2helper = workhelper = _parse_json_with_schema = None
+
+
+def _to_raw(value: Any) -> Any:
+    """Convert a pybatfish object to raw JSON value
+    Args:
+        value (Any): Cell value of TableAnswer.frame()
+    Returns:
+        Any: Raw JSON value (e.g. dict for Interface)
+    """
+    if isinstance(value, DataModelElement):
+        return value.dict()
+    if isinstance(value, (list, tuple)):
+        return [_to_raw(v) for v in value]
+    return value
+
+
+class RawTableAnswer:
+    """Table answer decoded from raw answer JSON
+
+    pybatfish TableAnswer converts all cells to pybatfish objects (Interface, Flow, Trace, ...) when it is made.
+    RawTableAnswer keeps cells as raw JSON values (e.g. {"hostname": "r1", "interface": "eth0"} for Interface)
+    and converts them only for the requested columns.
+    If the pybatfish internals to get raw answer JSON are not available, it is made from TableAnswer.frame().
+    """
+
+    # False after the raw answer path failed (not to try it again)
+    raw_answer_available = _parse_json_with_schema is not None
+
+    def __init__(self, answer: Dict[str, Any]) -> None:
+        """Constructor
+        Args:
+            answer (Dict[str, Any]): Raw answer JSON
+        Raises:
+            ValueError: Not a table answer
+        """
+        if not answer.get("answerElements") or "metadata" not in answer["answerElements"][0]:
+            raise ValueError("Not a table answer: answer elements or table metadata not found")
+        answer_element = answer["answerElements"][0]
+        # column name -> schema (in order of columns)
+        self.schemas: Dict[str, str] = {
+            c["name"]: c["schema"] for c in answer_element["metadata"].get("columnMetadata", [])
+        }
+        self.rows: List[Dict[str, Any]] = answer_element.get("rows", [])
+        # pybatfish objects (made from TableAnswer.frame())
+        self._rich_frame: Optional[pd.DataFrame] = None
+
+    @classmethod
+    def from_frame(cls, dataframe: pd.DataFrame) -> "RawTableAnswer":
+        """Make answer from TableAnswer.frame()
+        Args:
+            dataframe (pd.DataFrame): Answer data (cells are pybatfish objects)
+        Returns:
+            RawTableAnswer: Answer (raw JSON values are made from pybatfish objects)
+        """
+        answer = cls(
+            {
+                "answerElements": [
+                    {
+                        "metadata": {"columnMetadata": [{"name": c, "schema": ""} for c in dataframe.columns]},
+                        "rows": [
+                            {c: _to_raw(v) for c, v in row.items()} for row in dataframe.to_dict(orient="records")
+                        ],
+                    }
+                ]
+            }
+        )
+        answer._rich_frame = dataframe  # pylint: disable=protected-access
+        return answer
+
+    @classmethod
+    def ask(cls, bf_session: Session, question: QuestionBase) -> "RawTableAnswer":
+        """Ask a question to batfish and decode its answer
+        Args:
+            bf_session (Session): Batfish session (network/snapshot is set)
+            question (QuestionBase): Question (e.g. bf_session.q.nodeProperties())
+        Returns:
+            RawTableAnswer: Answer
+        Note:
+            Same as `question.answer()` except parsing answer JSON (see Session.answer_question).
+            Falls back to `question.answer().frame()` if pybatfish internals are not available (or changed).
+        """
+        if cls.raw_answer_available:
+            try:
+                snapshot = bf_session.get_snapshot()
+                question_name = question.get_name()
+                restv2helper.upload_question(bf_session, question_name, question.json())
+                workhelper.execute(workhelper.get_workitem_answer(bf_session, question_name, snapshot), bf_session)
+                params = {"snapshot": snapshot, "referenceSnapshot": None}
+                return cls(restv2helper.get_answer(bf_session, question_name, params))
+            except (AttributeError, TypeError) as err:
+                logging.getLogger("bfwrapper").warning("Raw answer is not available, use question.answer(): %s", err)
+                cls.raw_answer_available = False
+        return cls.from_frame(question.answer().frame())
+
+    def __len__(self) -> int:
+        """Number of rows"""
+        return len(self.rows)
+
+    @property
+    def columns(self) -> List[str]:
+        """Column names"""
+        return list(self.schemas)
+
+    def column(self, name: str, rich: bool = False) -> List[Any]:
+        """Get values of a column
+        Args:
+            name (str): Column name
+            rich (bool): True to convert values to pybatfish objects
+        Returns:
+            List[Any]: Raw JSON values (or pybatfish objects if rich)
+        Raises:
+            KeyError: Unknown column
+        """
+        schema = self.schemas[name]
+        if rich and self._rich_frame is not None:
+            return list(self._rich_frame[name])
+        values = [row.get(name) for row in self.rows]
+        if rich:
+            return [_parse_json_with_schema(schema, value) for value in values]
+        return values
+
+    def frame(self, rich_columns: Optional[List[str]] = None) -> pd.DataFrame:
+        """Convert to dataframe
+        Args:
+            rich_columns (Optional[List[str]]): Columns to convert values to pybatfish objects
+              (default: none, all columns have raw JSON values)
+        Returns:
+            pd.DataFrame: Answer data (same columns as TableAnswer.frame(), dtype is object)
+        """
+        rich_columns = rich_columns or []
+        return pd.DataFrame(
+            {c: pd.Series(self.column(c, c in rich_columns), dtype="object") for c in self.columns},
+            columns=self.columns,
+        )
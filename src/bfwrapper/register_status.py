@@ -18,6 +18,11 @@ class RegisterStatus:
             network (str): Network name
             snapshot (str): Snapshot name
             status_str (str): Register status string
+              "registered": physical snapshot is registered (loaded) in batfish
+              "forked"    : logical snapshot is forked from its physical snapshot in batfish
+              "unchanged" : snapshot is already registered and its input is not changed
+              "cached"    : snapshot is not registered (all query results are restored from query result cache
+                            or derived from its physical snapshot)
             snapshot_pattern (Optional[Union[SnapshotPattern, SnapshotPatternDict]]): snapshot pattern
               (if the snapshot is logical)
         """
@@ -0,0 +1,158 @@
+"""
+Definition of RunManifest class
+"""
+import json
+import logging
+import os
+import threading
+import time
+from os import path
+from typing import Any, Dict, List, Optional
+from bf_wrapper_types import RunManifestDict, WholeQuerySummaryDict
+
+
+class RunManifest:
+    """Progress record of a run (exec queries for all snapshots in a network) to resume it
+
+    Manifest file construction (json):
+        network   : network name
+        options   : options of the run (target query and output options)
+        started_at: time when the run started
+        snapshots : snapshot name -> RunManifestSnapshotDict
+          status     : "running", "finished" or "failed"
+          fingerprint: input fingerprint of the snapshot when its queries were executed
+          summary    : query summary of the snapshot (finished) or None
+          error      : error message (failed) or None
+          queries    : names of queries finished in the run (their results are in query result cache)
+          updated_at : time when the status was recorded
+    """
+
+    def __init__(self, manifest_path: str, network: str, options: Dict[str, Any], resume: bool = False) -> None:
+        """Constructor
+        Args:
+            manifest_path (str): Manifest file path
+            network (str): Network name
+            options (Dict[str, Any]): Options of the run (JSON-serializable)
+            resume (bool): True to continue the previous run (if its options are same), else start a new run
+        """
+        self.logger = logging.getLogger("bfwrapper")
+        self.manifest_path = manifest_path
+        self._lock = threading.Lock()
+        manifest = self._load() if resume else None
+        if manifest is not None and manifest["network"] == network and manifest["options"] == options:
+            self.logger.info("Resume run started at %s: %s", manifest["started_at"], manifest_path)
+            self._manifest = manifest
+        else:
+            if resume:
+                self.logger.info("No run to resume (not found or options changed), start new run: %s", manifest_path)
+            self._manifest = {"network": network, "options": options, "started_at": time.time(), "snapshots": {}}
+            with self._lock:
+                self._save()
+
+    def _load(self) -> Optional[RunManifestDict]:
+        """Load manifest file
+        Returns:
+            Optional[RunManifestDict]: Manifest or None if not found (or broken)
+        """
+        if not path.exists(self.manifest_path):
+            return None
+        with open(self.manifest_path, "r", encoding="utf-8") as file:
+            try:
+                return json.load(file)
+            except json.JSONDecodeError as err:
+                self.logger.warning("Ignore broken run manifest %s: %s", self.manifest_path, err)
+                return None
+
+    def _save(self) -> None:
+        """Save manifest file (replace it atomically)"""
+        os.makedirs(path.dirname(self.manifest_path), exist_ok=True)
+        tmp_path = f"{self.manifest_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            json.dump(self._manifest, file)
+        os.replace(tmp_path, self.manifest_path)
+
+    def finished_summary(self, snapshot: str, fingerprint: Optional[str]) -> Optional[WholeQuerySummaryDict]:
+        """Get query summary of a snapshot finished in the run
+        Args:
+            snapshot (str): Snapshot name
+            fingerprint (Optional[str]): Current input fingerprint of the snapshot
+        Returns:
+            Optional[WholeQuerySummaryDict]: Query summary or None if the snapshot is not finished,
+              failed, its input is changed or its query results are removed
+        """
+        with self._lock:
+            entry = self._manifest["snapshots"].get(snapshot)
+        if entry is None or entry["status"] != "finished" or fingerprint is None:
+            return None
+        if entry["fingerprint"] != fingerprint or not path.isdir(entry["summary"]["queries_dir"]):
+            return None
+        return entry["summary"]
+
+    def finished_queries(self, snapshot: str, fingerprint: Optional[str]) -> List[str]:
+        """Get queries of a snapshot finished in the run (e.g. before the snapshot failed)
+        Args:
+            snapshot (str): Snapshot name
+            fingerprint (Optional[str]): Current input fingerprint of the snapshot
+        Returns:
+            List[str]: Query names (empty if the input of the snapshot is changed)
+        """
+        with self._lock:
+            entry = self._manifest["snapshots"].get(snapshot)
+            if entry is None or fingerprint is None or entry["fingerprint"] != fingerprint:
+                return []
+            return list(entry.get("queries", []))
+
+    def _record(self, snapshot: str, entry: Dict[str, Any], query: Optional[str] = None) -> None:
+        """Record status of a snapshot
+        Args:
+            snapshot (str): Snapshot name
+            entry (Dict[str, Any]): Status of the snapshot
+            query (Optional[str]): Query finished in the run (added to finished queries)
+        Returns:
+            None
+        Note:
+            Finished queries are kept while the input fingerprint of the snapshot is same.
+        """
+        with self._lock:
+            previous = self._manifest["snapshots"].get(snapshot)
+            queries = []
+            if previous is not None and previous["fingerprint"] == entry["fingerprint"]:
+                queries = previous.get("queries", [])
+            if query is not None and query not in queries:
+                queries = [*queries, query]
+            self._manifest["snapshots"][snapshot] = {**entry, "queries": queries, "updated_at": time.time()}
+            self._save()
+
+    def record_query_finished(self, snapshot: str, fingerprint: Optional[str], query: str) -> None:
+        """Record a query of a snapshot finished (the snapshot is running)
+        Args:
+            snapshot (str): Snapshot name
+            fingerprint (Optional[str]): Input fingerprint of the snapshot (when its queries started)
+            query (str): Query name
+        Returns:
+            None
+        """
+        entry = {"status": "running", "fingerprint": fingerprint, "summary": None, "error": None}
+        self._record(snapshot, entry, query)
+
+    def record_finished(self, snapshot: str, fingerprint: Optional[str], summary: WholeQuerySummaryDict) -> None:
+        """Record a snapshot whose queries are finished
+        Args:
+            snapshot (str): Snapshot name
+            fingerprint (Optional[str]): Input fingerprint of the snapshot (when its queries started)
+            summary (WholeQuerySummaryDict): Query summary of the snapshot
+        Returns:
+            None
+        """
+        self._record(snapshot, {"status": "finished", "fingerprint": fingerprint, "summary": summary, "error": None})
+
+    def record_failed(self, snapshot: str, fingerprint: Optional[str], error: str) -> None:
+        """Record a snapshot whose queries are failed
+        Args:
+            snapshot (str): Snapshot name
+            fingerprint (Optional[str]): Input fingerprint of the snapshot (when its queries started)
+            error (str): Error message
+        Returns:
+            None
+        """
+        self._record(snapshot, {"status": "failed", "fingerprint": fingerprint, "summary": None, "error": error})
@@ -0,0 +1,94 @@
+"""
+Content fingerprint of snapshot input (configs and layer1 topology)
+"""
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from os import path
+from typing import List, Tuple
+
+# input files of a snapshot directory that affects batfish parsing
+# + snapshot_dir/
+#   + configs/                  (all files, recursively)
+#   + batfish/                  (layer1_topology.json, runtime_data.json, ...)
+#   - layer1_topology.json      (if it is placed in snapshot directory)
+FINGERPRINT_DIRS = ["configs", "batfish"]
+FINGERPRINT_FILES = ["layer1_topology.json"]
+
+# max number of files in digest memo (discard least recently used one)
+FILE_DIGEST_MEMO_SIZE = 8192
+
+# file digest memo: file path -> (mtime_ns, size, digest)
+_file_digests: "OrderedDict[str, Tuple[int, int, str]]" = OrderedDict()
+_file_digests_lock = threading.Lock()
+
+
+def _file_digest(file_path: str, mtime_ns: int, size: int) -> str:
+    """Get sha256 digest of a file (memoized with its mtime and size for recently used FILE_DIGEST_MEMO_SIZE files)
+    Args:
+        file_path (str): File path
+        mtime_ns (int): Modification time of the file
+        size (int): Size of the file
+    Returns:
+        str: Hex digest
+    """
+    with _file_digests_lock:
+        memo = _file_digests.get(file_path)
+        if memo is not None and memo[0] == mtime_ns and memo[1] == size:
+            _file_digests.move_to_end(file_path)
+            return memo[2]
+
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as file:
+        for chunk in iter(lambda: file.read(1 << 20), b""):
+            digest.update(chunk)
+    with _file_digests_lock:
+        _file_digests[file_path] = (mtime_ns, size, digest.hexdigest())
+        _file_digests.move_to_end(file_path)
+        while len(_file_digests) > FILE_DIGEST_MEMO_SIZE:
+            _file_digests.popitem(last=False)
+    return digest.hexdigest()
+
+
+def _fingerprint_files(snapshot_dir: str) -> List[str]:
+    """Find input files to fingerprint in snapshot directory
+    Args:
+        snapshot_dir (str): Snapshot directory path
+    Returns:
+        List[str]: File paths (relative to snapshot directory, sorted)
+    """
+    files = [f for f in FINGERPRINT_FILES if path.isfile(path.join(snapshot_dir, f))]
+    for input_dir in FINGERPRINT_DIRS:
+        for dir_path, _dir_names, file_names in os.walk(path.join(snapshot_dir, input_dir)):
+            files.extend(path.relpath(path.join(dir_path, f), snapshot_dir) for f in file_names)
+    return sorted(files)
+
+
+def snapshot_fingerprint(snapshot_dir: str) -> str:
+    """Calculate fingerprint of snapshot input
+    Args:
+        snapshot_dir (str): Snapshot directory path
+    Returns:
+        str: Fingerprint (hex digest of file names, sizes and content hashes)
+    """
+    digest = hashlib.sha256()
+    for file in _fingerprint_files(snapshot_dir):
+        stat = os.stat(path.join(snapshot_dir, file))
+        file_digest = _file_digest(path.join(snapshot_dir, file), stat.st_mtime_ns, stat.st_size)
+        digest.update(f"{file}\0{stat.st_size}\0{file_digest}\n".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def logical_snapshot_fingerprint(orig_fingerprint: str, deactivate_interfaces: List[str]) -> str:
+    """Calculate fingerprint of logical snapshot
+    Args:
+        orig_fingerprint (str): Fingerprint of origin (physical) snapshot
+        deactivate_interfaces (List[str]): Interfaces deactivated in the logical snapshot ("host[interface]")
+    Returns:
+        str: Fingerprint
+    """
+    digest = hashlib.sha256(orig_fingerprint.encode("utf-8"))
+    for interface in sorted(deactivate_interfaces):
+        digest.update(f"\0{interface}".encode("utf-8"))
+    return digest.hexdigest()
@@ -0,0 +1,85 @@
+"""
+Definition of SnapshotResidencyPool class
+"""
+import itertools
+import threading
+from typing import Dict, List, Tuple
+
+EVICTION_POLICIES = ["lru", "lfu"]
+
+
+class SnapshotResidencyPool:
+    """Residency pool of logical (forked) snapshots kept in batfish"""
+
+    def __init__(self, max_size: int = 1, policy: str = "lru") -> None:
+        """Constructor
+        Args:
+            max_size (int): Max number of logical snapshots kept in batfish for each network
+            policy (str): Eviction policy ("lru": least recently used, "lfu": least frequently used)
+        Raises:
+            ValueError: Unknown eviction policy
+        """
+        if policy not in EVICTION_POLICIES:
+            raise ValueError(f"Unknown eviction policy: {policy} (choose from {EVICTION_POLICIES})")
+        self.max_size = max(max_size, 1)
+        self.policy = policy
+        # network -> snapshot -> [access count, last access sequence number]
+        self._usages: Dict[str, Dict[str, List[int]]] = {}
+        self._sequence = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def touch(self, network: str, snapshot: str) -> None:
+        """Record an access to the logical snapshot
+        Args:
+            network (str): Network name
+            snapshot (str): Snapshot name (logical)
+        Returns:
+            None
+        """
+        with self._lock:
+            usage = self._usages.setdefault(network, {}).setdefault(snapshot, [0, 0])
+            usage[0] += 1
+            usage[1] = next(self._sequence)
+
+    def discard(self, network: str, snapshot: str) -> None:
+        """Forget the logical snapshot (it is unregistered from batfish)
+        Args:
+            network (str): Network name
+            snapshot (str): Snapshot name (logical)
+        Returns:
+            None
+        """
+        with self._lock:
+            self._usages.get(network, {}).pop(snapshot, None)
+
+    def _eviction_key(self, network: str, snapshot: str) -> Tuple[int, ...]:
+        """Sort key of eviction order (smaller is evicted first)
+        Args:
+            network (str): Network name
+            snapshot (str): Snapshot name (logical)
+        Returns:
+            Tuple[int, ...]: Sort key
+        Note:
+            Snapshots that are not tracked by the pool (e.g. registered before the wrapper started)
+            are evicted first.
+        """
+        count, last_seq = self._usages.get(network, {}).get(snapshot, [0, 0])
+        if self.policy == "lfu":
+            return count, last_seq
+        return (last_seq,)
+
+    def victims(self, network: str, residents: List[str], reserved: int = 0) -> List[str]:
+        """Select logical snapshots to evict
+        Args:
+            network (str): Network name
+            residents (List[str]): Logical snapshots loaded in batfish (candidates to evict)
+            reserved (int): Number of slots to keep for snapshots that are not in residents
+        Returns:
+            List[str]: Snapshots to evict
+        """
+        overflow = len(residents) + reserved - self.max_size
+        if overflow <= 0:
+            return []
+        with self._lock:
+            ordered = sorted(residents, key=lambda s: self._eviction_key(network, s))
+        return ordered[:overflow]
@@ -0,0 +1,302 @@
+"""
+Staging directory to regenerate query results without breaking the previous generation
+
+Output directory construction (default):
+    + parent/
+      + output                            (query results, swapped with staging directory by two renames)
+        - .generation.json                (properties of the generation, e.g. input fingerprint)
+      + .output.staging.<pid>.<tid>       (staging directory: next generation being made)
+      - .output.lock                      (lock file to commit generations one by one)
+
+Output directory construction (generations=True in commit_staging_dir):
+    + parent/
+      - output -> .output.gen.abcdef...   (symlink to current generation, replaced atomically)
+      + .output.gen.abcdef...             (generation directory: query results)
+        - .generation.json
+      + .output.staging.<pid>.<tid>
+      - .output.lock
+"""
+import fcntl
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from os import path
+from typing import Any, Dict, Iterator, List, Optional
+
+# staging directory/temporary symlink name: .<output dir name>.<kind>.<pid>.<thread id>
+# ("retired" is a directory left by old commit with renames, only to clean up)
+STAGING_KINDS = ["staging", "retired", "link"]
+# generation directory name: .<output dir name>.gen.<unique id>
+GENERATION_KIND = "gen"
+# time to keep replaced generations [sec] (for readers that have found files in them)
+GENERATION_GRACE_SECONDS = 60.0
+# properties of a generation (in generation directory)
+GENERATION_FILE = ".generation.json"
+
+
+def _work_dir(output_dir: str, kind: str) -> str:
+    """Get a work directory path for the output directory
+    Args:
+        output_dir (str): Output directory path
+        kind (str): Kind of work directory (in STAGING_KINDS)
+    Returns:
+        str: Work directory path (hidden sibling of the output directory)
+    """
+    name = f".{path.basename(output_dir)}.{kind}.{os.getpid()}.{threading.get_ident()}"
+    return path.join(path.dirname(output_dir), name)
+
+
+def _generation_dir(output_dir: str) -> str:
+    """Get a new generation directory path for the output directory
+    Args:
+        output_dir (str): Output directory path
+    Returns:
+        str: Generation directory path (hidden sibling of the output directory)
+    """
+    name = f".{path.basename(output_dir)}.{GENERATION_KIND}.{uuid.uuid4().hex}"
+    return path.join(path.dirname(output_dir), name)
+
+
+def _generation_dirs(output_dir: str) -> List[str]:
+    """Find generation directories of the output directory
+    Args:
+        output_dir (str): Output directory path
+    Returns:
+        List[str]: Generation directory paths (including current one)
+    """
+    parent_dir = path.dirname(output_dir)
+    if not path.isdir(parent_dir):
+        return []
+    prefix = f".{path.basename(output_dir)}.{GENERATION_KIND}."
+    return [
+        path.join(parent_dir, name)
+        for name in os.listdir(parent_dir)
+        if name.startswith(prefix) and "." not in name.replace(prefix, "", 1)
+    ]
+
+
+def _remove(entry: str) -> None:
+    """Remove a directory, file or symlink (do nothing if not found)
+    Args:
+        entry (str): Path to remove
+    Returns:
+        None
+    """
+    if path.islink(entry) or path.isfile(entry):
+        try:
+            os.remove(entry)
+        except FileNotFoundError:
+            pass
+    else:
+        shutil.rmtree(entry, ignore_errors=True)
+
+
+@contextmanager
+def _output_dir_lock(output_dir: str) -> Iterator[None]:
+    """Lock the output directory to commit a generation (among threads and processes)
+    Args:
+        output_dir (str): Output directory path
+    Yields:
+        None
+    """
+    os.makedirs(path.dirname(output_dir), exist_ok=True)
+    lock_path = path.join(path.dirname(output_dir), f".{path.basename(output_dir)}.lock")
+    # NOTE: flock is owned by an open file description: it also works among threads (each opens the file)
+    with open(lock_path, "a", encoding="utf-8") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _is_alive(pid: int) -> bool:
+    """Test if the process is alive
+    Args:
+        pid (int): Process ID
+    Returns:
+        bool: True if the process exists
+    """
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass  # exists but owned by other user
+    return True
+
+
+def _stale_work_dirs(output_dir: str) -> List[str]:
+    """Find work directories left by crashed processes
+    Args:
+        output_dir (str): Output directory path
+    Returns:
+        List[str]: Work directory paths
+    """
+    parent_dir = path.dirname(output_dir)
+    if not path.isdir(parent_dir):
+        return []
+    stale_dirs = []
+    for name in os.listdir(parent_dir):
+        elements = name.split(".")
+        if (
+            name.startswith(f".{path.basename(output_dir)}.")
+            and len(elements) >= 4
+            and elements[-3] in STAGING_KINDS
+            and elements[-2].isdigit()
+            and int(elements[-2]) != os.getpid()
+            and not _is_alive(int(elements[-2]))
+        ):
+            stale_dirs.append(path.join(parent_dir, name))
+    return stale_dirs
+
+
+def _remove_old_generations(output_dir: str, grace: float = GENERATION_GRACE_SECONDS) -> None:
+    """Remove generation directories replaced before grace period (call it with output dir lock)
+    Args:
+        output_dir (str): Output directory path
+        grace (float): Time to keep replaced generations [sec] (mtime of a generation is its replaced time)
+    Returns:
+        None
+    """
+    current_name = os.readlink(output_dir) if path.islink(output_dir) else None
+    expired_at = time.time() - grace
+    for generation_dir in _generation_dirs(output_dir):
+        try:
+            if path.basename(generation_dir) != current_name and path.getmtime(generation_dir) <= expired_at:
+                shutil.rmtree(generation_dir, ignore_errors=True)
+        except FileNotFoundError:
+            pass  # removed by other process
+
+
+def read_generation(output_dir: str) -> Optional[Dict[str, Any]]:
+    """Read properties of current generation of the output directory
+    Args:
+        output_dir (str): Output directory path
+    Returns:
+        Optional[Dict[str, Any]]: Properties or None if unknown (not found or made without properties)
+    """
+    try:
+        with open(path.join(output_dir, GENERATION_FILE), "r", encoding="utf-8") as file:
+            return json.load(file)
+    except (FileNotFoundError, NotADirectoryError, json.JSONDecodeError):
+        return None
+
+
+def prepare_staging_dir(
+    output_dir: str, keep_previous: bool = True, generation: Optional[Dict[str, Any]] = None
+) -> str:
+    """Make a staging directory to write new generation of the output directory
+    Args:
+        output_dir (str): Output directory path
+        keep_previous (bool): True to start from files of the previous generation (hard-linked)
+        generation (Optional[Dict[str, Any]]): Properties of new generation (JSON-serializable, e.g. input
+          fingerprint): files of the previous generation are kept only if it has the same properties
+    Returns:
+        str: Staging directory path
+    Note:
+        Files in staging directory must be replaced (not modified in place): they may be hard links to the previous.
+    """
+    for stale_dir in _stale_work_dirs(output_dir):
+        _remove(stale_dir)
+    staging_dir = _work_dir(output_dir, "staging")
+    shutil.rmtree(staging_dir, ignore_errors=True)
+    # not to copy a generation being removed by other commit
+    with _output_dir_lock(output_dir):
+        if keep_previous and path.isdir(output_dir) and read_generation(output_dir) == generation:
+            shutil.copytree(output_dir, staging_dir, copy_function=os.link)
+        else:
+            os.makedirs(staging_dir)
+    if generation is not None:
+        generation_file = path.join(staging_dir, GENERATION_FILE)
+        _remove(generation_file)  # hard link to the previous
+        with open(generation_file, "w", encoding="utf-8") as file:
+            json.dump(generation, file)
+    return staging_dir
+
+
+def _swap_output_dir(staging_dir: str, output_dir: str) -> None:
+    """Swap the output directory with the staging directory by two renames (call it with output dir lock)
+    Args:
+        staging_dir (str): Staging directory path
+        output_dir (str): Output directory path
+    Returns:
+        None
+    """
+    retired_dir = _work_dir(output_dir, "retired")
+    _remove(retired_dir)
+    if path.islink(output_dir):
+        _remove(output_dir)  # made with generations
+    elif path.isdir(output_dir):
+        os.rename(output_dir, retired_dir)
+    try:
+        os.rename(staging_dir, output_dir)
+    except OSError:
+        if path.isdir(retired_dir):
+            os.rename(retired_dir, output_dir)
+        raise
+    _remove(retired_dir)
+    _remove_old_generations(output_dir)
+
+
+def commit_staging_dir(staging_dir: str, output_dir: str, generations: bool = False) -> None:
+    """Make the staging directory current generation of the output directory
+    Args:
+        staging_dir (str): Staging directory path
+        output_dir (str): Output directory path
+        generations (bool): True to make the output directory a symlink to a generation directory
+    Returns:
+        None
+    Note:
+        Concurrent commits for the same output directory are serialized: the last one wins.
+        By default, the output directory is a real directory swapped by two renames: no partial output is visible,
+        but there is a moment without output directory and a reader may fail to read a file that it has just found.
+        With generations, the output directory is a symlink replaced atomically (readers see the previous or new
+        generation, always). Replaced generations are removed in later commits after GENERATION_GRACE_SECONDS
+        (not to remove files that readers have just found). An output directory made without generations
+        (a real directory) is moved to a generation at first (there is a moment without output directory only then).
+    """
+    with _output_dir_lock(output_dir):
+        if not generations:
+            _swap_output_dir(staging_dir, output_dir)
+            return
+        generation_dir = _generation_dir(output_dir)
+        os.rename(staging_dir, generation_dir)
+        previous_dir = path.realpath(output_dir) if path.islink(output_dir) else None
+        if path.isdir(output_dir) and not path.islink(output_dir):
+            previous_dir = _generation_dir(output_dir)
+            os.rename(output_dir, previous_dir)
+        link_path = _work_dir(output_dir, "link")
+        _remove(link_path)
+        os.symlink(path.basename(generation_dir), link_path)
+        os.replace(link_path, output_dir)
+        if previous_dir is not None and path.isdir(previous_dir):
+            os.utime(previous_dir)  # replaced time
+        _remove_old_generations(output_dir)
+
+
+def discard_staging_dir(staging_dir: str) -> None:
+    """Remove a staging directory (when failed to make new generation)
+    Args:
+        staging_dir (str): Staging directory path
+    Returns:
+        None
+    """
+    shutil.rmtree(staging_dir, ignore_errors=True)
+
+
+def remove_output_dir(output_dir: str) -> None:
+    """Remove an output directory and its generations
+    Args:
+        output_dir (str): Output directory path
+    Returns:
+        None
+    """
+    with _output_dir_lock(output_dir):
+        _remove(output_dir)
+        _remove_old_generations(output_dir, grace=0.0)
+        _remove(path.join(path.dirname(output_dir), f".{path.basename(output_dir)}.lock"))
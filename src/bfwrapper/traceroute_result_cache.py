@@ -0,0 +1,187 @@
+"""
+Definition of TracerouteResultCache class
+"""
+import json
+import logging
+import os
+import shutil
+import threading
+from collections import OrderedDict
+from os import path
+from typing import Optional, Tuple
+from urllib.parse import quote
+from query_result_cache import QueryResultCache
+from metrics_registry import MetricsRegistry
+from bf_wrapper_types import TracerouteQueryStatus
+
+
+class TracerouteResultCache:
+    """Cache of traceroute results (in memory, and in files optionally)
+
+    Cache directory construction (optional):
+        + cache_dir/
+          + network/
+            + snapshot/           (quoted: "/" in snapshot name is "%2F")
+              - abcdef....json    (traceroute result named with its cache key)
+
+    Results are keyed by network, snapshot, snapshot input fingerprint and flow (source and destination):
+    changed snapshot input makes new keys. Results of a snapshot are discarded when it is registered again.
+    """
+
+    def __init__(
+        self, max_entries: int = 256, cache_dir: Optional[str] = None, metrics: Optional[MetricsRegistry] = None
+    ) -> None:
+        """Constructor
+        Args:
+            max_entries (int): Max number of results in memory (discard least recently used one, 0 to disable cache)
+            cache_dir (Optional[str]): Cache directory path to keep results in files (default: memory only)
+            metrics (Optional[MetricsRegistry]): Metrics registry to count cache hits/misses
+        """
+        self.logger = logging.getLogger("bfwrapper")
+        self.max_entries = max(max_entries, 0)
+        self.cache_dir = cache_dir
+        self.metrics = metrics
+        if self.metrics is not None:
+            self.metrics.counter("bfwrapper_traceroute_cache_requests_total", "Traceroute result cache lookups")
+        self.hits = 0
+        self.misses = 0
+        # cache key -> (network, snapshot, result)
+        self._entries: "OrderedDict[str, Tuple[str, str, TracerouteQueryStatus]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(  # pylint: disable=too-many-arguments
+        network: str, snapshot: str, fingerprint: str, node: str, intf: str, destination: str
+    ) -> str:
+        """Make a cache key
+        Args:
+            network (str): Network name
+            snapshot (str): Snapshot name
+            fingerprint (str): Fingerprint of snapshot input
+            node (str): Node name (source)
+            intf (str): Interface name (source)
+            destination (str): Traceroute destination
+        Returns:
+            str: Cache key (hex digest)
+        """
+        return QueryResultCache.make_key(
+            network=network,
+            snapshot=snapshot,
+            fingerprint=fingerprint,
+            node=node.lower(),
+            intf=intf,
+            destination=destination,
+        )
+
+    def _snapshot_dir(self, network: str, snapshot: str) -> str:
+        """Get cache directory of a snapshot
+        Args:
+            network (str): Network name
+            snapshot (str): Snapshot name
+        Returns:
+            str: Cache directory path of the snapshot
+        """
+        return path.join(self.cache_dir, quote(network, safe=""), quote(snapshot, safe=""))
+
+    def _count(self, hit: bool) -> None:
+        """Count a cache lookup
+        Args:
+            hit (bool): True if hit
+        Returns:
+            None
+        """
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+        if self.metrics is not None:
+            self.metrics.inc("bfwrapper_traceroute_cache_requests_total", {"result": "hit" if hit else "miss"})
+
+    def _put_memory(self, key: str, network: str, snapshot: str, result: TracerouteQueryStatus) -> None:
+        """Put a result in memory (discard least recently used ones over max entries)
+        Args:
+            key (str): Cache key
+            network (str): Network name
+            snapshot (str): Snapshot name
+            result (TracerouteQueryStatus): Traceroute result
+        Returns:
+            None
+        """
+        with self._lock:
+            self._entries[key] = (network, snapshot, result)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get(self, key: str, network: str, snapshot: str) -> Optional[TracerouteQueryStatus]:
+        """Get a cached result
+        Args:
+            key (str): Cache key
+            network (str): Network name
+            snapshot (str): Snapshot name
+        Returns:
+            Optional[TracerouteQueryStatus]: Traceroute result (do not modify it) or None if not cached
+        """
+        if self.max_entries == 0:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+        if entry is not None:
+            self._count(True)
+            return entry[2]
+
+        result = None
+        if self.cache_dir is not None:
+            file_path = path.join(self._snapshot_dir(network, snapshot), f"{key}.json")
+            try:
+                with open(file_path, "r", encoding="utf-8") as file:
+                    result = json.load(file)
+            except (FileNotFoundError, json.JSONDecodeError):
+                result = None
+        if result is not None:
+            self._put_memory(key, network, snapshot, result)
+        self._count(result is not None)
+        return result
+
+    def put(self, key: str, network: str, snapshot: str, result: TracerouteQueryStatus) -> None:
+        """Put a result
+        Args:
+            key (str): Cache key
+            network (str): Network name
+            snapshot (str): Snapshot name
+            result (TracerouteQueryStatus): Traceroute result (JSON-serializable)
+        Returns:
+            None
+        """
+        if self.max_entries == 0:
+            return
+        self._put_memory(key, network, snapshot, result)
+        if self.cache_dir is None:
+            return
+        snapshot_dir = self._snapshot_dir(network, snapshot)
+        os.makedirs(snapshot_dir, exist_ok=True)
+        file_path = path.join(snapshot_dir, f"{key}.json")
+        tmp_path = f"{file_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            json.dump(result, file)
+        os.replace(tmp_path, file_path)
+
+    def discard(self, network: str, snapshot: str) -> None:
+        """Discard cached results of a snapshot
+        Args:
+            network (str): Network name
+            snapshot (str): Snapshot name
+        Returns:
+            None
+        """
+        with self._lock:
+            keys = [k for k, (n, s, _result) in self._entries.items() if n == network and s == snapshot]
+            for key in keys:
+                del self._entries[key]
+        if self.cache_dir is not None:
+            shutil.rmtree(self._snapshot_dir(network, snapshot), ignore_errors=True)
+        if keys:
+            self.logger.info("Discard %s cached traceroute results of %s/%s", len(keys), network, snapshot)
@@ -1,9 +1,30 @@
-from flask import Blueprint, request, jsonify, Response
-from app_common import bfqt, app_logger
+from typing import Callable, Dict, List
+from flask import Blueprint, request, jsonify, abort, Response
+from bfwrapper.bf_wrapper_types import RegisterStatusDict
+from bfwrapper.raw_table_answer import RawTableAnswer
+from app_common import bfqt, app_logger, job_manager
+from request_args import arg_flag
 
 bp_batfish = Blueprint("batfish", __name__, url_prefix="/batfish")
 
 
+def _interface_addresses(interface_props: RawTableAnswer) -> List[Dict]:
+    """Convert interface properties to interface addresses
+    Args:
+        interface_props (RawTableAnswer): Interface properties
+    Returns:
+        List[Dict]: A list of {node, interface, list of address}
+    """
+    return [
+        {
+            "node": interface["hostname"],
+            "interface": interface["interface"],
+            "addresses": [x[: x.find("/")] for x in prefixes],
+        }
+        for interface, prefixes in zip(interface_props.column("Interface"), interface_props.column("All_Prefixes"))
+    ]
+
+
 @bp_batfish.route("/<network>/<snapshot>/nodes", methods=["GET"])
 def get_node_list(network: str, snapshot: str) -> Response:
     """Get all node names
@@ -13,9 +34,8 @@ def get_node_list(network: str, snapshot: str) -> Response:
     Returns:
         Response: A list of node names (str)
     """
-    node_props = bfqt.bf_node_list(network, snapshot)
-    res = [row["Node"] for _i, row in node_props.iterrows()]
-    return jsonify(res)
+    node_props = bfqt.bf_node_list_raw(network, snapshot)
+    return jsonify(node_props.column("Node"))
 
 
 @bp_batfish.route("/<network>/<snapshot>/interfaces", methods=["GET"])
@@ -27,16 +47,8 @@ def get_interface_list(network: str, snapshot: str) -> Response:
     Returns:
         Response: A list of {node, interface, list of address}
     """
-    interface_props = bfqt.bf_interface_list(network, snapshot)
-    res = [
-        {
-            "node": row["Interface"].hostname,
-            "interface": row["Interface"].interface,
-            "addresses": [x[: x.find("/")] for x in row["All_Prefixes"]],
-        }
-        for _i, row in interface_props.iterrows()
-    ]
-    return jsonify(res)
+    interface_props = bfqt.bf_interface_list_raw(network, snapshot)
+    return jsonify(_interface_addresses(interface_props))
 
 
 @bp_batfish.route("/<network>/<snapshot>/<node>/interfaces", methods=["GET"])
@@ -49,16 +61,8 @@ def get_node_interface_list(network: str, snapshot: str, node: str) -> Response:
     Returns:
         Response: A list of {node, interface, list of address}
     """
-    interface_props = bfqt.bf_node_interface_list(network, snapshot, node)
-    res = [
-        {
-            "node": row["Interface"].hostname,
-            "interface": row["Interface"].interface,
-            "addresses": [x[: x.find("/")] for x in row["All_Prefixes"]],
-        }
-        for _i, row in interface_props.iterrows()
-    ]
-    return jsonify(res)
+    interface_props = bfqt.bf_node_interface_list_raw(network, snapshot, node)
+    return jsonify(_interface_addresses(interface_props))
 
 
 @bp_batfish.route("/<network>/<snapshot>/<node>/traceroute", methods=["GET"])
@@ -82,6 +86,63 @@ def get_node_traceroute(network: str, snapshot: str, node: str) -> Response:
     return jsonify(result)
 
 
+@bp_batfish.route("/<network>/<snapshot>/<node>/traceroute/patterns", methods=["GET"])
+def get_node_traceroute_for_patterns(network: str, snapshot: str, node: str) -> Response:
+    """Traceroute from this interface for all logical snapshots of the physical snapshot
+    Args:
+        network (str): Network name
+        snapshot (str): Snapshot name (physical)
+        node (str): Node name
+    Returns:
+        Response: Traceroute summaries of logical snapshots
+    Note:
+        Query (GET) parameter:
+        * interface: source interface name
+        * destination: destination IP address
+        * concurrency: Optional: number of logical snapshots forked and queried concurrently (default: 1)
+        * traces: Optional: to include full traceroute result of each logical snapshot
+        * prune: Optional: to infer results of logical snapshots not affected by lost edges from physical snapshot
+    """
+    app_logger.info("api_node_traceroute_for_patterns: %s/%s/%s req=%s", network, snapshot, node, request.args)
+    try:
+        result = bfqt.exec_traceroute_query_for_patterns(
+            network,
+            snapshot,
+            node,
+            request.args["interface"],
+            request.args["destination"],
+            concurrency=request.args.get("concurrency", 1, type=int),
+            traces=arg_flag("traces"),
+            prune=arg_flag("prune"),
+        )
+    except ValueError as err:
+        abort(400, str(err))
+    return jsonify(result)
+
+
+@bp_batfish.route("/<network>/traceroute", methods=["POST"])
+def post_traceroute(network: str) -> Response:
+    """Traceroute for many flows (batch)
+    Args:
+        network (str): Network name
+    Returns:
+        Response: A list of traceroute responses (in order of flows)
+    Note:
+        POST parameter:
+        * flows: list of flow: {snapshot, node, interface, destination}
+          (snapshot is optional if it is specified for all flows)
+        * snapshot: Optional: snapshot name for flows without snapshot
+    """
+    req = request.json
+    app_logger.info("api_traceroute: %s flows=%s", network, len(req.get("flows", [])))
+    flows = [{"snapshot": req.get("snapshot"), **flow} for flow in req.get("flows", [])]
+    for flow in flows:
+        missing_keys = [k for k in ("snapshot", "node", "interface", "destination") if not flow.get(k)]
+        if missing_keys:
+            abort(400, f"Flow {flow} does not have {missing_keys}")
+    return jsonify(bfqt.exec_traceroute_queries(network, flows))
+
+
 @bp_batfish.route("/networks", methods=["GET"])
 def get_networks_list() -> Response:
     """Get a list of networks
@@ -115,18 +176,41 @@ def get_networks_snapshots_list(network: str) -> Response:
 
 
 @bp_batfish.route("/<network>/<snapshot>/register", methods=["POST"])
-def post_snapshot_to_batfish(network: str, snapshot: str) -> Response:
+def post_snapshot_to_batfish(network: str, snapshot: str) -> (Response, int):
     """Post (register) snapshot to batfish
     Args:
         network (str): Network name
         snapshot (str): Snapshot name
     Returns:
-        Response: RegisterStatusDict
+        Response: RegisterStatusDict (or JobStatusDict if async)
     Note:
         POST parameter:
         * overwrite: Optional: to enable overwriting of snapshot in batfish
+        * async: Optional: to register in background (returns job status, see `/jobs/<job_id>`)
     """
     req = request.json
     overwrite = req["overwrite"] if "overwrite" in req else False
+    if "async" in req and req["async"]:
+        job = job_manager.submit(
+            "register_snapshot",
+            {"network": network, "snapshot": snapshot, "overwrite": overwrite},
+            lambda progress: _register_snapshot_job(network, snapshot, overwrite, progress),
+        )
+        return jsonify(job), 202
     status = bfqt.register_snapshot(network, snapshot, overwrite)
     return jsonify(status.to_dict())
+
+
+def _register_snapshot_job(network: str, snapshot: str, overwrite: bool, progress: Callable) -> RegisterStatusDict:
+    """Register snapshot (job function)
+    Args:
+        network (str): Network name
+        snapshot (str): Snapshot name
+        overwrite (bool): to enable overwriting of snapshot in batfish
+        progress (Callable): Job progress callback
+    Returns:
+        RegisterStatusDict: Register status
+    """
+    status = bfqt.register_snapshot(network, snapshot, overwrite).to_dict()
+    progress(1, 1, {"network": network, "snapshot": snapshot})
+    return status
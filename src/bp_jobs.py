@@ -0,0 +1,44 @@
+from flask import Blueprint, jsonify, abort, Response
+from app_common import job_manager
+
+bp_jobs = Blueprint("jobs", __name__, url_prefix="/jobs")
+
+
+@bp_jobs.route("", methods=["GET"])
+def get_jobs() -> Response:
+    """Get all jobs
+    Returns:
+        Response: List[JobStatusDict]
+    """
+    return jsonify(job_manager.statuses())
+
+
+@bp_jobs.route("/<job_id>", methods=["GET"])
+def get_job(job_id: str) -> Response:
+    """Get job status
+    Args:
+        job_id (str): Job ID
+    Returns:
+        Response: JobStatusDict (progress of the job)
+    """
+    status = job_manager.status(job_id)
+    if status is None:
+        abort(404, f"job {job_id} is not found")
+    return jsonify(status)
+
+
+@bp_jobs.route("/<job_id>/result", methods=["GET"])
+def get_job_result(job_id: str) -> (Response, int):
+    """Get job result
+    Args:
+        job_id (str): Job ID
+    Returns:
+        Response: Result of the job (same as the synchronous API), or JobStatusDict if the job is not succeeded
+    """
+    job = job_manager.get(job_id)
+    if job is None:
+        abort(404, f"job {job_id} is not found")
+    if job.status != "succeeded":
+        # 409 Conflict: result is not ready (queued/running) or not available (failed)
+        return jsonify(job.to_dict()), 409
+    return jsonify(job.result)
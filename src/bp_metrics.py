@@ -0,0 +1,13 @@
+from flask import Blueprint, Response
+from app_common import bfqt
+
+bp_metrics = Blueprint("metrics", __name__, url_prefix="/metrics")
+
+
+@bp_metrics.route("", methods=["GET"])
+def get_metrics() -> Response:
+    """Get metrics (query timings and sizes)
+    Returns:
+        Response: Metrics in prometheus text format
+    """
+    return Response(bfqt.metrics.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
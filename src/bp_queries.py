@@ -1,11 +1,72 @@
+import hashlib
+import json
 import os
+import queue
 import shutil
-from flask import Blueprint, request, jsonify, Response
-from app_common import QUERIES_DIR, bfqt
+import threading
+from typing import Callable, Iterator, Optional
+from flask import Blueprint, request, jsonify, abort, Response
+from app_common import QUERIES_DIR, bfqt, job_manager, query_result_store
+from bfwrapper.query_result_writer import QueryResultWriter
+from bfwrapper.bf_wrapper_types import WholeQuerySummaryDict
 
 bp_queries = Blueprint("queries", __name__, url_prefix="/queries")
 
 
+def _query_result_writer(req: dict) -> QueryResultWriter:
+    """Make query result writer from request parameters
+    Args:
+        req (dict): Request parameters
+    Returns:
+        QueryResultWriter: Query result writer
+    """
+    output_format = req["format"] if "format" in req else "csv"
+    compression = req["compression"] if "compression" in req else None
+    try:
+        return QueryResultWriter(output_format, compression)
+    except ValueError as err:
+        abort(400, str(err))
+
+
+def _query_profile(req: dict) -> Optional[str]:
+    """Get query profile from request parameters
+    Args:
+        req (dict): Request parameters
+    Returns:
+        Optional[str]: Query profile (None for default profile)
+    """
+    profile = req["profile"] if "profile" in req else None
+    if profile is not None and profile not in bfqt.query_catalog.profiles:
+        abort(400, f"Unknown query profile: {profile} (choose from {list(bfqt.query_catalog.profiles)})")
+    return profile
+
+
+def _stream_summaries(run: Callable[[Callable[[WholeQuerySummaryDict], None]], None]) -> Iterator[str]:
+    """Run queries in background and stream summaries of snapshots
+    Args:
+        run (Callable[[Callable[[WholeQuerySummaryDict], None]], None]): Function to run queries
+          (called with a callback that receives query summary of each finished snapshot)
+    Returns:
+        Iterator[str]: NDJSON lines (a line for each snapshot, {"error": message} at last if failed)
+    """
+    summaries: "queue.Queue[Optional[dict]]" = queue.Queue()
+
+    def _run() -> None:
+        try:
+            run(summaries.put)
+        except Exception as err:  # pylint: disable=broad-except
+            summaries.put({"error": str(err)})
+        finally:
+            summaries.put(None)  # end of stream
+
+    threading.Thread(target=_run, name="bfwrapper-stream", daemon=True).start()
+    while True:
+        summary = summaries.get()
+        if summary is None:
+            return
+        yield json.dumps(summary) + "\n"
+
+
 @bp_queries.route("/<network>", methods=["DELETE"])
 def delete_queries(network: str) -> Response:
     """Delete all query results
@@ -20,19 +81,67 @@ def delete_queries(network: str) -> Response:
 
 
 @bp_queries.route("/<network>", methods=["POST"])
-def post_queries_for_all_snapshots(network: str) -> Response:
+def post_queries_for_all_snapshots(network: str) -> (Response, int):
     """Post query request for all snapshots
     Args:
         network (str): Network name
     Returns:
-        Response: List[WholeQuerySummaryDict]
+        Response: List[WholeQuerySummaryDict] (JobStatusDict if async, WholeQuerySummaryDict lines if stream)
     Note:
         POST parameter:
         * query (str): Optional: target query (limit a query)
+        * profile (str): Optional: query profile (set of queries) in query catalog (default: default profile)
+        * async (bool): Optional: to exec queries in background (returns job status, see `/jobs/<job_id>`)
+        * snapshot_concurrency (int): Optional: number of snapshots processed concurrently (default: 1)
+        * refresh (bool): Optional: to exec all queries without query result cache (default: false)
+        * format (str): Optional: output format, csv, parquet or feather (default: csv)
+        * compression (str): Optional: compression of csv, gzip, bz2, xz or zstd (default: not compressed)
+        * resume (bool): Optional: to resume the previous run, skip snapshots finished in it (default: false)
+        * stream (bool): Optional: to stream summaries in NDJSON, a line for each snapshot when it is finished
     """
     req = request.json
     query = req["query"] if "query" in req else None
-    resp = bfqt.exec_queries_for_all_snapshots(network, query)
+    concurrency = int(req["snapshot_concurrency"]) if "snapshot_concurrency" in req else 1
+    refresh = req["refresh"] if "refresh" in req else False
+    resume = req["resume"] if "resume" in req else False
+    writer = _query_result_writer(req)
+    profile = _query_profile(req)
+    if "stream" in req and req["stream"]:
+        if "async" in req and req["async"]:
+            abort(400, "stream and async are exclusive")
+        summaries = _stream_summaries(
+            lambda callback: bfqt.exec_queries_for_all_snapshots(
+                network, query, None, concurrency, refresh, writer, resume, callback, profile
+            )
+        )
+        return Response(summaries, mimetype="application/x-ndjson"), 200
+    if "async" in req and req["async"]:
+        job = job_manager.submit(
+            "exec_queries_for_all_snapshots",
+            {
+                "network": network,
+                "query": query,
+                "snapshot_concurrency": concurrency,
+                "refresh": refresh,
+                "format": writer.output_format,
+                "compression": writer.compression,
+                "resume": resume,
+                "profile": profile,
+            },
+            lambda progress: bfqt.exec_queries_for_all_snapshots(
+                network, query, progress, concurrency, refresh, writer, resume, profile=profile
+            ),
+        )
+        return jsonify(job), 202
+    resp = bfqt.exec_queries_for_all_snapshots(
+        network,
+        query,
+        snapshot_concurrency=concurrency,
+        force_refresh=refresh,
+        writer=writer,
+        resume=resume,
+        profile=profile,
+    )
     return jsonify(resp)
 
 
@@ -47,8 +156,107 @@ def post_queries(network: str, snapshot: str) -> Response:
     Note:
         POST parameter:
         * query (str): Optional: target query (limit a query)
+        * profile (str): Optional: query profile (set of queries) in query catalog (default: default profile)
+        * refresh (bool): Optional: to exec all queries without query result cache (default: false)
+        * format (str): Optional: output format, csv, parquet or feather (default: csv)
+        * compression (str): Optional: compression of csv, gzip, bz2, xz or zstd (default: not compressed)
     """
     req = request.json
     query = req["query"] if "query" in req else None
-    resp = bfqt.exec_queries(network, snapshot, query)
+    refresh = req["refresh"] if "refresh" in req else False
+    resp = bfqt.exec_queries(network, snapshot, query, refresh, _query_result_writer(req), _query_profile(req))
     return jsonify(resp)
+
+
+@bp_queries.route("/<network>/<snapshot>/diff", methods=["POST"])
+def post_query_diffs(network: str, snapshot: str) -> Response:
+    """Remake diffs between stored query results of logical snapshots and their physical snapshot
+    Args:
+        network (str): Network name
+        snapshot (str): Physical snapshot name (all logical snapshots in it) or logical snapshot name
+    Returns:
+        Response: List[QueryDiffSummaryDict]
+    Note:
+        POST parameter:
+        * query (str): Optional: target query (limit a query)
+        Diffs are stored as query results "<query>.diff" of each logical snapshot
+        (read them with `/queries/<network>/<logical snapshot>/<query>.diff`).
+    """
+    req = request.json or {}
+    query = req["query"] if "query" in req else None
+    return jsonify(bfqt.diff_query_results(network, snapshot, query))
+
+
+@bp_queries.route("/<network>/<snapshot>", methods=["GET"])
+def get_query_results(network: str, snapshot: str) -> Response:
+    """Get stored query results in a snapshot
+    Args:
+        network (str): Network name
+        snapshot (str): Snapshot name
+    Returns:
+        Response: List[StoredQueryResultDict]
+    """
+    return jsonify(query_result_store.list_results(bfqt.snapshot_output_dir(network, snapshot)))
+
+
+@bp_queries.route("/<network>/<snapshot>/<query>", methods=["GET"])
+def get_query_result(network: str, snapshot: str, query: str) -> Response:
+    """Get a stored query result
+    Args:
+        network (str): Network name
+        snapshot (str): Snapshot name
+        query (str): Query name
+    Returns:
+        Response: QueryResultPageDict (json) or rows (ndjson, number of rows matched the filters in X-Total-Count)
+    Note:
+        GET parameter:
+        * columns (str): Optional: columns to select (comma-separated, default: all columns)
+        * filter (str): Optional: rows to select, "column:value" (string match, AND if repeated)
+        * offset (int): Optional: number of rows to skip (default: 0)
+        * limit (int): Optional: max number of rows (default: all rows)
+        * format (str): Optional: json or ndjson (default: json)
+        Supports conditional request with ETag (If-None-Match).
+    """
+    columns = request.args["columns"].split(",") if "columns" in request.args else None
+    filters = [tuple(f.split(":", 1)) for f in request.args.getlist("filter")]
+    offset = request.args.get("offset", 0, type=int)
+    limit = request.args.get("limit", None, type=int)
+    output_format = request.args.get("format", "json")
+    if any(len(f) != 2 for f in filters):
+        abort(400, "filter must be column:value")
+    if output_format not in ("json", "ndjson"):
+        abort(400, f"Unknown format: {output_format} (choose from json, ndjson)")
+
+    result = query_result_store.get(bfqt.snapshot_output_dir(network, snapshot), query)
+    if result is None:
+        abort(404, f"query result {query} is not found in {network}/{snapshot}")
+    # ETag: result file fingerprint and the request (selection)
+    request_digest = hashlib.sha256(request.query_string).hexdigest()[:16]
+    etag = f"{result.fingerprint[:32]}-{request_digest}"
+    if request.if_none_match.contains(etag):
+        resp = Response(status=304)
+        resp.set_etag(etag)
+        return resp
+
+    try:
+        dataframe, total = result.select(columns, filters, max(offset, 0), limit)
+    except ValueError as err:
+        abort(400, str(err))
+    if output_format == "ndjson":
+        resp = Response(dataframe.to_json(orient="records", lines=True), mimetype="application/x-ndjson")
+        resp.headers["X-Total-Count"] = str(total)
+    else:
+        resp = jsonify(
+            {
+                "network": network,
+                "snapshot": snapshot,
+                "query": query,
+                "total": total,
+                "offset": offset,
+                "limit": limit,
+                "columns": [str(c) for c in dataframe.columns],
+                "rows": json.loads(dataframe.to_json(orient="records")),
+            }
+        )
+    resp.set_etag(etag)
+    return resp
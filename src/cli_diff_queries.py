@@ -0,0 +1,33 @@
+import argparse
+import json
+import os
+from bfwrapper.loglevel import set_loglevel
+from bfwrapper.bf_query_thrower import BatfishQueryThrower
+from bfwrapper.query_catalog import QueryCatalog
+
+if __name__ == "__main__":
+    # defaults
+    batfish_host = os.environ.get("BATFISH_HOST", "localhost")
+    configs_dir = os.environ.get("MDDO_CONFIGS_DIR", "./configs")
+    queries_dir = os.environ.get("MDDO_QUERIES_DIR", "./queries")
+    query_catalog = QueryCatalog.load(os.environ.get("BATFISH_WRAPPER_QUERY_CATALOG"))
+    # parse command line arguments
+    parser = argparse.ArgumentParser(description="Diff query results between physical and logical snapshots")
+    parser.add_argument("--batfish", "-b", type=str, default=batfish_host, help="batfish address")
+    parser.add_argument("--network", "-n", required=True, type=str, help="Specify a target network name")
+    parser.add_argument(
+        "--snapshot", "-s", type=str, help="Specify a target snapshot name (physical: all logical snapshots in it)"
+    )
+    parser.add_argument("--configs_dir", "-c", default=configs_dir, help="Configs directory for network snapshots")
+    parser.add_argument("--queries_dir", "-q", default=queries_dir, help="Queries directory to batfish output CSVs")
+    query_keys = list(query_catalog.queries)
+    parser.add_argument("--query", type=str, choices=query_keys, help="A Query to diff")
+    log_levels = ["critical", "error", "warning", "info", "debug"]
+    parser.add_argument("--log_level", type=str, default="warning", choices=log_levels, help="Log level")
+    args = parser.parse_args()
+
+    # set log level
+    set_loglevel("bfwrapper", args.log_level)
+    # diff stored query results (without batfish query)
+    bfqt = BatfishQueryThrower(args.batfish, args.configs_dir, args.queries_dir, query_catalog=query_catalog)
+    print(json.dumps(bfqt.diff_query_results(args.network, args.snapshot, args.query), indent=2))
@@ -1,13 +1,17 @@
 import argparse
 import os
 from bfwrapper.loglevel import set_loglevel
-from bfwrapper.bf_query_thrower import BatfishQueryThrower, OTHER_QUERY_DICT, BF_QUERY_DICT
+from bfwrapper.bf_query_thrower import BatfishQueryThrower
+from bfwrapper.query_catalog import QueryCatalog
+from bfwrapper.snapshot_residency_pool import SnapshotResidencyPool
+from bfwrapper.query_result_writer import QueryResultWriter, OUTPUT_FORMATS, CSV_COMPRESSIONS
 
 if __name__ == "__main__":
     # defaults
     batfish_host = os.environ.get("BATFISH_HOST", "localhost")
     configs_dir = os.environ.get("MDDO_CONFIGS_DIR", "./configs")
     queries_dir = os.environ.get("MDDO_QUERIES_DIR", "./queries")
+    query_catalog = QueryCatalog.load(os.environ.get("BATFISH_WRAPPER_QUERY_CATALOG"))
     # parse command line arguments
     parser = argparse.ArgumentParser(description="Batfish query exec")
     parser.add_argument("--batfish", "-b", type=str, default=batfish_host, help="batfish address")
@@ -15,8 +19,32 @@ if __name__ == "__main__":
     parser.add_argument("--snapshot", "-s", type=str, help="Specify a target snapshot name")
     parser.add_argument("--configs_dir", "-c", default=configs_dir, help="Configs directory for network snapshots")
     parser.add_argument("--queries_dir", "-q", default=queries_dir, help="Queries directory to batfish output CSVs")
-    query_keys = list(OTHER_QUERY_DICT.keys()) + list(BF_QUERY_DICT.keys())
-    parser.add_argument("--query", "-q", type=str, choices=query_keys, help="A Query to exec")
+    query_keys = list(query_catalog.queries)
+    parser.add_argument("--query", type=str, choices=query_keys, help="A Query to exec")
+    parser.add_argument(
+        "--profile", type=str, choices=list(query_catalog.profiles), help="Query profile (set of queries) to exec"
+    )
+    parser.add_argument(
+        "--query_concurrency", type=int, default=1, help="Number of batfish queries executed concurrently"
+    )
+    parser.add_argument(
+        "--snapshot_concurrency", type=int, default=1, help="Number of snapshots processed concurrently"
+    )
+    parser.add_argument("--force_refresh", action="store_true", help="Exec all queries without query result cache")
+    parser.add_argument(
+        "--output_format", type=str, default="csv", choices=list(OUTPUT_FORMATS), help="Output format of query results"
+    )
+    parser.add_argument(
+        "--compression", type=str, choices=list(CSV_COMPRESSIONS), help="Compression of query results (csv)"
+    )
+    parser.add_argument(
+        "--resume", action="store_true", help="Resume the previous run (skip snapshots finished in it)"
+    )
+    parser.add_argument(
+        "--output_generations",
+        action="store_true",
+        help="Make snapshot output directories symlinks to generation directories (replaced atomically)",
+    )
     log_levels = ["critical", "error", "warning", "info", "debug"]
     parser.add_argument("--log_level", type=str, default="warning", choices=log_levels, help="Log level")
     args = parser.parse_args()
@@ -25,9 +53,27 @@ if __name__ == "__main__":
     set_loglevel("pybatfish", args.log_level)
     # batfish query thrower
     # pylint: disable=too-many-function-args
-    bfqt = BatfishQueryThrower(args.batfish, args.configs_dir, args.queries_dir)
+    bfqt = BatfishQueryThrower(
+        args.batfish,
+        args.configs_dir,
+        args.queries_dir,
+        residency_pool=SnapshotResidencyPool(args.snapshot_concurrency),
+        session_pool_size=args.query_concurrency * args.snapshot_concurrency,
+        query_concurrency=args.query_concurrency,
+        query_catalog=query_catalog,
+        output_generations=args.output_generations,
+    )
     # exec queries
+    writer = QueryResultWriter(args.output_format, args.compression)
     if args.snapshot:
-        bfqt.exec_queries(args.network, args.snapshot, args.query)
+        bfqt.exec_queries(args.network, args.snapshot, args.query, args.force_refresh, writer, args.profile)
     else:
-        bfqt.exec_queries_for_all_snapshots(args.network, args.query)
+        bfqt.exec_queries_for_all_snapshots(
+            args.network,
+            args.query,
+            snapshot_concurrency=args.snapshot_concurrency,
+            force_refresh=args.force_refresh,
+            writer=writer,
+            resume=args.resume,
+            profile=args.profile,
+        )
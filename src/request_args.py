@@ -0,0 +1,17 @@
+from flask import request
+
+# values of a flag in query string to be true (case-insensitive)
+TRUE_FLAG_VALUES = ("1", "true", "yes", "on")
+
+
+def arg_flag(name: str, default: bool = False) -> bool:
+    """Get a boolean flag in query string of current request
+    Args:
+        name (str): Argument name
+        default (bool): Value if the argument is not specified
+    Returns:
+        bool: True if the value is in TRUE_FLAG_VALUES (e.g. "?prune=true"), else False (e.g. "?prune=false")
+    """
+    if name not in request.args:
+        return default
+    return request.args[name].lower() in TRUE_FLAG_VALUES
@@ -0,0 +1,45 @@
+import logging
+from types import SimpleNamespace
+import pytest
+from bf_query_thrower import BatfishQueryThrower
+from query_catalog import QueryDefinition
+from query_result_cache import QueryResultCache
+from query_result_writer import QueryResultWriter
+
+# pylint: disable=protected-access
+
+
+@pytest.fixture(name="thrower")
+def fixture_thrower(tmp_path):
+    thrower = BatfishQueryThrower.__new__(BatfishQueryThrower)
+    thrower.logger = logging.getLogger("bfwrapper")
+    thrower.query_cache = QueryResultCache(str(tmp_path / "cache"))
+    thrower._find_snapshot_pattern = lambda _network, _snapshot: SimpleNamespace(orig_snapshot_name="ss")
+    thrower.snapshot_input_fingerprint = lambda _network, snapshot: f"fingerprint-{snapshot}"
+    return thrower
+
+
+def test_derive_only_cached_config_queries(thrower, tmp_path):
+    writer = QueryResultWriter()
+    query_dict = {
+        "node_props": QueryDefinition("node_props", {"question": "nodeProperties", "dependency": "config"}),
+        "named_structures": QueryDefinition(
+            "named_structures", {"question": "namedStructures", "dependency": "config"}
+        ),
+        "interface_props": QueryDefinition("interface_props", {"question": "interfaceProperties"}),
+    }
+    # cache results of physical snapshot (except named_structures)
+    physical_dir = tmp_path / "ss"
+    physical_dir.mkdir()
+    cache_keys = thrower._query_cache_keys("fingerprint-ss", query_dict, writer)
+    for query in ["node_props", "interface_props"]:
+        (physical_dir / f"{query}.csv").write_text(f"{query}\n")
+        thrower.query_cache.store(cache_keys[query], str(physical_dir / f"{query}.csv"), 0)
+
+    logical_dir = tmp_path / "ss_linkdown_01"
+    logical_dir.mkdir()
+    summaries = thrower._derive_logical_results("net", "ss_linkdown_01", query_dict, str(logical_dir), writer)
+
+    assert list(summaries) == ["node_props"]
+    assert summaries["node_props"]["derived"]
+    assert (logical_dir / "node_props.csv").read_text() == "node_props\n"
@@ -0,0 +1,142 @@
+import logging
+import threading
+from collections import OrderedDict
+import pytest
+import bf_registrant_base
+from bf_registrant import BatfishRegistrant
+from bf_snapshot_inventory import BatfishSnapshotInventory
+from interface_address_index import InterfaceAddressIndex
+from snapshot_pattern import SnapshotPattern
+
+# pylint: disable=protected-access
+
+
+@pytest.fixture(name="registrant")
+def fixture_registrant():
+    registrant = BatfishRegistrant.__new__(BatfishRegistrant)
+    registrant._interface_address_indexes = OrderedDict()
+    registrant._interface_address_index_lock = threading.Lock()
+    return registrant
+
+
+def test_interface_address_index_bounded(registrant, monkeypatch):
+    monkeypatch.setattr(bf_registrant_base, "INTERFACE_ADDRESS_INDEX_SIZE", 2)
+    for snapshot in ["ss1", "ss2"]:
+        registrant._keep_interface_address_index("net", snapshot, "fp", f"index-{snapshot}")
+    # ss1 is recently used: ss2 is discarded
+    assert registrant._cached_interface_address_index("net", "ss1", "fp") == "index-ss1"
+    registrant._keep_interface_address_index("net", "ss3", "fp", "index-ss3")
+
+    assert registrant._cached_interface_address_index("net", "ss2", "fp") is None
+    assert registrant._cached_interface_address_index("net", "ss1", "fp") == "index-ss1"
+    assert registrant._cached_interface_address_index("net", "ss3", "fp") == "index-ss3"
+
+
+def test_interface_address_index_changed_input(registrant):
+    registrant._keep_interface_address_index("net", "ss1", "fp1", "index")
+    assert registrant._cached_interface_address_index("net", "ss1", "fp2") is None
+    assert registrant._cached_interface_address_index("net", "ss1", None) is None
+    registrant._discard_interface_address_index("net", "ss1")
+    assert registrant._cached_interface_address_index("net", "ss1", "fp1") is None
+
+
+class FakeSession:
+    def __init__(self, snapshots):
+        self.snapshots = snapshots
+        self.network = None
+        self.list_networks_count = 0
+
+    def list_networks(self):
+        self.list_networks_count += 1
+        return list(self.snapshots)
+
+    def set_network(self, network):
+        self.network = network
+
+    def list_snapshots(self):
+        return self.snapshots[self.network]
+
+
+def test_inventory_miss_refreshed_once_in_ttl(registrant):
+    registrant.bf_session = FakeSession({"net": ["ss1"]})
+    registrant.bf_inventory = BatfishSnapshotInventory(ttl=60.0)
+    registrant._register_lock = threading.RLock()
+    registrant.logger = logging.getLogger("bfwrapper")
+
+    assert registrant._is_bf_loaded_snapshot("net", "ss1")
+    refreshed = registrant.bf_session.list_networks_count
+    for _ in range(3):
+        assert not registrant._is_bf_loaded_snapshot("net", "ss2")
+        assert not registrant._is_bf_loaded_network("net2")
+    # refresh once for each miss (network and snapshot)
+    assert registrant.bf_session.list_networks_count == refreshed + 2
+
+
+def make_flow(hops, traces=1):
+    trace = {"hops": [{"node": node, "steps": steps} for node, steps in hops]}
+    return {"Flow": {}, "Traces": [trace] * traces}
+
+
+def route_step(*protocols):
+    return {"detail": {"routes": [{"protocol": p} for p in protocols]}, "action": "FORWARDED"}
+
+
+def interface_step(input_interface=None, output_interface=None):
+    return {"detail": {"inputInterface": input_interface, "outputInterface": output_interface}}
+
+
+def test_is_path_stable():
+    stable = make_flow([("r1", [route_step("ospfIA")]), ("r2", [route_step("static")])])
+    assert BatfishRegistrant._is_path_stable([stable])
+    assert not BatfishRegistrant._is_path_stable([stable, make_flow([("r1", [route_step("bgp")])])])
+    assert not BatfishRegistrant._is_path_stable([make_flow([("r1", [route_step("ospf", "ospf")])])])
+    assert not BatfishRegistrant._is_path_stable([make_flow([("r1", [route_step("static")])], traces=2)])
+
+
+def test_is_path_affected():
+    snapshot_pattern = SnapshotPattern(
+        1,
+        "/configs/net/ss",
+        "ss",
+        "ss",
+        "ss_linkdown_01",
+        [
+            {
+                "node1": {"hostname": "R1", "interfaceName": "ge-0/0/0"},
+                "node2": {"hostname": "r2", "interfaceName": "ge-0/0/0"},
+            }
+        ],
+        "r1-r2 down",
+    )
+    index = InterfaceAddressIndex({}, {("r3", "ae0"): ["ge-0/0/0"]})
+
+    def affected(node, input_interface=None, output_interface=None):
+        flow = make_flow([(node, [interface_step(input_interface, output_interface)])])
+        return BatfishRegistrant._is_path_affected([flow], snapshot_pattern, index)
+
+    assert affected("r1", output_interface="ge-0/0/0")
+    assert affected("r2", input_interface="ge-0/0/0.100")  # sub-interface
+    assert not affected("r1", output_interface="ge-0/0/1")
+    assert not affected("r3", output_interface="ae0")  # members of r3 are not in lost edges
+    no_interface_flow = make_flow([("r1", [route_step("static")])])
+    assert not BatfishRegistrant._is_path_affected([no_interface_flow], snapshot_pattern, index)
+
+
+def test_is_path_affected_aggregated_interface():
+    snapshot_pattern = SnapshotPattern(
+        1,
+        "/configs/net/ss",
+        "ss",
+        "ss",
+        "ss_linkdown_01",
+        [
+            {
+                "node1": {"hostname": "r1", "interfaceName": "ge-0/0/1"},
+                "node2": {"hostname": "r2", "interfaceName": "ge-0/0/1"},
+            }
+        ],
+        "r1-r2 member down",
+    )
+    index = InterfaceAddressIndex({}, {("r1", "ae0"): ["ge-0/0/0", "ge-0/0/1"]})
+    flow = make_flow([("r1", [interface_step(output_interface="ae0.0")])])
+    assert BatfishRegistrant._is_path_affected([flow], snapshot_pattern, index)
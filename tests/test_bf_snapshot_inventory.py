@@ -0,0 +1,51 @@
+from bf_snapshot_inventory import BatfishSnapshotInventory
+
+
+def test_update_and_find():
+    inventory = BatfishSnapshotInventory()
+    assert inventory.is_expired()
+    inventory.update({"net": ["ss1", "ss2"]})
+    assert not inventory.is_expired()
+    assert inventory.networks() == ["net"]
+    assert inventory.has_snapshot("net", "ss1")
+    assert not inventory.has_snapshot("net", "ss3")
+    inventory.invalidate()
+    assert inventory.is_expired()
+
+
+def test_fingerprint_dropped_with_snapshot():
+    inventory = BatfishSnapshotInventory()
+    inventory.update({"net": ["ss1"]})
+    inventory.set_fingerprint("net", "ss1", "abc")
+    assert inventory.fingerprint("net", "ss1") == "abc"
+    inventory.update_network("net", [])
+    assert inventory.fingerprint("net", "ss1") is None
+
+
+def test_missing_until_ttl():
+    inventory = BatfishSnapshotInventory(ttl=60.0)
+    inventory.set_missing("net")
+    inventory.set_missing("net", "ss1")
+    assert inventory.is_missing("net")
+    assert inventory.is_missing("net", "ss1")
+    assert not inventory.is_missing("net", "ss2")
+
+    expired = BatfishSnapshotInventory(ttl=0.0)
+    expired.set_missing("net")
+    assert not expired.is_missing("net")
+
+
+def test_missing_cleared_by_update():
+    inventory = BatfishSnapshotInventory()
+    inventory.set_missing("net", "ss1")
+    inventory.add_snapshot("net", "ss1")
+    assert not inventory.is_missing("net", "ss1")
+
+    inventory.remove_snapshot("net", "ss1")
+    assert inventory.is_missing("net", "ss1")
+    inventory.update_network("net", ["ss1"])
+    assert not inventory.is_missing("net", "ss1")
+
+    inventory.set_missing("net")
+    inventory.update({})
+    assert not inventory.is_missing("net")
@@ -0,0 +1,38 @@
+from metrics_registry import MetricsRegistry
+
+
+def test_render_counter():
+    metrics = MetricsRegistry()
+    metrics.counter("results_total", "Number of results")
+    metrics.inc("results_total", {"query": "routes", "source": "cache"})
+    metrics.inc("results_total", {"source": "cache", "query": "routes"}, 2)
+    metrics.inc("results_total", {"query": 'a"b\\c'})
+    assert metrics.render().splitlines() == [
+        "# HELP results_total Number of results",
+        "# TYPE results_total counter",
+        'results_total{query="a\\"b\\\\c"} 1.0',
+        'results_total{query="routes",source="cache"} 3.0',
+    ]
+
+
+def test_render_histogram():
+    metrics = MetricsRegistry()
+    metrics.histogram("seconds", "Time", buckets=[1.0, 0.1])
+    for value in [0.05, 0.1, 0.5, 3.0]:
+        metrics.observe("seconds", {"phase": "answer"}, value)
+    assert metrics.render().splitlines() == [
+        "# HELP seconds Time",
+        "# TYPE seconds histogram",
+        'seconds_bucket{phase="answer",le="0.1"} 2',
+        'seconds_bucket{phase="answer",le="1.0"} 3',
+        'seconds_bucket{phase="answer",le="+Inf"} 4',
+        'seconds_sum{phase="answer"} 3.65',
+        'seconds_count{phase="answer"} 4',
+    ]
+
+
+def test_render_defined_metrics_without_samples():
+    metrics = MetricsRegistry()
+    metrics.counter("a_total", "A")
+    metrics.counter("a_total", "redefined")
+    assert metrics.render() == "# HELP a_total A\n# TYPE a_total counter\n"
@@ -0,0 +1,91 @@
+import pytest
+from query_catalog import QueryCatalog, QueryDefinition
+from query_result_writer import QueryResultWriter
+from bf_query_thrower import BatfishQueryThrower
+
+
+@pytest.fixture(name="catalog")
+def fixture_catalog():
+    return QueryCatalog(
+        {
+            "default_profile": "full",
+            "queries": {
+                "ip_owners": {"question": "ipOwners"},
+                "interface_props": {"question": "interfaceProperties", "dependency": "state"},
+                "routes": {"question": "routes", "priority": 10},
+                "named_structures": {"question": "namedStructures", "priority": 5},
+                "edges_layer1": {"kind": "other", "question": "edges_layer1"},
+            },
+            "profiles": {
+                "full": {
+                    "queries": {
+                        "edges_layer1": {},
+                        "routes": {},
+                        "named_structures": {},
+                        "interface_props": {},
+                        "ip_owners": {},
+                    }
+                },
+                "fast": {"queries": {"interface_props": {"parameters": {"properties": "Active"}}, "ip_owners": {}}},
+            },
+        }
+    )
+
+
+def test_select_keeps_definition_order(catalog):
+    assert list(catalog.select()) == ["ip_owners", "interface_props", "routes", "named_structures", "edges_layer1"]
+
+
+def test_select_profile(catalog):
+    queries = catalog.select("fast")
+    assert list(queries) == ["ip_owners", "interface_props"]
+    assert queries["interface_props"].parameters == {"properties": "Active"}
+    assert catalog.queries["interface_props"].parameters == {}
+
+
+def test_select_query_out_of_profile(catalog):
+    assert list(catalog.select("fast", "routes")) == ["routes"]
+    assert not catalog.select("fast", "unknown")
+
+
+def test_select_unknown_profile(catalog):
+    with pytest.raises(ValueError):
+        catalog.select("unknown")
+
+
+def test_execution_order(catalog):
+    assert QueryCatalog.execution_order(catalog.select()) == [
+        "routes",
+        "named_structures",
+        "ip_owners",
+        "interface_props",
+        "edges_layer1",
+    ]
+
+
+def test_invalid_definition():
+    with pytest.raises(ValueError):
+        QueryDefinition("q", {"question": "q", "dependency": "unknown"})
+    with pytest.raises(ValueError):
+        QueryCatalog({"queries": {}, "profiles": {"p": {"queries": {"unknown": {}}}}})
+
+
+@pytest.mark.parametrize("concurrency", [1, 3])
+def test_summaries_in_definition_order(catalog, concurrency):
+    executed = []
+
+    def exec_single_query(_network, _snapshot, query, _query_def, _output_dir, _writer):
+        executed.append(query)
+        return {"query": f"batfish/{query}"}
+
+    thrower = BatfishQueryThrower.__new__(BatfishQueryThrower)
+    thrower.query_concurrency = concurrency
+    thrower._exec_bf_single_query = exec_single_query  # pylint: disable=protected-access
+    query_dict = {q: d for q, d in catalog.select().items() if d.kind == "batfish"}
+
+    summaries = thrower._exec_bf_query(  # pylint: disable=protected-access
+        "net", "ss", query_dict, "/nonexistent", QueryResultWriter()
+    )
+    assert [s["query"] for s in summaries] == [f"batfish/{q}" for q in query_dict]
+    if concurrency == 1:
+        assert executed == ["routes", "named_structures", "ip_owners", "interface_props"]
@@ -0,0 +1,82 @@
+import os
+from os import path
+from query_result_cache import QueryResultCache
+
+
+def write_result(file_path, content):
+    os.makedirs(path.dirname(file_path), exist_ok=True)
+    with open(file_path, "w", encoding="utf-8") as file:
+        file.write(content)
+
+
+def test_store_and_restore(tmp_path):
+    cache = QueryResultCache(str(tmp_path / "cache"))
+    key = QueryResultCache.make_key(query="routes", fingerprint="abc")
+    result_path = str(tmp_path / "ss1" / "routes.csv")
+    write_result(result_path, "a,b\n1,2\n")
+
+    assert cache.restore(key, str(tmp_path / "ss2" / "routes.csv")) is False
+    assert cache.store(key, result_path, rows=1) is False
+    assert cache.rows(key) == 1
+
+    restored_path = str(tmp_path / "ss2" / "routes.csv")
+    os.makedirs(path.dirname(restored_path))
+    assert cache.restore(key, restored_path) is True
+    assert path.samefile(result_path, restored_path)
+
+
+def test_store_deduplicates_same_result(tmp_path):
+    cache = QueryResultCache(str(tmp_path / "cache"))
+    write_result(str(tmp_path / "ss1" / "routes.csv"), "same")
+    write_result(str(tmp_path / "ss2" / "routes.csv"), "same")
+
+    assert cache.store("k1", str(tmp_path / "ss1" / "routes.csv")) is False
+    assert cache.store("k2", str(tmp_path / "ss2" / "routes.csv")) is True
+    assert path.samefile(tmp_path / "ss1" / "routes.csv", tmp_path / "ss2" / "routes.csv")
+
+
+def test_processes_keep_each_other_entries(tmp_path):
+    cache_dir = str(tmp_path / "cache")
+    cache1 = QueryResultCache(cache_dir)
+    cache2 = QueryResultCache(cache_dir)
+    write_result(str(tmp_path / "ss1" / "routes.csv"), "result1")
+    write_result(str(tmp_path / "ss2" / "routes.csv"), "result2")
+
+    cache1.store("k1", str(tmp_path / "ss1" / "routes.csv"))
+    cache2.store("k2", str(tmp_path / "ss2" / "routes.csv"))
+
+    assert cache1.lookup("k2") is not None
+    cache3 = QueryResultCache(cache_dir)
+    assert cache3.lookup("k1") is not None
+    assert cache3.lookup("k2") is not None
+
+
+def test_evict_least_recently_used(tmp_path):
+    cache = QueryResultCache(str(tmp_path / "cache"), max_bytes=10)
+    for index in range(3):
+        write_result(str(tmp_path / f"ss{index}" / "routes.csv"), f"result{index}")
+        cache.store(f"k{index}", str(tmp_path / f"ss{index}" / "routes.csv"))
+    assert cache.lookup("k0") is None
+    assert cache.lookup("k1") is None
+    assert cache.lookup("k2") is not None
+
+
+def test_evict_keeps_blob_shared_by_other_process(tmp_path):
+    cache_dir = str(tmp_path / "cache")
+    cache1 = QueryResultCache(cache_dir, max_bytes=10)
+    cache2 = QueryResultCache(cache_dir, max_bytes=10)
+    write_result(str(tmp_path / "ss1" / "routes.csv"), "shared")
+    write_result(str(tmp_path / "ss2" / "routes.csv"), "aaaa")
+    write_result(str(tmp_path / "ss3" / "routes.csv"), "shared")
+    write_result(str(tmp_path / "ss4" / "routes.csv"), "bb")
+
+    cache1.store("k1", str(tmp_path / "ss1" / "routes.csv"))
+    cache1.store("k2", str(tmp_path / "ss2" / "routes.csv"))
+    cache2.store("k3", str(tmp_path / "ss3" / "routes.csv"))
+    # cache1 evicts k1 and k2 (oldest): result file of k1 is still used by k3 (stored by cache2)
+    cache1.store("k4", str(tmp_path / "ss4" / "routes.csv"))
+
+    assert cache1.lookup("k1") is None
+    assert cache1.lookup("k2") is None
+    assert cache2.lookup("k3") is not None
+    assert cache1.lookup("k3") is not None
@@ -0,0 +1,41 @@
+import pandas as pd
+from query_result_diff import count_diff, diff_dataframes, diff_keys, diff_query_name
+
+
+def test_diff_query_name():
+    assert diff_query_name("routes") == "routes.diff"
+
+
+def test_diff_keys():
+    base = pd.DataFrame({"Node": ["r1", "r2"], "VRF": ["default", "default"], "Extra": ["x", "y"]})
+    target = pd.DataFrame({"Node": ["r1", "r1"], "VRF": ["default", "mgmt"]})
+    assert diff_keys("node_props", base, pd.DataFrame({"Node": ["r1"], "VRF": ["default"]})) == ["Node"]
+    # not unique in target: all common columns
+    assert diff_keys("node_props", base, target) == ["Node", "VRF"]
+    # unknown query: all common columns
+    assert diff_keys("unknown", base, base) == ["Node", "VRF", "Extra"]
+
+
+def test_diff_dataframes():
+    base = pd.DataFrame(
+        {"Interface": ["r1[eth0]", "r1[eth1]", "r2[eth0]"], "Active": [True, True, True], "MTU": [1500, 1500, 1500]}
+    )
+    target = pd.DataFrame(
+        {"Interface": ["r1[eth0]", "r2[eth0]", "r3[eth0]"], "Active": [False, True, True], "MTU": [9000, 1500, 1500]}
+    )
+    diff = diff_dataframes(base, target, ["Interface"])
+    assert diff.to_dict(orient="records") == [
+        {"Interface": "r1[eth0]", "Diff": "changed", "Column": "Active", "Before": "True", "After": "False"},
+        {"Interface": "r1[eth0]", "Diff": "changed", "Column": "MTU", "Before": "1500", "After": "9000"},
+        {"Interface": "r1[eth1]", "Diff": "removed", "Column": "", "Before": "", "After": ""},
+        {"Interface": "r3[eth0]", "Diff": "added", "Column": "", "Before": "", "After": ""},
+    ]
+    assert count_diff(diff, ["Interface"]) == {"added": 1, "removed": 1, "changed": 1}
+
+
+def test_no_diff():
+    base = pd.DataFrame({"Node": ["r1"], "Value": ["1"]})
+    diff = diff_dataframes(base, base.copy(), ["Node"])
+    assert diff.empty
+    assert list(diff.columns) == ["Node", "Diff", "Column", "Before", "After"]
+    assert count_diff(diff, ["Node"]) == {"added": 0, "removed": 0, "changed": 0}
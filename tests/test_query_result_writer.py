@@ -0,0 +1,94 @@
+import pandas as pd
+import pytest
+from pybatfish.datamodel.primitives import Interface
+from query_result_writer import QueryResultWriter, flatten_dataframe, parse_result_file_name
+
+
+@pytest.fixture(name="answer")
+def fixture_answer():
+    return pd.DataFrame(
+        {
+            "Interface": [Interface("r1", "eth0"), Interface("r2", "eth1")],
+            "All_Prefixes": [["10.0.0.1/24"], []],
+            "Active": [True, False],
+            "MTU": [1500, 9000],
+        }
+    )
+
+
+def test_flatten_dataframe(answer):
+    flat = flatten_dataframe(answer)
+    assert list(flat.columns) == [
+        "Interface",
+        "Interface.hostname",
+        "Interface.interface",
+        "All_Prefixes",
+        "Active",
+        "MTU",
+    ]
+    assert list(flat["Interface"]) == ["r1[eth0]", "r2[eth1]"]
+    assert list(flat["Interface.hostname"]) == ["r1", "r2"]
+    assert list(flat["All_Prefixes"]) == [["10.0.0.1/24"], []]
+
+
+@pytest.mark.parametrize("output_format", ["parquet", "feather"])
+def test_columnar_round_trip(answer, tmp_path, output_format):
+    writer = QueryResultWriter(output_format)
+    file_path = writer.file_path(str(tmp_path), "interface_props")
+    assert file_path.endswith(f"interface_props.{output_format}")
+
+    assert writer.write(answer, file_path) == 2
+    result = writer.read(file_path)
+    assert list(result["Interface"]) == ["r1[eth0]", "r2[eth1]"]
+    assert [list(v) for v in result["All_Prefixes"]] == [["10.0.0.1/24"], []]
+    assert list(result["Active"]) == [True, False]
+    assert list(result["MTU"]) == [1500, 9000]
+
+
+def test_csv_round_trip(answer, tmp_path):
+    writer = QueryResultWriter()
+    file_path = writer.file_path(str(tmp_path), "interface_props")
+    assert writer.write(answer, file_path) == 2
+    result = writer.read(file_path)
+    assert list(result["Interface"]) == ["r1[eth0]", "r2[eth1]"]
+    assert list(result["Active"]) == ["True", "False"]  # all values are str for csv
+
+
+def test_parse_result_file_name():
+    query, writer = parse_result_file_name("routes.parquet")
+    assert query == "routes"
+    assert writer.output_format == "parquet"
+    assert parse_result_file_name(".generation.json") is None
+
+
+def test_invalid_options():
+    with pytest.raises(ValueError):
+        QueryResultWriter("xlsx")
+
+
+@pytest.mark.parametrize("compression", ["gzip", "bz2", "xz", "zstd"])
+def test_compressed_csv_round_trip(answer, tmp_path, compression):
+    writer = QueryResultWriter("csv", compression)
+    file_path = writer.file_path(str(tmp_path), "interface_props")
+    writer.write(answer, file_path)
+    assert list(writer.read(file_path)["Interface"]) == ["r1[eth0]", "r2[eth1]"]
+
+    query, parsed_writer = parse_result_file_name(file_path.split("/")[-1])
+    assert query == "interface_props"
+    assert parsed_writer.cache_key_elements() == writer.cache_key_elements()
+
+
+def test_gzip_csv_reproducible(answer, tmp_path):
+    writer = QueryResultWriter("csv", "gzip")
+    # same result in snapshots (gzip header has file name, without time)
+    for snapshot in ["ss1", "ss2"]:
+        (tmp_path / snapshot).mkdir()
+        writer.write(answer, writer.file_path(str(tmp_path / snapshot), "routes"))
+    assert (tmp_path / "ss1" / "routes.csv.gz").read_bytes() == (tmp_path / "ss2" / "routes.csv.gz").read_bytes()
+
+
+def test_compression_only_for_csv():
+    with pytest.raises(ValueError):
+        QueryResultWriter("parquet", "gzip")
+    with pytest.raises(ValueError):
+        QueryResultWriter("csv", "lz4")
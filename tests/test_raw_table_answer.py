@@ -0,0 +1,83 @@
+import pandas as pd
+import pytest
+from pybatfish.datamodel.primitives import Interface
+import raw_table_answer
+from raw_table_answer import RawTableAnswer
+
+ANSWER = {
+    "answerElements": [
+        {
+            "metadata": {
+                "columnMetadata": [
+                    {"name": "Interface", "schema": "Interface"},
+                    {"name": "All_Prefixes", "schema": "List<String>"},
+                ]
+            },
+            "rows": [
+                {"Interface": {"hostname": "r1", "interface": "eth0"}, "All_Prefixes": ["10.0.0.1/24"]},
+                {"Interface": {"hostname": "r2", "interface": "eth1"}, "All_Prefixes": []},
+            ],
+        }
+    ]
+}
+
+
+class FakeTableAnswer:
+    def frame(self):
+        return pd.DataFrame(
+            {
+                "Interface": [Interface("r1", "eth0"), Interface("r2", "eth1")],
+                "All_Prefixes": [["10.0.0.1/24"], []],
+            }
+        )
+
+
+class FakeQuestion:
+    def get_name(self):
+        return "q"
+
+    def json(self):
+        return "{}"
+
+    def answer(self):
+        return FakeTableAnswer()
+
+
+class FakeSession:
+    def get_snapshot(self):
+        return "ss"
+
+
+def test_decode_raw_answer():
+    answer = RawTableAnswer(ANSWER)
+    assert len(answer) == 2
+    assert answer.columns == ["Interface", "All_Prefixes"]
+    assert answer.column("Interface")[0] == {"hostname": "r1", "interface": "eth0"}
+    assert answer.column("Interface", rich=True) == [Interface("r1", "eth0"), Interface("r2", "eth1")]
+    assert list(answer.frame(["Interface"])["Interface"]) == [Interface("r1", "eth0"), Interface("r2", "eth1")]
+    with pytest.raises(KeyError):
+        answer.column("Unknown")
+
+
+def test_not_table_answer():
+    with pytest.raises(ValueError):
+        RawTableAnswer({"answerElements": [{}]})
+
+
+def test_from_frame_same_as_raw():
+    raw_answer = RawTableAnswer(ANSWER)
+    frame_answer = RawTableAnswer.from_frame(FakeTableAnswer().frame())
+    for column in raw_answer.columns:
+        assert frame_answer.column(column) == raw_answer.column(column)
+        assert frame_answer.column(column, rich=True) == raw_answer.column(column, rich=True)
+
+
+def test_ask_falls_back_to_question_answer(monkeypatch):
+    def changed_upload_question(*_args):
+        raise TypeError("signature changed")
+
+    monkeypatch.setattr(raw_table_answer.restv2helper, "upload_question", changed_upload_question)
+    monkeypatch.setattr(RawTableAnswer, "raw_answer_available", True)
+    answer = RawTableAnswer.ask(FakeSession(), FakeQuestion())
+    assert not RawTableAnswer.raw_answer_available
+    assert answer.column("Interface") == RawTableAnswer(ANSWER).column("Interface")
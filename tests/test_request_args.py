@@ -0,0 +1,27 @@
+import pytest
+from flask import Flask
+from request_args import arg_flag
+
+
+@pytest.mark.parametrize(
+    "query_string, expected",
+    [
+        ("", False),
+        ("prune=true", True),
+        ("prune=True", True),
+        ("prune=1", True),
+        ("prune=yes", True),
+        ("prune=false", False),
+        ("prune=0", False),
+        ("prune=", False),
+        ("traces=true", False),
+    ],
+)
+def test_arg_flag(query_string, expected):
+    with Flask(__name__).test_request_context(f"/?{query_string}"):
+        assert arg_flag("prune") is expected
+
+
+def test_arg_flag_default():
+    with Flask(__name__).test_request_context("/"):
+        assert arg_flag("prune", default=True) is True
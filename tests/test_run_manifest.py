@@ -0,0 +1,44 @@
+from run_manifest import RunManifest
+
+OPTIONS = {"query": None, "profile": None, "force_refresh": False}
+
+
+def make_summary(queries_dir):
+    return {"network": "net", "snapshot": "ss1", "queries_dir": str(queries_dir), "queries": []}
+
+
+def test_resume_finished_snapshot(tmp_path):
+    manifest_path = str(tmp_path / ".run_manifest.json")
+    manifest = RunManifest(manifest_path, "net", OPTIONS)
+    manifest.record_finished("ss1", "fp1", make_summary(tmp_path))
+    manifest.record_failed("ss2", "fp2", "batfish died")
+
+    resumed = RunManifest(manifest_path, "net", OPTIONS, resume=True)
+    assert resumed.finished_summary("ss1", "fp1")["snapshot"] == "ss1"
+    assert resumed.finished_summary("ss1", "changed") is None
+    assert resumed.finished_summary("ss2", "fp2") is None
+
+
+def test_new_run_if_options_changed(tmp_path):
+    manifest_path = str(tmp_path / ".run_manifest.json")
+    RunManifest(manifest_path, "net", OPTIONS).record_finished("ss1", "fp1", make_summary(tmp_path))
+    assert RunManifest(manifest_path, "net", OPTIONS).finished_summary("ss1", "fp1") is None
+    changed = {**OPTIONS, "force_refresh": True}
+    assert RunManifest(manifest_path, "net", changed, resume=True).finished_summary("ss1", "fp1") is None
+
+
+def test_finished_queries_of_failed_snapshot(tmp_path):
+    manifest_path = str(tmp_path / ".run_manifest.json")
+    manifest = RunManifest(manifest_path, "net", OPTIONS)
+    manifest.record_query_finished("ss1", "fp1", "routes")
+    manifest.record_query_finished("ss1", "fp1", "ip_owners")
+    manifest.record_failed("ss1", "fp1", "batfish died")
+
+    resumed = RunManifest(manifest_path, "net", OPTIONS, resume=True)
+    assert resumed.finished_queries("ss1", "fp1") == ["routes", "ip_owners"]
+    assert resumed.finished_queries("ss1", "changed") == []
+    assert resumed.finished_queries("ss2", "fp1") == []
+    # queries finished with another input are dropped
+    resumed.record_query_finished("ss1", "fp2", "routes")
+    resumed.record_query_finished("ss1", "fp2", "routes")
+    assert resumed.finished_queries("ss1", "fp2") == ["routes"]
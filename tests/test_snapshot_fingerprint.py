@@ -0,0 +1,47 @@
+import pytest
+import snapshot_fingerprint
+from snapshot_fingerprint import logical_snapshot_fingerprint
+from snapshot_fingerprint import snapshot_fingerprint as fingerprint
+
+
+@pytest.fixture(name="snapshot_dir")
+def fixture_snapshot_dir(tmp_path):
+    (tmp_path / "configs").mkdir()
+    (tmp_path / "configs" / "r1.cfg").write_text("hostname r1\n")
+    (tmp_path / "batfish").mkdir()
+    (tmp_path / "batfish" / "layer1_topology.json").write_text('{"edges": []}')
+    return tmp_path
+
+
+def test_fingerprint_stable(snapshot_dir):
+    assert fingerprint(str(snapshot_dir)) == fingerprint(str(snapshot_dir))
+
+
+def test_fingerprint_changed_by_input(snapshot_dir):
+    before = fingerprint(str(snapshot_dir))
+    (snapshot_dir / "configs" / "r1.cfg").write_text("hostname r2\n")
+    changed_config = fingerprint(str(snapshot_dir))
+    (snapshot_dir / "configs" / "r2.cfg").write_text("hostname r2\n")
+    added_config = fingerprint(str(snapshot_dir))
+    assert len({before, changed_config, added_config}) == 3
+
+
+def test_fingerprint_ignores_other_files(snapshot_dir):
+    before = fingerprint(str(snapshot_dir))
+    (snapshot_dir / "snapshot_pattern.json").write_text("[]")
+    assert fingerprint(str(snapshot_dir)) == before
+
+
+def test_file_digest_memo_bounded(snapshot_dir, monkeypatch):
+    monkeypatch.setattr(snapshot_fingerprint, "FILE_DIGEST_MEMO_SIZE", 2)
+    for index in range(5):
+        (snapshot_dir / "configs" / f"r{index}.cfg").write_text(f"hostname r{index}\n")
+    fingerprint(str(snapshot_dir))
+    assert len(snapshot_fingerprint._file_digests) == 2  # pylint: disable=protected-access
+
+
+def test_logical_snapshot_fingerprint():
+    fingerprint1 = logical_snapshot_fingerprint("abc", ["r1[eth0]", "r2[eth1]"])
+    assert fingerprint1 == logical_snapshot_fingerprint("abc", ["r2[eth1]", "r1[eth0]"])
+    assert fingerprint1 != logical_snapshot_fingerprint("abc", ["r1[eth0]"])
+    assert fingerprint1 != logical_snapshot_fingerprint("abd", ["r1[eth0]", "r2[eth1]"])
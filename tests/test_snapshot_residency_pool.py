@@ -0,0 +1,40 @@
+import pytest
+from snapshot_residency_pool import SnapshotResidencyPool
+
+
+def test_no_victims_within_size():
+    pool = SnapshotResidencyPool(max_size=2)
+    assert not pool.victims("net", ["ss_01", "ss_02"])
+    assert pool.victims("net", ["ss_01", "ss_02"], reserved=1) == ["ss_01"]
+
+
+def test_lru():
+    pool = SnapshotResidencyPool(max_size=2, policy="lru")
+    for snapshot in ["ss_01", "ss_02", "ss_01", "ss_03"]:
+        pool.touch("net", snapshot)
+    assert pool.victims("net", ["ss_01", "ss_02", "ss_03"]) == ["ss_02"]
+
+
+def test_lfu():
+    pool = SnapshotResidencyPool(max_size=2, policy="lfu")
+    for snapshot in ["ss_01", "ss_01", "ss_02", "ss_02", "ss_03"]:
+        pool.touch("net", snapshot)
+    assert pool.victims("net", ["ss_01", "ss_02", "ss_03"]) == ["ss_03"]
+    # same count: least recently used one
+    pool.touch("net", "ss_03")
+    assert pool.victims("net", ["ss_01", "ss_02", "ss_03"]) == ["ss_01"]
+
+
+def test_untracked_and_discarded_evicted_first():
+    pool = SnapshotResidencyPool(max_size=1)
+    pool.touch("net", "ss_01")
+    pool.touch("net", "ss_02")
+    pool.discard("net", "ss_02")
+    assert pool.victims("net", ["ss_01", "ss_02", "ss_03"]) == ["ss_02", "ss_03"]
+    # networks are independent
+    assert pool.victims("net2", ["ss_01"]) == []
+
+
+def test_invalid_policy():
+    with pytest.raises(ValueError):
+        SnapshotResidencyPool(policy="fifo")
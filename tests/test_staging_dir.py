@@ -0,0 +1,106 @@
+import os
+import time
+from os import path
+import pytest
+import staging_dir
+from staging_dir import (
+    commit_staging_dir,
+    discard_staging_dir,
+    prepare_staging_dir,
+    read_generation,
+    remove_output_dir,
+)
+
+
+def make_results(output_dir, content, generation=None, generations=False):
+    work_dir = prepare_staging_dir(output_dir, keep_previous=False, generation=generation)
+    with open(path.join(work_dir, "routes.csv"), "w", encoding="utf-8") as file:
+        file.write(content)
+    commit_staging_dir(work_dir, output_dir, generations)
+
+
+def read_result(output_dir, name="routes.csv"):
+    with open(path.join(output_dir, name), "r", encoding="utf-8") as file:
+        return file.read()
+
+
+def hidden_entries(output_dir):
+    parent_dir = path.dirname(output_dir)
+    return sorted(n for n in os.listdir(parent_dir) if n.startswith(".") and not n.endswith(".lock"))
+
+
+@pytest.fixture(name="output_dir")
+def fixture_output_dir(tmp_path):
+    return str(tmp_path / "net" / "ss")
+
+
+def test_commit_swaps_real_directory(output_dir):
+    make_results(output_dir, "gen1")
+    make_results(output_dir, "gen2")
+    assert not path.islink(output_dir)
+    assert read_result(output_dir) == "gen2"
+    assert not hidden_entries(output_dir)
+
+
+def test_commit_with_generations(output_dir):
+    make_results(output_dir, "gen1", generations=True)
+    previous_dir = path.realpath(output_dir)
+    make_results(output_dir, "gen2", generations=True)
+    assert path.islink(output_dir)
+    assert read_result(output_dir) == "gen2"
+    # replaced generation is kept in grace period
+    assert read_result(previous_dir) == "gen1"
+
+
+def test_replaced_generation_removed_after_grace(output_dir):
+    make_results(output_dir, "gen1", generations=True)
+    gen1_dir = path.realpath(output_dir)
+    make_results(output_dir, "gen2", generations=True)
+    gen2_dir = path.realpath(output_dir)
+    # gen1 was replaced before grace period
+    replaced_at = time.time() - staging_dir.GENERATION_GRACE_SECONDS - 1
+    os.utime(gen1_dir, (replaced_at, replaced_at))
+    make_results(output_dir, "gen3", generations=True)
+    assert not path.exists(gen1_dir)
+    assert path.exists(gen2_dir)
+
+
+def test_switch_layouts(output_dir):
+    make_results(output_dir, "gen1")
+    make_results(output_dir, "gen2", generations=True)
+    assert path.islink(output_dir)
+    assert read_result(output_dir) == "gen2"
+    make_results(output_dir, "gen3")
+    assert not path.islink(output_dir)
+    assert read_result(output_dir) == "gen3"
+
+
+def test_keep_previous_only_for_same_generation(output_dir):
+    make_results(output_dir, "gen1", generation={"fingerprint": "a"})
+    work_dir = prepare_staging_dir(output_dir, generation={"fingerprint": "a"})
+    assert read_result(work_dir) == "gen1"
+    assert path.samefile(path.join(work_dir, "routes.csv"), path.join(output_dir, "routes.csv"))
+    discard_staging_dir(work_dir)
+
+    work_dir = prepare_staging_dir(output_dir, generation={"fingerprint": "b"})
+    assert not path.exists(path.join(work_dir, "routes.csv"))
+    assert read_generation(work_dir) == {"fingerprint": "b"}
+    assert read_generation(output_dir) == {"fingerprint": "a"}
+    discard_staging_dir(work_dir)
+    assert not path.exists(work_dir)
+
+
+def test_failed_commit_keeps_previous(output_dir):
+    make_results(output_dir, "gen1")
+    work_dir = prepare_staging_dir(output_dir)
+    discard_staging_dir(work_dir)
+    with pytest.raises(OSError):
+        commit_staging_dir(work_dir, output_dir)
+    assert read_result(output_dir) == "gen1"
+
+
+def test_remove_output_dir(output_dir):
+    make_results(output_dir, "gen1", generations=True)
+    make_results(output_dir, "gen2", generations=True)
+    remove_output_dir(output_dir)
+    assert not os.listdir(path.dirname(output_dir))
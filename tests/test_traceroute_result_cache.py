@@ -0,0 +1,50 @@
+from metrics_registry import MetricsRegistry
+from traceroute_result_cache import TracerouteResultCache
+
+
+def make_result(snapshot):
+    return {"network": "net", "snapshot": snapshot, "result": [{"Flow": {}, "Traces": []}], "snapshot_pattern": None}
+
+
+def test_make_key():
+    key = TracerouteResultCache.make_key("net", "ss", "fp", "R1", "eth0", "10.0.0.1")
+    assert key == TracerouteResultCache.make_key("net", "ss", "fp", "r1", "eth0", "10.0.0.1")
+    assert key != TracerouteResultCache.make_key("net", "ss", "changed", "r1", "eth0", "10.0.0.1")
+
+
+def test_memory_lru():
+    metrics = MetricsRegistry()
+    cache = TracerouteResultCache(max_entries=2, metrics=metrics)
+    for key in ["k1", "k2"]:
+        cache.put(key, "net", "ss", make_result("ss"))
+    assert cache.get("k1", "net", "ss") is not None  # k2 is least recently used
+    cache.put("k3", "net", "ss", make_result("ss"))
+    assert cache.get("k2", "net", "ss") is None
+    assert cache.get("k3", "net", "ss") is not None
+    assert (cache.hits, cache.misses) == (2, 1)
+    assert 'bfwrapper_traceroute_cache_requests_total{result="hit"} 2.0' in metrics.render()
+
+
+def test_cache_dir_across_restart(tmp_path):
+    cache = TracerouteResultCache(cache_dir=str(tmp_path))
+    cache.put("k1", "net", "ss/1", make_result("ss/1"))
+    assert (tmp_path / "net" / "ss%2F1" / "k1.json").exists()
+
+    restarted = TracerouteResultCache(cache_dir=str(tmp_path))
+    assert restarted.get("k1", "net", "ss/1") == make_result("ss/1")
+
+
+def test_discard_snapshot(tmp_path):
+    cache = TracerouteResultCache(cache_dir=str(tmp_path))
+    cache.put("k1", "net", "ss1", make_result("ss1"))
+    cache.put("k2", "net", "ss2", make_result("ss2"))
+    cache.discard("net", "ss1")
+    assert cache.get("k1", "net", "ss1") is None
+    assert cache.get("k2", "net", "ss2") is not None
+    assert not (tmp_path / "net" / "ss1").exists()
+
+
+def test_disabled():
+    cache = TracerouteResultCache(max_entries=0)
+    cache.put("k1", "net", "ss", make_result("ss"))
+    assert cache.get("k1", "net", "ss") is None